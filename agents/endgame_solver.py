@@ -0,0 +1,147 @@
+import math
+import time
+
+import numpy as np
+
+from hanafuda_rl.envs.bitboard import BitboardRules, snapshot_from_rules
+from .transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+
+
+class _BudgetExceeded(Exception):
+    pass
+
+
+class EndgameSolver:
+    """
+    确定化局面（双方手牌与牌山顺序已知）的精确残局求解器。
+
+    确定化后对局是完全信息的，用带置换表的 alpha-beta 搜索求出每个合法动作（包括叫牌决策 36/37）
+    的精确终局得分：胜方役分，给定玩家赢为正、输为负，平局为 0。
+    置换表以 Zobrist 哈希为键，数值统一按玩家0的视角保存，因此可以在多次求解（不同确定化、不同回合）之间复用；
+    以子树节点数作为替换深度。
+
+    走法排序：置换表中的最佳动作优先，其次是结束（36）、配对，最后是不配对的出牌。
+
+    参数：
+        max_nodes: 单次 solve 的节点数上限，超出时放弃求解。
+        time_limit: 单次 solve 的时间上限（秒），None 表示不限。
+        table_entries: 置换表容量。
+    """
+
+    def __init__(self, max_nodes=200_000, time_limit=None, table_entries=2**18):
+        self.max_nodes = max_nodes
+        self.time_limit = time_limit
+        self.table = TranspositionTable(table_entries)
+        self.nodes = 0  # 最近一次 solve 展开的节点数
+        self._sim = BitboardRules()
+        self._deadline = None
+
+    def solve(self, state, player_id=None):
+        """
+        求解局面中当前玩家各合法动作的精确价值。
+
+        state 为 BitboardRules.snapshot 格式的记录，或 HanafudaRules / BitboardRules 对象（不会被修改）。
+        返回 {动作: 价值}，价值以 player_id（默认为当前玩家）的视角计；超出预算时返回 None。
+        """
+        if not isinstance(state, tuple):
+            state = snapshot_from_rules(state)
+        sim = self._sim
+        sim.restore(state)
+        player = sim.current_player
+        if player_id is None:
+            player_id = player
+        sign = 1.0 if player_id == 0 else -1.0
+
+        self.nodes = 0
+        self._deadline = None if self.time_limit is None else time.perf_counter() + self.time_limit
+        values = {}
+        try:
+            for action in self._ordered_actions(player, None):
+                sim.restore(state)
+                sim.perform_action(action, player)
+                values[action] = sign * self._search(-math.inf, math.inf)
+        except _BudgetExceeded:
+            return None
+        finally:
+            sim.restore(state)
+        return values
+
+    def best_action(self, state):
+        """
+        返回当前玩家价值最高的动作；超出预算时返回 None。
+        """
+        values = self.solve(state)
+        if values is None:
+            return None
+        return max(values, key=values.get)
+
+    def _ordered_actions(self, player, first):
+        actions = [int(action) for action in np.flatnonzero(self._sim.get_legal_actions_mask(player))]
+        actions.sort(key=lambda action: (action != first, action == 37, action < 36 and action % 4 == 3))
+        return actions
+
+    def _search(self, alpha, beta):
+        """
+        以玩家0的视角返回当前局面的价值（玩家0取最大，玩家1取最小）。
+        """
+        sim = self._sim
+        if sim.game_over:
+            if sim.game_result == 0:
+                return float(sim.yaku_points[0])
+            if sim.game_result == 1:
+                return -float(sim.yaku_points[1])
+            return 0.0
+
+        self.nodes += 1
+        if self.nodes > self.max_nodes:
+            raise _BudgetExceeded
+        if self._deadline is not None and self.nodes % 1024 == 0 and time.perf_counter() > self._deadline:
+            raise _BudgetExceeded
+
+        key = sim.compute_hash()
+        entry = self.table.probe(key)
+        first = None
+        if entry is not None:
+            if entry.bound == EXACT:
+                return entry.value
+            if entry.bound == LOWER_BOUND:
+                alpha = max(alpha, entry.value)
+            else:
+                beta = min(beta, entry.value)
+            if alpha >= beta:
+                return entry.value
+            first = entry.best_action
+
+        player = sim.current_player
+        actions = self._ordered_actions(player, first)
+        if not actions:
+            return 0.0
+        maximizing = player == 0
+        state = sim.snapshot()
+        start_nodes = self.nodes
+        alpha_in, beta_in = alpha, beta
+        best_value, best_action = (-math.inf if maximizing else math.inf), actions[0]
+
+        for action in actions:
+            sim.perform_action(action, player)
+            value = self._search(alpha, beta)
+            sim.restore(state)
+            if maximizing:
+                if value > best_value:
+                    best_value, best_action = value, action
+                alpha = max(alpha, value)
+            else:
+                if value < best_value:
+                    best_value, best_action = value, action
+                beta = min(beta, value)
+            if alpha >= beta:
+                break
+
+        if best_value <= alpha_in:
+            bound = UPPER_BOUND
+        elif best_value >= beta_in:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        self.table.store(key, self.nodes - start_nodes, best_value, bound, best_action)
+        return best_value
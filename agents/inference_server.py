@@ -0,0 +1,212 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+from multiprocessing.reduction import ForkingPickler
+import time
+
+import gymnasium as gym
+import numpy as np
+
+
+def _slot_layout(observation_space, num_clients):
+    """
+    计算共享内存中各观测字段与动作掩码的布局：[(键, 形状, dtype, 字节偏移)]，以及总字节数。
+    非 Dict 观测空间使用键 None。
+    """
+    if isinstance(observation_space, gym.spaces.Dict):
+        fields = [(key, space.shape, space.dtype) for key, space in observation_space.spaces.items()]
+    else:
+        fields = [(None, observation_space.shape, observation_space.dtype)]
+    fields.append(("__action_mask__", (38,), np.dtype(bool)))
+
+    layout = []
+    offset = 0
+    for key, shape, dtype in fields:
+        dtype = np.dtype(dtype)
+        offset = (offset + 7) // 8 * 8  # 8 字节对齐
+        layout.append((key, (num_clients, *shape), dtype, offset))
+        offset += num_clients * int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+    return layout, max(offset, 1)
+
+
+def _attach_views(buffer, layout):
+    """
+    在共享内存上按布局建立 NumPy 视图（第一维为客户端编号）。
+    """
+    return {key: np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset) for key, shape, dtype, offset in layout}
+
+
+def _serve(model_path, shm_name, layout, connections, control, max_wait):
+    """
+    推理服务进程主循环：等待客户端请求，把同一时间窗内到达的请求合并为一次批量前向计算。
+    """
+    import torch
+    from sb3_contrib import MaskablePPO
+
+    model = MaskablePPO.load(model_path, device="cpu")
+    shm = shared_memory.SharedMemory(name=shm_name)
+    views = _attach_views(shm.buf, layout)
+    masks = views.pop("__action_mask__")
+    live = list(connections)  # 仍在运行的客户端的连接
+
+    try:
+        while True:
+            ready = wait(live + [control])
+            if control in ready:
+                command = control.recv()
+                if command[0] == "stop":
+                    break
+                if command[0] == "load":
+                    model = MaskablePPO.load(command[1], device="cpu")
+                    control.send(True)
+                if command[0] == "params":
+                    model.policy.load_state_dict({name: torch.as_tensor(value) for name, value in command[1].items()})
+                    control.send(True)
+                ready.remove(control)
+            elif len(ready) < len(live):
+                # 在很短的时间窗内继续收集请求，使同一向量步内各 worker 的请求合并为一批；
+                # 所有客户端都已提交时立即计算
+                deadline = time.perf_counter() + max_wait
+                while len(ready) < len(live):
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    more = wait([conn for conn in live if conn not in ready], timeout=remaining)
+                    if not more:
+                        break
+                    ready += more
+
+            clients = []
+            for conn in ready:
+                try:
+                    clients.append(conn.recv())
+                except EOFError:  # 客户端进程已退出
+                    live.remove(conn)
+            if not clients:
+                continue
+
+            clients = np.array(clients)
+            if None in views:
+                observations = views[None][clients]
+            else:
+                observations = {key: view[clients] for key, view in views.items()}
+            actions, _ = model.predict(observations, action_masks=masks[clients], deterministic=True)
+            for client, action in zip(clients, actions):
+                connections[client].send(int(action))
+    finally:
+        del views, masks
+        shm.close()
+
+
+class RemoteOpponentAgent:
+    """
+    推理服务的客户端智能体：把观测和掩码写入共享内存中自己的槽位，等待服务进程返回动作。
+    接口与其它智能体相同，可以在 SubprocVecEnv 的 worker 中代替 PPOAgent 使用。
+    """
+
+    def __init__(self, client_id, shm_name, layout, connection):
+        self.client_id = client_id
+        self.shm_name = shm_name
+        self.layout = layout
+        self.connection = connection
+        self._shm = None
+        self._views = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_shm"] = None
+        state["_views"] = None
+        # 管道连接只是一个文件描述符编号，按值序列化后在 forkserver/spawn 启动的 worker 中无效。
+        # 用 ForkingPickler 序列化：接收方反序列化时从本进程复制一份描述符
+        state["connection"] = bytes(ForkingPickler.dumps(self.connection))
+        return state
+
+    def __setstate__(self, state):
+        state["connection"] = ForkingPickler.loads(state["connection"])
+        self.__dict__.update(state)
+
+    def _attach(self):
+        self._shm = shared_memory.SharedMemory(name=self.shm_name)
+        self._views = _attach_views(self._shm.buf, self.layout)
+
+    def select_action(self, observation, action_mask):
+        if self._views is None:
+            self._attach()
+        slot = self.client_id
+        if isinstance(observation, dict):
+            for key, value in observation.items():
+                self._views[key][slot] = value
+        else:
+            self._views[None][slot] = observation
+        self._views["__action_mask__"][slot] = action_mask
+
+        self.connection.send(slot)
+        return self.connection.recv()
+
+
+class OpponentInferenceServer:
+    """
+    对手推理服务：在单独的进程中只加载一份对手模型，把各 worker 提交的对手观测合并为批量前向计算。
+
+    用法：
+        server = OpponentInferenceServer(model_path, observation_space, num_clients=N_ENVS)
+        server.start()
+        opponent = server.client(rank)  # 传入各 worker，接口同 PPOAgent
+        ...
+        server.close()
+
+    start_method 需与使用客户端的 SubprocVecEnv 一致（SB3 默认为 forkserver）。
+    """
+
+    def __init__(self, model_path, observation_space, num_clients, max_wait=0.002, start_method=None):
+        if start_method is None:
+            start_method = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+        self.model_path = model_path
+        self.num_clients = num_clients
+        self.max_wait = max_wait
+        self._context = mp.get_context(start_method)
+        self._layout, size = _slot_layout(observation_space, num_clients)
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        self._server_conns, self._client_conns = zip(*(self._context.Pipe() for _ in range(num_clients)))
+        self._control, self._server_control = self._context.Pipe()
+        self._process = None
+
+    def start(self):
+        self._process = self._context.Process(
+            target=_serve,
+            args=(self.model_path, self._shm.name, self._layout, self._server_conns, self._server_control, self.max_wait),
+            daemon=True,
+        )
+        self._process.start()
+        return self
+
+    def client(self, client_id):
+        """
+        返回第 client_id 个客户端智能体（每个 worker 使用一个不同的编号）。
+        """
+        return RemoteOpponentAgent(client_id, self._shm.name, self._layout, self._client_conns[client_id])
+
+    def load(self, model_path):
+        """
+        让服务进程换用新的模型参数，返回时新模型已生效。
+        """
+        self.model_path = model_path
+        self._control.send(("load", model_path))
+        self._control.recv()
+
+    def load_parameters(self, parameters):
+        """
+        把新的策略参数（policy_parameters 的结果）直接发送给服务进程，不经过磁盘。返回时新参数已生效。
+        """
+        self._control.send(("params", parameters))
+        self._control.recv()
+
+    def close(self):
+        if self._process is not None:
+            self._control.send(("stop",))
+            self._process.join(timeout=10)
+            if self._process.is_alive():
+                self._process.terminate()
+            self._process = None
+        self._shm.close()
+        self._shm.unlink()
@@ -0,0 +1,135 @@
+import random
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from hanafuda_rl.envs.bitboard import BitboardRules
+from .mcts_agent import information_state, sample_determinization
+
+
+class KoikoiEvaluator:
+    """
+    叫牌决策（阶段 2/3 的动作 36/37）的期望价值评估器，价值以决策方的役分计。
+
+    结束 (36) 的价值就是当前役分。叫牌 (37) 的价值按未见牌（对手手牌 + 牌山）的分配取平均：
+    每种与观测一致的分配等概率出现，因此均匀随机分配即是按组合数加权的抽样。对每个分配：
+    - 牌山剩余不超过 endgame_pile 张且给出 endgame_solver 时，用精确残局求解器求叫牌后的价值；
+    - 否则叫牌后快速模拟：双方随机出牌，任一方役分再次提高时立即结束（先成役者得分，手牌打完为平局）。
+    抽满 num_samples 个分配，或超过 time_limit 秒时停止抽样；时间上限不会使样本数少于 min_samples。
+    结果按信息状态（己方可见的全部牌区、役分与叫牌标记）缓存在 LRU 表中。
+    """
+
+    def __init__(self, num_samples=64, time_limit=0.001, min_samples=32, endgame_solver=None, endgame_pile=16,
+                 cache_size=4096, seed=None):
+        self.num_samples = num_samples
+        self.time_limit = time_limit
+        self.min_samples = min(max(min_samples, 1), num_samples)
+        self.endgame_solver = endgame_solver
+        self.endgame_pile = endgame_pile
+        self.cache_size = cache_size
+        self.rng = random.Random(seed)
+        self._sim = BitboardRules()
+        self._cache = OrderedDict()  # 信息状态 → (结束价值, 叫牌价值)
+        self.cache_hits = 0
+
+    def evaluate(self, observation):
+        """
+        返回 (结束的价值, 叫牌的价值)；不处于叫牌决策阶段时返回 None。
+        """
+        known, unseen, opp_hand_size = information_state(observation)
+        if known[-1] < 2:
+            return None
+        if known in self._cache:
+            self._cache.move_to_end(known)
+            self.cache_hits += 1
+            return self._cache[known]
+
+        stop_value = float(known[4][0])
+        exact = self.endgame_solver is not None and len(unseen) - opp_hand_size <= self.endgame_pile
+        deadline = None if self.time_limit is None else time.perf_counter() + self.time_limit
+        total, samples = 0.0, 0
+        while samples < self.num_samples and (samples < self.min_samples or deadline is None or time.perf_counter() < deadline):
+            snapshot = sample_determinization(known, unseen, opp_hand_size, self.rng)
+            value = None
+            if exact:
+                values = self.endgame_solver.solve(snapshot, player_id=0)
+                value = None if values is None else values[37]
+            if value is None:
+                value = self._playout(snapshot)
+            total += value
+            samples += 1
+
+        result = (stop_value, total / samples)
+        self._cache[known] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    def evaluate_batch(self, observations):
+        """
+        对多局观测逐个调用 evaluate（不做向量化计算），便于把结果作为特征使用。
+        observations 的每个字段第一维为对局。返回形状 (N, 2) 的数组，不处于叫牌决策阶段的行为 NaN。
+        """
+        if isinstance(observations, dict):
+            rows = [{key: value[i] for key, value in observations.items()} for i in range(len(observations["turn_phase"]))]
+        else:
+            rows = list(observations)
+        values = np.full((len(rows), 2), np.nan, dtype=np.float32)
+        for i, observation in enumerate(rows):
+            result = self.evaluate(observation)
+            if result is not None:
+                values[i] = result
+        return values
+
+    def _playout(self, snapshot):
+        """
+        叫牌后随机模拟到终局，任一方在叫牌决策时都选择结束。返回玩家0视角的得分。
+        """
+        sim = self._sim
+        sim.restore(snapshot)
+        sim.perform_action(37, 0)
+        rng_random = self.rng.random
+        while not sim.game_over:
+            player = sim.current_player
+            if sim.turn_phase >= 2:
+                sim.perform_action(36, player)
+                break
+            actions = np.flatnonzero(sim.get_legal_actions_mask(player))
+            sim.perform_action(int(actions[int(rng_random() * len(actions))]), player)
+        if sim.game_result == 0:
+            return float(sim.yaku_points[0])
+        if sim.game_result == 1:
+            return -float(sim.yaku_points[1])
+        return 0.0
+
+
+class KoikoiOverrideAgent:
+    """
+    包装任意智能体：叫牌决策交给 KoikoiEvaluator（叫牌价值比结束高出 margin 以上时叫牌），其余动作由原智能体决定。
+    """
+
+    def __init__(self, agent, evaluator=None, margin=0.0):
+        self.agent = agent
+        self.evaluator = evaluator if evaluator is not None else KoikoiEvaluator()
+        self.margin = margin
+
+    def _decide(self, observation):
+        stop_value, continue_value = self.evaluator.evaluate(observation)
+        return 37 if continue_value > stop_value + self.margin else 36
+
+    def select_action(self, observation, action_mask):
+        if action_mask[36] and action_mask[37]:
+            return self._decide(observation)
+        return self.agent.select_action(observation, action_mask)
+
+    def select_actions(self, observations, action_masks):
+        action_masks = np.asarray(action_masks, dtype=bool)
+        actions = np.array(self.agent.select_actions(observations, action_masks))
+        for i in np.flatnonzero(action_masks[:, 36] & action_masks[:, 37]):
+            if isinstance(observations, dict):
+                observation = {key: value[i] for key, value in observations.items()}
+            else:
+                observation = observations[i]
+            actions[i] = self._decide(observation)
+        return actions
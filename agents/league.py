@@ -0,0 +1,124 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from .sb3_agent import PolicyAgent, policy_parameters
+
+
+def _policy_nbytes(agent):
+    return sum(parameter.numel() * parameter.element_size() for parameter in agent.policy.parameters())
+
+
+class PolicyRegistry:
+    """
+    对手策略注册表：按名字登记基线智能体与历史检查点，检查点策略按需建立并保存在 LRU 缓存中。
+
+    基线智能体（RandomAgent、RuleAgent 等）常驻内存、不计入缓存。
+    检查点策略的参数总字节数超过 max_bytes 时，淘汰最久未使用的策略；
+    被淘汰的检查点再次被选中时才会从磁盘重新读取（disk_loads 记录读取次数）。
+    """
+
+    def __init__(self, observation_space, action_space, max_bytes=256 * 2**20):
+        self.observation_space = observation_space
+        self.action_space = action_space
+        self.max_bytes = max_bytes
+        self._agents = {}  # 名字 → 常驻的基线智能体
+        self._checkpoints = {}  # 名字 → 检查点文件路径（可为 None，表示只存在于内存中）
+        self._cache = OrderedDict()  # 名字 → (PolicyAgent, 参数字节数)，按最近使用排序
+        self.cache_bytes = 0
+        self.disk_loads = 0
+
+    def names(self):
+        return list(self._agents) + list(self._checkpoints)
+
+    def __contains__(self, name):
+        return name in self._agents or name in self._checkpoints
+
+    def register_agent(self, name, agent):
+        """
+        登记一个常驻的智能体（如基线对手）。
+        """
+        self._agents[name] = agent
+
+    def register_checkpoint(self, name, path=None, policy_class=None, policy_kwargs=None, parameters=None):
+        """
+        登记一个检查点。给出 parameters 时直接在内存中建立策略（不读取磁盘），
+        否则在第一次 get 时从 path 加载。
+        """
+        self._checkpoints[name] = path
+        self._evict(name)
+        if parameters is not None:
+            agent = PolicyAgent(policy_class, self.observation_space, self.action_space, policy_kwargs)
+            agent.load_parameters(parameters)
+            self._insert(name, agent)
+
+    def get(self, name):
+        """
+        返回名字对应的智能体；检查点命中缓存时不访问磁盘。
+        """
+        if name in self._agents:
+            return self._agents[name]
+        if name in self._cache:
+            self._cache.move_to_end(name)
+            return self._cache[name][0]
+
+        path = self._checkpoints[name]
+        if path is None:
+            raise KeyError(f"Checkpoint '{name}' was evicted and has no file to reload from")
+        from sb3_contrib import MaskablePPO
+
+        model = MaskablePPO.load(path, device="cpu")
+        self.disk_loads += 1
+        agent = PolicyAgent(type(model.policy), self.observation_space, self.action_space, model.policy_kwargs)
+        agent.load_parameters(policy_parameters(model.policy))
+        self._insert(name, agent)
+        return agent
+
+    def _insert(self, name, agent):
+        nbytes = _policy_nbytes(agent)
+        self._cache[name] = (agent, nbytes)
+        self.cache_bytes += nbytes
+        # 淘汰最久未使用的策略，刚放入的策略总是保留
+        while self.cache_bytes > self.max_bytes and len(self._cache) > 1:
+            self._evict(next(iter(self._cache)))
+
+    def _evict(self, name):
+        if name in self._cache:
+            _, nbytes = self._cache.pop(name)
+            self.cache_bytes -= nbytes
+
+
+class OpponentLeague:
+    """
+    对手联盟：按权重从注册表中抽取对手。SelfPlayEnvWrapper 在每局 reset 时调用 sample 更换对手。
+    """
+
+    def __init__(self, registry, weights=None, seed=None):
+        self.registry = registry
+        self.weights = dict(weights or {})  # 名字 → 抽样权重（未列出的名字权重为 0）
+        self.np_random = np.random.default_rng(seed)
+
+    def add(self, name, weight, **checkpoint):
+        """
+        登记一个新检查点并设置其抽样权重；checkpoint 参数同 PolicyRegistry.register_checkpoint。
+        """
+        self.registry.register_checkpoint(name, **checkpoint)
+        self.weights[name] = weight
+
+    def add_agent(self, name, weight, agent):
+        """
+        登记一个常驻的智能体（如推理服务的客户端）并设置其抽样权重。
+        """
+        self.registry.register_agent(name, agent)
+        self.weights[name] = weight
+
+    def sample_name(self):
+        names = [name for name, weight in self.weights.items() if weight > 0 and name in self.registry]
+        weights = np.array([self.weights[name] for name in names], dtype=np.float64)
+        return names[self.np_random.choice(len(names), p=weights / weights.sum())]
+
+    def sample(self):
+        """
+        按权重抽取一个对手智能体。
+        """
+        return self.registry.get(self.sample_name())
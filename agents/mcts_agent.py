@@ -0,0 +1,215 @@
+import math
+import random
+import time
+
+import numpy as np
+
+from hanafuda_rl.envs import bitboard
+from hanafuda_rl.envs.bitboard import BitboardRules
+from hanafuda_rl.envs.hanafuda_env import (
+    HanafudaEnv, CARDS_SIZE, FLAT_DRAWN_OFFSET, FLAT_DECK_OFFSET, FLAT_SCORES_OFFSET, FLAT_KOIKOI_OFFSET,
+    FLAT_MY_PROGRESS_OFFSET, FLAT_OPP_PROGRESS_OFFSET, FLAT_PHASE_OFFSET, FLAT_SIZE,
+)
+from hanafuda_rl.envs.rules import score_yaku
+
+
+def _decode_observation(observation):
+    """
+    将 Dict 或扁平观测还原为 (四个牌区的48位掩码, 抽中的牌, 山牌剩余数, 双方役分, 叫牌标记, 双方役进度, 阶段)。
+    """
+    if isinstance(observation, dict):
+        zones = [observation[key] for key in ("hand", "table", "my_collected", "opp_collected")]
+        drawn = int(observation["drawn_card"])
+        deck = float(np.asarray(observation["deck_remaining"]).reshape(-1)[0])
+        scores = np.asarray(observation["current_scores"], dtype=np.float64)
+        koikoi = np.asarray(observation["koikoi_flags"])
+        progress = (observation["my_yaku_progress"], observation["opp_yaku_progress"])
+        phase = int(observation["turn_phase"])
+    else:
+        observation = np.asarray(observation)
+        zones = [observation[offset:offset + 48] for offset in range(0, CARDS_SIZE, 48)]
+        drawn = int(np.argmax(observation[FLAT_DRAWN_OFFSET:FLAT_DECK_OFFSET]))
+        deck = float(observation[FLAT_DECK_OFFSET])
+        scores = observation[FLAT_SCORES_OFFSET:FLAT_KOIKOI_OFFSET].astype(np.float64)
+        koikoi = observation[FLAT_KOIKOI_OFFSET:FLAT_MY_PROGRESS_OFFSET]
+        progress = (observation[FLAT_MY_PROGRESS_OFFSET:FLAT_OPP_PROGRESS_OFFSET],
+                    observation[FLAT_OPP_PROGRESS_OFFSET:FLAT_PHASE_OFFSET])
+        phase = int(np.argmax(observation[FLAT_PHASE_OFFSET:FLAT_SIZE]))
+
+    masks = [int.from_bytes(np.packbits(np.asarray(zone, dtype=bool), bitorder="little").tobytes(), "little") for zone in zones]
+    return masks, drawn, round(deck * 24), scores, koikoi, progress, phase
+
+
+def _points_from_score(score, collected_mask):
+    """
+    由归一化役分 tanh(points / 5) 还原役分；数值饱和时改用收集牌重新计分。
+    """
+    if score < 1.0:
+        return float(round(5.0 * math.atanh(score)))
+    counts = [(collected_mask & group).bit_count() for group in bitboard.YAKU_GROUP_MASKS]
+    return score_yaku(counts)[0]
+
+
+def information_state(observation):
+    """
+    从观测中提取已知部分：(固定的状态记录字段, 未见牌ID列表, 对手手牌张数)，供 sample_determinization 使用。
+    """
+    (hand, table, my_collected, opp_collected), drawn, pile_size, scores, koikoi, progress, phase = \
+        _decode_observation(observation)
+    drawn_id = drawn if phase == 1 and drawn < 48 else -1
+
+    seen = hand | table | my_collected | opp_collected
+    if drawn_id >= 0:
+        seen |= 1 << drawn_id
+    unseen = bitboard.mask_to_ids(bitboard.FULL_MASK & ~seen)
+    known = (
+        hand, table, (my_collected, opp_collected), drawn_id,
+        (_points_from_score(scores[0], my_collected), _points_from_score(scores[1], opp_collected)),
+        (int(koikoi[0]), int(koikoi[1])),
+        (tuple(float(x) for x in progress[0]), tuple(float(x) for x in progress[1])),
+        phase,
+    )
+    return known, unseen, len(unseen) - pile_size
+
+
+def sample_determinization(known, unseen, opp_hand_size, rng):
+    """
+    随机分配未见牌（原地打乱 unseen）：前 opp_hand_size 张为对手手牌，其余为牌山顺序。
+    每种与观测一致的分配出现的概率相同。
+    """
+    hand, table, collected, drawn_id, yaku_points, koikoi_flags, yaku_progress, phase = known
+    rng.shuffle(unseen)
+    opp_hand = pile = 0
+    for card_id in unseen[:opp_hand_size]:
+        opp_hand |= 1 << card_id
+    for card_id in unseen[opp_hand_size:]:
+        pile |= 1 << card_id
+    return (
+        (hand, opp_hand), table, collected, tuple(unseen[opp_hand_size:]), drawn_id,
+        yaku_points, koikoi_flags, ((), ()), yaku_progress, 0, phase, False, None,
+        *bitboard.unseen_of((hand, opp_hand), pile),
+    )
+
+
+class MCTSAgent:
+    """
+    确定化蒙特卡洛搜索智能体 (PIMC)。
+
+    每次迭代按观测把未见牌（对手手牌 + 牌山）随机分配为一个确定化局面，
+    在根节点用 UCB（给出 prior_agent 时为 PUCT）选择动作，再用 rollout 策略把对局下完，
+    以终局得分（胜方役分，己方视角）更新该动作的统计量。最终选择访问次数最多的动作。
+
+    搜索在位棋盘规则引擎上进行，整个搜索只复用一个引擎对象：
+    每次迭代用 restore 载入确定化局面，不为单次 rollout 分配新的状态。
+
+    参数：
+        num_rollouts: 每步的 rollout 次数上限。
+        time_limit: 每步的搜索时间上限（秒），None 表示只受 rollout 次数限制。
+        exploration: UCB 的探索系数（以役分为单位）。
+        prior_agent: 可选，提供 action_probabilities(observation, action_mask) 的智能体（如 PPOAgent），用作先验。
+        rollout_agent: 可选，提供 select_action 的智能体，代替均匀随机策略下完对局（较慢）。
+        endgame_solver: 可选的 EndgameSolver。牌山剩余不超过 endgame_pile 张时，改为对
+            endgame_determinizations 个确定化局面精确求解，选择平均价值最高的动作（超出求解预算时退回 rollout 搜索）。
+    """
+
+    def __init__(self, num_rollouts=1000, time_limit=None, exploration=4.0, prior_agent=None, rollout_agent=None,
+                 seed=None, endgame_solver=None, endgame_pile=16, endgame_determinizations=20):
+        self.num_rollouts = num_rollouts
+        self.time_limit = time_limit
+        self.exploration = exploration
+        self.prior_agent = prior_agent
+        self.rollout_agent = rollout_agent
+        self.endgame_solver = endgame_solver
+        self.endgame_pile = endgame_pile
+        self.endgame_determinizations = endgame_determinizations
+        self.rng = random.Random(seed)
+        self._sim = BitboardRules()
+        self._obs_env = None
+        if rollout_agent is not None:
+            # rollout 策略需要观测：借用一个环境对象的 _get_obs，其规则引擎指向搜索用的引擎
+            self._obs_env = HanafudaEnv(use_bitboard=True)
+            self._obs_env.rules = self._sim
+
+    def determinize(self, observation):
+        """
+        按观测采样一个确定化局面，返回 BitboardRules.snapshot 格式的记录（己方为玩家0，轮到己方行动）。
+        """
+        return sample_determinization(*information_state(observation), self.rng)
+
+    def select_action(self, observation, action_mask):
+        legal = [int(action) for action in np.flatnonzero(action_mask)]
+        if len(legal) <= 1:
+            return legal[0] if legal else 36
+
+        known, unseen, opp_hand_size = information_state(observation)
+        if self.endgame_solver is not None and len(unseen) - opp_hand_size <= self.endgame_pile:
+            action = self._solve_endgame(legal, known, unseen, opp_hand_size)
+            if action is not None:
+                return action
+
+        priors = None
+        if self.prior_agent is not None:
+            probs = self.prior_agent.action_probabilities(observation, action_mask)
+            priors = [float(probs[action]) for action in legal]
+
+        visits = [0] * len(legal)
+        totals = [0.0] * len(legal)
+        deadline = None if self.time_limit is None else time.perf_counter() + self.time_limit
+        sim = self._sim
+        rng_random = self.rng.random
+
+        for iteration in range(self.num_rollouts):
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            sim.restore(sample_determinization(known, unseen, opp_hand_size, self.rng))
+
+            # 根节点动作选择：先保证每个动作至少被试一次，之后按 UCB / PUCT
+            if iteration < len(legal) and priors is None:
+                index = iteration
+            else:
+                log_n = math.log(iteration + 1)
+                best_index, best_value = 0, -math.inf
+                for i in range(len(legal)):
+                    n = visits[i]
+                    mean = totals[i] / n if n else 0.0
+                    if priors is None:
+                        value = mean + self.exploration * math.sqrt(log_n / n)
+                    else:
+                        value = mean + self.exploration * priors[i] * math.sqrt(iteration + 1) / (1 + n)
+                    if value > best_value:
+                        best_index, best_value = i, value
+                index = best_index
+
+            sim.perform_action(legal[index], 0)
+            while not sim.game_over:
+                player = sim.current_player
+                if self.rollout_agent is not None:
+                    action = self.rollout_agent.select_action(self._obs_env._get_obs(player), sim.get_legal_actions_mask(player))
+                else:
+                    actions = np.flatnonzero(sim.get_legal_actions_mask(player))
+                    action = actions[int(rng_random() * len(actions))]
+                sim.perform_action(int(action), player)
+
+            if sim.game_result == 0:
+                value = sim.yaku_points[0]
+            elif sim.game_result == 1:
+                value = -sim.yaku_points[1]
+            else:
+                value = 0.0
+            visits[index] += 1
+            totals[index] += value
+
+        return legal[max(range(len(legal)), key=lambda i: (visits[i], totals[i] / visits[i] if visits[i] else -math.inf))]
+
+    def _solve_endgame(self, legal, known, unseen, opp_hand_size):
+        """
+        对多个确定化局面精确求解，返回平均价值最高的动作；任一局面超出求解预算时返回 None。
+        """
+        totals = dict.fromkeys(legal, 0.0)
+        for _ in range(self.endgame_determinizations):
+            values = self.endgame_solver.solve(sample_determinization(known, unseen, opp_hand_size, self.rng), player_id=0)
+            if values is None:
+                return None
+            for action, value in values.items():
+                totals[action] += value
+        return max(legal, key=totals.get)
@@ -0,0 +1,61 @@
+import numpy as np
+
+# 导出文件中支持的激活函数（键为 torch.nn 模块名）
+ACTIVATIONS = {
+    "Tanh": np.tanh,
+    "ReLU": lambda x: np.maximum(x, 0),
+    "Identity": lambda x: x,
+}
+
+
+class NumpyPolicyAgent:
+    """
+    只依赖 NumPy 的策略智能体：读取 export_actor_npz 导出的 .npz 文件，
+    用与 MaskablePPO 策略网络相同的特征拼接、MLP 前向计算与掩码 argmax 选择动作。
+    动作与用同一模型的 PPOAgent（deterministic=True）逐步一致，但不需要导入 torch。
+    """
+
+    def __init__(self, npz_path):
+        with np.load(npz_path, allow_pickle=False) as data:
+            self.obs_keys = [str(key) for key in data["obs_keys"]]  # 特征拼接顺序（与 CombinedExtractor 相同）
+            self.obs_sizes = [int(size) for size in data["obs_sizes"]]  # 各字段的特征维度
+            self.obs_onehot = [bool(flag) for flag in data["obs_onehot"]]  # Discrete 字段展开为 one-hot
+            activations = [str(name) for name in data["activations"]]
+            self.layers = [
+                (data[f"weight_{i}"].T.astype(np.float32), data[f"bias_{i}"].astype(np.float32), ACTIVATIONS[activations[i]])
+                for i in range(len(activations))
+            ]
+        self.offsets = np.cumsum([0] + self.obs_sizes)
+        self._features = np.zeros((1, self.offsets[-1]), dtype=np.float32)  # 单步推理复用的特征缓冲区
+
+    def _fill_features(self, observations, features):
+        for key, onehot, start, end in zip(self.obs_keys, self.obs_onehot, self.offsets[:-1], self.offsets[1:]):
+            value = observations[key] if key else observations
+            if onehot:
+                features[:, start:end] = 0
+                features[np.arange(len(features)), start + np.asarray(value, dtype=np.int64).reshape(-1)] = 1
+            else:
+                features[:, start:end] = np.asarray(value, dtype=np.float32).reshape(len(features), -1)
+        return features
+
+    def action_logits(self, features):
+        """
+        对一批特征向量计算动作 logits。
+        """
+        x = features
+        for weight, bias, activation in self.layers:
+            x = activation(x @ weight + bias)
+        return x
+
+    def select_action(self, observation, action_mask):
+        logits = self.action_logits(self._fill_features(observation, self._features))[0]
+        return int(np.argmax(np.where(action_mask, logits, -np.inf)))
+
+    def select_actions(self, observations, action_masks):
+        """
+        批量版本：observations 的每个字段第一维为对局。
+        """
+        action_masks = np.asarray(action_masks, dtype=bool)
+        features = np.zeros((len(action_masks), self.offsets[-1]), dtype=np.float32)
+        logits = self.action_logits(self._fill_features(observations, features))
+        return np.argmax(np.where(action_masks, logits, -np.inf), axis=1)
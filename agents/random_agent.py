@@ -21,4 +21,13 @@ class RandomAgent:
             return 0 
             
         # 从合法动作中随机选择一个
-        return self.np_random.choice(legal_actions)
\ No newline at end of file
+        return self.np_random.choice(legal_actions)
+
+    def select_actions(self, observations, action_masks):
+        """
+        批量版本：为每一行掩码独立地均匀选择一个合法动作。
+        """
+        action_masks = np.asarray(action_masks, dtype=bool)
+        # 对合法动作赋予 (0,1) 间的随机权重，非法动作为 -1，取最大者即为均匀抽样
+        weights = np.where(action_masks, self.np_random.random(action_masks.shape), -1.0)
+        return np.argmax(weights, axis=1)
\ No newline at end of file
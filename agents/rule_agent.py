@@ -1,3 +1,5 @@
+import numpy as np
+
 class RuleAgent:
     def __init__(self):
         pass
@@ -13,4 +15,20 @@ class RuleAgent:
                 if action_mask[idx]:
                     return idx
         else:
-            return 36
\ No newline at end of file
+            return 36
+
+    def select_actions(self, observations, action_masks):
+        """
+        批量版本，与逐个调用 select_action 的结果相同。
+        """
+        action_masks = np.asarray(action_masks, dtype=bool)
+        actions = np.full(len(action_masks), 36)
+
+        draw = action_masks[:, 32:36].any(axis=1)
+        actions[draw] = 32 + np.argmax(action_masks[draw, 32:36], axis=1)
+
+        play = action_masks[:, :32].any(axis=1)
+        matchable = action_masks[:, 0:32:4]  # 各手牌配对第一张场牌的动作
+        has_match = matchable.any(axis=1)
+        actions[play] = np.where(has_match[play], np.argmax(matchable[play], axis=1) * 4, 3)
+        return actions
\ No newline at end of file
@@ -1,3 +1,5 @@
+import numpy as np
+import torch
 from sb3_contrib import MaskablePPO
 
 class PPOAgent:
@@ -12,7 +14,109 @@ class PPOAgent:
     def select_action(self, observation, action_mask):
         action, _ = self.model.predict(
             observation,
-            action_masks=action_mask,
+            action_masks=np.array(action_mask), # 规则引擎返回的掩码是只读的缓存数组，转换为张量前复制一份
             deterministic=True
         )
-        return int(action)
\ No newline at end of file
+        return int(action)
+
+    def action_probabilities(self, observation, action_mask):
+        """
+        返回策略在合法动作上的概率分布（长度38），可作为搜索的先验。
+        """
+        policy = self.model.policy
+        obs_tensor, _ = policy.obs_to_tensor(observation)
+        with torch.no_grad():
+            distribution = policy.get_distribution(obs_tensor, action_masks=np.array(action_mask).reshape(1, -1))
+            probs = distribution.distribution.probs
+        return probs.cpu().numpy().reshape(-1)
+
+    def select_actions(self, observations, action_masks):
+        """
+        批量版本：一次前向计算为多局选择动作。
+        """
+        actions, _ = self.model.predict(
+            observations,
+            action_masks=action_masks,
+            deterministic=True
+        )
+        return actions
+
+
+def export_actor_npz(model, npz_path):
+    """
+    把 MaskablePPO 模型（或模型文件路径）的动作网络导出为 .npz，供 NumpyPolicyAgent 使用。
+    只导出特征拼接方式、策略 MLP 与 action_net，不包含价值网络；
+    特征提取器必须是只做拼接的 CombinedExtractor 或 FlattenExtractor。
+    """
+    import gymnasium as gym
+    from stable_baselines3.common.torch_layers import CombinedExtractor, FlattenExtractor
+
+    if isinstance(model, str):
+        model = MaskablePPO.load(model, device="cpu")
+    policy = model.policy
+    if not policy.share_features_extractor:
+        raise ValueError("Only policies with a shared features extractor can be exported")
+    if type(policy.features_extractor) not in (CombinedExtractor, FlattenExtractor):
+        raise ValueError(f"Unsupported features extractor {type(policy.features_extractor).__name__}")
+
+    if isinstance(policy.observation_space, gym.spaces.Dict):
+        spaces = list(policy.observation_space.spaces.items())
+    else:
+        spaces = [("", policy.observation_space)]
+    obs_keys, obs_sizes, obs_onehot = [], [], []
+    for key, space in spaces:
+        onehot = isinstance(space, gym.spaces.Discrete)
+        obs_keys.append(key)
+        obs_onehot.append(onehot)
+        obs_sizes.append(int(space.n) if onehot else int(np.prod(space.shape)))
+
+    arrays = {}
+    activations = []
+    modules = list(policy.mlp_extractor.policy_net) + [policy.action_net]
+    for module in modules:
+        if isinstance(module, torch.nn.Linear):
+            index = len(activations)
+            arrays[f"weight_{index}"] = module.weight.detach().cpu().numpy()
+            arrays[f"bias_{index}"] = module.bias.detach().cpu().numpy()
+            activations.append("Identity")
+        else:
+            if type(module).__name__ not in ("Tanh", "ReLU"):
+                raise ValueError(f"Unsupported activation {type(module).__name__}")
+            activations[-1] = type(module).__name__
+
+    np.savez(
+        npz_path, obs_keys=np.array(obs_keys), obs_sizes=np.array(obs_sizes), obs_onehot=np.array(obs_onehot),
+        activations=np.array(activations), **arrays,
+    )
+    return npz_path
+
+
+def policy_parameters(policy):
+    """
+    以 {参数名: NumPy 数组} 的形式导出策略网络参数，便于通过管道或共享内存广播给其它进程。
+    """
+    return {name: tensor.detach().cpu().numpy() for name, tensor in policy.state_dict().items()}
+
+
+class PolicyAgent:
+    """
+    直接包装 MaskablePPO 策略网络（不含算法对象与优化器）的智能体。
+    参数可以用 load_parameters 原地替换，常驻的 worker 无需重新读取模型文件即可更换对手。
+    """
+    def __init__(self, policy_class, observation_space, action_space, policy_kwargs=None):
+        self.policy = policy_class(observation_space, action_space, lambda _: 0.0, **(policy_kwargs or {}))
+        self.policy.set_training_mode(False)
+
+    def load_parameters(self, parameters):
+        """
+        载入 policy_parameters 导出的参数。
+        """
+        self.policy.load_state_dict({name: torch.as_tensor(value) for name, value in parameters.items()})
+
+    def select_action(self, observation, action_mask):
+        action, _ = self.policy.predict(observation, action_masks=np.array(action_mask), deterministic=True)
+        return int(action)
+
+    def select_actions(self, observations, action_masks):
+        actions, _ = self.policy.predict(observations, action_masks=action_masks, deterministic=True)
+        return actions
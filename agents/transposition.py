@@ -0,0 +1,79 @@
+from collections import namedtuple
+
+# 存储值的性质：精确值，或 alpha-beta 搜索得到的下界 / 上界
+EXACT, LOWER_BOUND, UPPER_BOUND = 0, 1, 2
+
+TTEntry = namedtuple("TTEntry", ["key", "depth", "value", "bound", "best_action"])
+
+
+class TranspositionTable:
+    """
+    以 Zobrist 哈希（HanafudaRules.zobrist_hash）为键的置换表，容量固定。
+
+    表由 2 的幂个桶组成，桶下标为哈希的低位。每个桶有两个槽位（两级替换策略）：
+    - 深度优先槽：只被搜索深度不小于原条目的新条目替换，保存代价最高的结果；
+    - 总是替换槽：存放其余新条目，以及从深度优先槽中被挤出的条目。
+    条目保存完整的 64 位键，探测时比较键，桶下标冲突不会返回错误的条目。
+    """
+
+    def __init__(self, max_entries=2**20):
+        buckets = 1
+        while buckets * 2 < max_entries:
+            buckets *= 2
+        self._mask = buckets - 1
+        self._deep = [None] * buckets
+        self._recent = [None] * buckets
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.replacements = 0  # 覆盖了其他局面的条目数
+
+    @property
+    def capacity(self):
+        return 2 * len(self._deep)
+
+    def __len__(self):
+        return sum(entry is not None for entry in self._deep) + sum(entry is not None for entry in self._recent)
+
+    def clear(self):
+        self._deep = [None] * len(self._deep)
+        self._recent = [None] * len(self._recent)
+        self.hits = self.misses = self.stores = self.replacements = 0
+
+    def probe(self, key):
+        """
+        返回键对应的 TTEntry；不存在时返回 None。
+        """
+        index = key & self._mask
+        entry = self._deep[index]
+        if entry is None or entry.key != key:
+            entry = self._recent[index]
+            if entry is None or entry.key != key:
+                self.misses += 1
+                return None
+        self.hits += 1
+        return entry
+
+    def store(self, key, depth, value, bound=EXACT, best_action=None):
+        """
+        保存一个局面的搜索结果。depth 为结果所依据的搜索深度（或子树规模），用于替换决策。
+        """
+        index = key & self._mask
+        entry = TTEntry(key, depth, value, bound, best_action)
+        self.stores += 1
+        deep = self._deep[index]
+        if deep is None or deep.key == key or depth >= deep.depth:
+            recent = self._recent[index]
+            if recent is not None and recent.key == key:
+                self._recent[index] = None  # 同一局面只保留一个条目
+            if deep is not None and deep.key != key:
+                self._replace_recent(index, deep)  # 被挤出的条目降级到总是替换槽
+            self._deep[index] = entry
+        else:
+            self._replace_recent(index, entry)
+
+    def _replace_recent(self, index, entry):
+        old = self._recent[index]
+        if old is not None and old.key != entry.key:
+            self.replacements += 1
+        self._recent[index] = entry
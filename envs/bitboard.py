@@ -0,0 +1,430 @@
+import numpy as np
+from .rules import CARDS, YAKU_GROUP_SIZES, score_yaku, zobrist_hash
+
+# 牌ID按月份连续编号（每月4张），因此48位掩码天然由12个4位的月份半字节（nibble）组成：
+# 第 m 月（1-12）的4张牌位于第 4*(m-1) 到 4*(m-1)+3 位。
+FULL_MASK = (1 << 48) - 1
+MONTH_MASKS = [0] + [0xF << (4 * (month - 1)) for month in range(1, 13)]  # 下标为月份
+NIBBLE_POPCOUNT = [bin(nibble).count("1") for nibble in range(16)]
+NIBBLE_BITS = [[bit for bit in range(4) if nibble >> bit & 1] for nibble in range(16)]  # 半字节中各置位的位置（升序）
+
+
+def _mask_of(predicate):
+    mask = 0
+    for card in CARDS:
+        if predicate(card):
+            mask |= 1 << card.card_id
+    return mask
+
+
+# 役种相关的牌组掩码（与 HanafudaRules._evaluate_yaku 的统计口径一致）
+RAIN_MASK = _mask_of(lambda card: card.card_name == "柳间小野道风")
+HIKARI_MASK = _mask_of(lambda card: card.category == "光" and card.card_name != "柳间小野道风")
+FLOWER_MASK = _mask_of(lambda card: card.card_name == "樱上幕")
+WINE_MASK = _mask_of(lambda card: card.card_name == "菊上杯")
+MOON_MASK = _mask_of(lambda card: card.card_name == "芒上月")
+ANIMAL_MASK = _mask_of(lambda card: card.card_name in ["萩间野猪", "枫间鹿", "牡丹上蝶"])
+RED_TAN_MASK = _mask_of(lambda card: card.card_name in ["松上赤短", "梅上赤短", "樱上赤短"])
+BLUE_TAN_MASK = _mask_of(lambda card: card.card_name in ["牡丹青短", "菊上青短", "枫上青短"])
+TAN_MASK = _mask_of(lambda card: card.category == "短册")
+TANE_MASK = _mask_of(lambda card: card.category == "种")
+KASU_MASK = _mask_of(lambda card: card.category == "佳士")
+YAKU_GROUP_MASKS = (  # 顺序与 score_yaku 的参数、yaku_progress 一致
+    RAIN_MASK, HIKARI_MASK, FLOWER_MASK, WINE_MASK, MOON_MASK, ANIMAL_MASK,
+    RED_TAN_MASK, BLUE_TAN_MASK, TAN_MASK, TANE_MASK, KASU_MASK,
+)
+
+
+def mask_to_ids(mask):
+    """
+    将48位掩码转换为升序排列的牌ID列表。
+    """
+    ids = []
+    while mask:
+        low = mask & -mask
+        ids.append(low.bit_length() - 1)
+        mask ^= low
+    return ids
+
+
+def mask_to_array(mask, out=None):
+    """
+    将48位掩码展开为长度48的 int8 multi-hot 数组。
+    """
+    bits = np.unpackbits(np.frombuffer(mask.to_bytes(6, "little"), dtype=np.uint8), bitorder="little")
+    if out is None:
+        return bits.astype(np.int8)
+    out[:] = bits
+    return out
+
+
+def unseen_of(hand_masks, pile_mask):
+    """
+    由双方手牌掩码与牌山掩码计算 (各玩家的未见牌掩码, 各玩家按月份的未见张数)，
+    格式同 BitboardRules.snapshot 中的记录（每月的张数即半字节的 popcount）。
+    """
+    masks = (hand_masks[1] | pile_mask, hand_masks[0] | pile_mask)
+    return masks, tuple(tuple(NIBBLE_POPCOUNT[(mask >> shift) & 0xF] for shift in range(0, 48, 4)) for mask in masks)
+
+
+def snapshot_from_rules(rules):
+    """
+    将 HanafudaRules（或 BitboardRules）的当前状态转换为 BitboardRules.snapshot 格式的记录。
+    """
+    if isinstance(rules, BitboardRules):
+        return rules.snapshot()
+
+    def mask_of(cards):
+        mask = 0
+        for card in cards:
+            mask |= 1 << card.card_id
+        return mask
+
+    return (
+        (mask_of(rules.player_hands[0]), mask_of(rules.player_hands[1])), mask_of(rules.table_cards),
+        (mask_of(rules.collected_cards[0]), mask_of(rules.collected_cards[1])),
+        tuple(card.card_id for card in rules.draw_pile),
+        rules.drawn_card.card_id if rules.drawn_card is not None else -1,
+        (rules.yaku_points[0], rules.yaku_points[1]), (rules.koikoi_flags[0], rules.koikoi_flags[1]),
+        (tuple(rules.yaku_list[0]), tuple(rules.yaku_list[1])),
+        (tuple(rules.yaku_progress[0]), tuple(rules.yaku_progress[1])),
+        rules.current_player, rules.turn_phase, rules.game_over, rules.game_result,
+        tuple(rules.unseen_masks), (tuple(rules.unseen_month_counts[0]), tuple(rules.unseen_month_counts[1])),
+    )
+
+
+class BitboardRules:
+    """
+    基于位棋盘的花札规则引擎。
+
+    每个区域（手牌、场牌、收集牌）存为一个48位整数掩码，按月份的4位半字节即可完成配对判断，
+    役种判定则是掩码与牌组掩码按位与后的 popcount。
+    对相同的随机数生成器与动作序列，其 perform_action / get_legal_actions_mask 的结果
+    与 HanafudaRules 完全一致。为兼容环境与渲染代码，同名的牌列表属性会按需从掩码生成。
+    """
+
+    def __init__(self):
+        self._mask_cache = {}  # 玩家ID → 当前状态下的只读动作掩码
+        self.hand_masks = [0, 0]  # 玩家0和玩家1的手牌掩码
+        self.table_mask = 0  # 场牌掩码
+        self.collected_masks = [0, 0]  # 玩家0和玩家1的收集牌掩码
+        self.pile = []  # 牌堆（牌ID列表，从末尾抽牌）
+        self.drawn_id = -1  # 抽中的牌ID（-1表示无）
+        self.yaku_points = {0: 0, 1: 0}
+        self.koikoi_flags = {0: 0, 1: 0}
+        self.yaku_list = {0: [], 1: []}
+        self.yaku_progress = {0: np.zeros(11, dtype=np.float32), 1: np.zeros(11, dtype=np.float32)}
+        self.current_player = 0
+        self.turn_phase = 0
+        self.game_over = False
+        self.game_result = None
+        self.unseen_masks = [0, 0]  # 各玩家看不到的牌（对手手牌 + 牌山）的48位掩码
+        self.unseen_month_counts = {0: [0] * 12, 1: [0] * 12}  # 各玩家看不到的牌按月份的张数
+
+    # --- 兼容 HanafudaRules 的牌列表视图（仅用于观测、渲染等非热路径） ---
+    @property
+    def player_hands(self):
+        return [[CARDS[i] for i in mask_to_ids(mask)] for mask in self.hand_masks]
+
+    @property
+    def table_cards(self):
+        return [CARDS[i] for i in mask_to_ids(self.table_mask)]
+
+    @property
+    def collected_cards(self):
+        return {player: [CARDS[i] for i in mask_to_ids(mask)] for player, mask in enumerate(self.collected_masks)}
+
+    @property
+    def draw_pile(self):
+        return [CARDS[i] for i in self.pile]
+
+    @property
+    def drawn_card(self):
+        return CARDS[self.drawn_id] if self.drawn_id >= 0 else None
+
+    def reset(self, np_random = np.random.default_rng(), deal = None):
+        """
+        重置游戏状态。发牌与先手的随机数消耗与 HanafudaRules 完全相同；deal 的含义同 HanafudaRules.reset。
+        """
+        self._mask_cache = {}
+        order = np_random.permutation(48).tolist() if deal is None else [int(card_id) for card_id in deal[0]]
+        hand0 = hand1 = table = 0
+        for card_id in order[:8]:
+            hand0 |= 1 << card_id
+        for card_id in order[8:16]:
+            hand1 |= 1 << card_id
+        for card_id in order[16:24]:
+            table |= 1 << card_id
+        self.hand_masks = [hand0, hand1]
+        self.table_mask = table
+        self.collected_masks = [0, 0]
+        self.pile = order[24:]
+        self.drawn_id = -1
+        self.yaku_points = {0: 0, 1: 0}
+        self.koikoi_flags = {0: 0, 1: 0}
+        self.yaku_list = {0: [], 1: []}
+        self.yaku_progress = {0: np.zeros(11, dtype=np.float32), 1: np.zeros(11, dtype=np.float32)}
+        self.current_player = np_random.choice([0, 1]) if deal is None else int(deal[1])
+        self.turn_phase = 0
+        self.game_over = False
+        self.game_result = None
+
+        # 检查手四和食付（同月张数即半字节的 popcount）
+        # 发牌已批量判定为无人手四/食付时（Deal.instant_win 为 False）跳过逐张判定
+        checked_players = range(2) if deal is None or len(deal) < 3 or deal[2] else ()
+        for player in checked_players:
+            hand = self.hand_masks[player]
+            month_counts = [NIBBLE_POPCOUNT[(hand >> shift) & 0xF] for shift in range(0, 48, 4)]
+
+            if max(month_counts) >= 4:
+                self.yaku_points[player] = 6
+                self.yaku_list[player].append("手四")
+                self.game_over = True
+                self.game_result = player
+
+            if not self.game_over:
+                pairs = sum(1 for count in month_counts if count >= 2)
+                if pairs >= 4:
+                    self.yaku_points[player] = 6
+                    self.yaku_list[player].append("食付")
+                    self.game_over = True
+                    self.game_result = player
+                    break
+
+        self._rebuild_unseen()
+        return None
+
+    def snapshot(self):
+        """
+        返回当前状态的紧凑记录（整数掩码与小元组），可用 restore 恢复。
+        """
+        return (
+            tuple(self.hand_masks), self.table_mask, tuple(self.collected_masks), tuple(self.pile), self.drawn_id,
+            (self.yaku_points[0], self.yaku_points[1]), (self.koikoi_flags[0], self.koikoi_flags[1]),
+            (tuple(self.yaku_list[0]), tuple(self.yaku_list[1])),
+            (tuple(self.yaku_progress[0]), tuple(self.yaku_progress[1])),
+            self.current_player, self.turn_phase, self.game_over, self.game_result,
+            tuple(self.unseen_masks), (tuple(self.unseen_month_counts[0]), tuple(self.unseen_month_counts[1])),
+        )
+
+    def restore(self, snapshot):
+        """
+        将状态恢复为 snapshot 记录的状态。未见牌信息取自记录，不重新计算。
+        """
+        self._mask_cache = {}
+        (hand_masks, self.table_mask, collected_masks, pile, self.drawn_id, yaku_points, koikoi_flags,
+         yaku_list, yaku_progress, self.current_player, self.turn_phase, self.game_over, self.game_result,
+         unseen_masks, unseen_month_counts) = snapshot
+        self.hand_masks = list(hand_masks)
+        self.collected_masks = list(collected_masks)
+        self.pile = list(pile)
+        self.yaku_points = {0: yaku_points[0], 1: yaku_points[1]}
+        self.koikoi_flags = {0: koikoi_flags[0], 1: koikoi_flags[1]}
+        self.yaku_list = {0: list(yaku_list[0]), 1: list(yaku_list[1])}
+        self.yaku_progress[0][:] = yaku_progress[0]
+        self.yaku_progress[1][:] = yaku_progress[1]
+        self.unseen_masks = list(unseen_masks)
+        self.unseen_month_counts = {0: list(unseen_month_counts[0]), 1: list(unseen_month_counts[1])}
+        return None
+
+    def _rebuild_unseen(self):
+        """
+        由牌区重新计算各玩家的未见牌掩码与按月份的张数（reset 后使用）。
+        """
+        pile = 0
+        for card_id in self.pile:
+            pile |= 1 << card_id
+        masks, month_counts = unseen_of(self.hand_masks, pile)
+        self.unseen_masks = list(masks)
+        self.unseen_month_counts = {0: list(month_counts[0]), 1: list(month_counts[1])}
+        return None
+
+    def compute_hash(self):
+        """
+        计算当前状态的 Zobrist 哈希，与 HanafudaRules 在同一状态下的 zobrist_hash 相同。
+        """
+        return zobrist_hash(
+            [mask_to_ids(mask) for mask in self.hand_masks], mask_to_ids(self.table_mask),
+            [mask_to_ids(mask) for mask in self.collected_masks], self.pile, self.drawn_id,
+            self.current_player, self.turn_phase, self.koikoi_flags, self.game_over,
+        )
+
+    def clone(self):
+        """
+        返回当前状态的独立副本。
+        """
+        other = BitboardRules.__new__(BitboardRules)
+        other._mask_cache = {}
+        other.yaku_progress = {0: np.zeros(11, dtype=np.float32), 1: np.zeros(11, dtype=np.float32)}
+        other.restore(self.snapshot())
+        return other
+
+    def invalidate_mask_cache(self):
+        """
+        使缓存的动作掩码失效。perform_action / reset / restore 会自动调用；在此之外直接改写状态后需手动调用。
+        """
+        self._mask_cache = {}
+
+    def get_legal_actions_mask(self, player_id):
+        """
+        生成合法动作掩码。每个状态只计算一次，之后返回同一个只读数组。
+        """
+        mask = self._mask_cache.get(player_id)
+        if mask is None:
+            mask = self._compute_legal_actions_mask(player_id)
+            mask.flags.writeable = False
+            self._mask_cache[player_id] = mask
+        return mask
+
+    def _compute_legal_actions_mask(self, player_id):
+        mask = np.zeros(38, dtype=bool)
+
+        if self.current_player != player_id:
+            return mask
+
+        table = self.table_mask
+        if self.turn_phase == 0:  # 出牌阶段
+            hand = self.hand_masks[player_id]
+            slot = 0
+            while hand:
+                low = hand & -hand
+                hand ^= low
+                shift = (low.bit_length() - 1) & ~3
+                matches = NIBBLE_POPCOUNT[(table >> shift) & 0xF]
+                if matches:
+                    mask[slot * 4:slot * 4 + matches] = True
+                else:
+                    mask[slot * 4 + 3] = True
+                slot += 1
+
+        elif self.turn_phase == 1:  # 抽牌配对阶段
+            matches = NIBBLE_POPCOUNT[(table >> (self.drawn_id & ~3)) & 0xF]
+            if matches:
+                mask[32:32 + matches] = True
+            else:
+                mask[32 + 3] = True
+
+        else:  # 叫牌决策阶段
+            mask[36] = True
+            mask[37] = True
+
+        return mask
+
+    def perform_action(self, action, player_id):
+        """
+        根据动作ID执行动作。
+        """
+        self._mask_cache = {}
+        if self.turn_phase == 0:
+            hand = self.hand_masks[player_id]
+            if not hand:
+                self._end_game(winner_id = -1)
+            else:
+                play_card, match_choice = divmod(action, 4)
+                for _ in range(play_card):
+                    hand &= hand - 1  # 去掉最低位，定位第 play_card 张手牌
+                self._play_card((hand & -hand).bit_length() - 1, match_choice, player_id)
+
+        elif self.turn_phase == 1:
+            self._judge_draw(action - 32, player_id)
+
+        elif self.turn_phase == 2:
+            self._judge_koikoi(action - 36, player_id)
+            if not self.game_over:
+                self._draw_card(player_id)
+
+        else:
+            self._judge_koikoi(action - 36, player_id)
+            if not self.game_over:
+                self._end_turn()
+
+        return None
+
+    def _match(self, card_id, choice):
+        """
+        返回场上与 card_id 同月的第 choice 张牌的ID（按ID升序），不存在时返回 -1。
+        """
+        shift = card_id & ~3
+        bits = NIBBLE_BITS[(self.table_mask >> shift) & 0xF]
+        if bits and choice < len(bits):
+            return shift + bits[choice]
+        return -1
+
+    def _play_card(self, card_id, match_choice, player_id):
+        self.hand_masks[player_id] &= ~(1 << card_id)
+        self.unseen_masks[1 - player_id] &= ~(1 << card_id)
+        self.unseen_month_counts[1 - player_id][card_id >> 2] -= 1
+        matched_id = self._match(card_id, match_choice)
+
+        if matched_id >= 0:
+            self.table_mask &= ~(1 << matched_id)
+            self.collected_masks[player_id] |= (1 << card_id) | (1 << matched_id)
+            self._evaluate_yaku(player_id)
+            if self.turn_phase == 0:
+                self._draw_card(player_id)
+        else:
+            self.table_mask |= 1 << card_id
+            self._draw_card(player_id)
+
+        if not self.hand_masks[player_id] and not self.hand_masks[1 - player_id]:
+            self._end_game(winner_id = -1)
+
+        return None
+
+    def _draw_card(self, player_id):
+        self.drawn_id = card_id = self.pile.pop()
+        for player in range(2):
+            self.unseen_masks[player] &= ~(1 << card_id)
+            self.unseen_month_counts[player][card_id >> 2] -= 1
+        self.turn_phase = 1
+        return None
+
+    def _judge_draw(self, draw_choice, player_id):
+        drawn_id = self.drawn_id
+        matched_id = self._match(drawn_id, draw_choice)
+
+        if matched_id >= 0:
+            self.table_mask &= ~(1 << matched_id)
+            self.collected_masks[player_id] |= (1 << drawn_id) | (1 << matched_id)
+            self._evaluate_yaku(player_id)
+            if self.turn_phase == 1:
+                self._end_turn()
+        else:
+            self.table_mask |= 1 << drawn_id
+            self._end_turn()
+
+        return None
+
+    def _evaluate_yaku(self, player_id):
+        """
+        役判定：各牌组张数为收集牌掩码与牌组掩码按位与后的 popcount，役分由 score_yaku 计算。
+        """
+        collected = self.collected_masks[player_id]
+        counts = [(collected & group).bit_count() for group in YAKU_GROUP_MASKS]
+        self.yaku_progress[player_id][:] = [count / size for count, size in zip(counts, YAKU_GROUP_SIZES)]
+        yaku_points, self.yaku_list[player_id] = score_yaku(counts)
+
+        if yaku_points > self.yaku_points[player_id]:
+            self.turn_phase += 2
+            self.yaku_points[player_id] = yaku_points
+
+        return None
+
+    def _judge_koikoi(self, koikoi, player_id):
+        if not koikoi:
+            self.koikoi_flags[player_id] = 0
+            self._end_game(winner_id=player_id)
+        else:
+            self.koikoi_flags[player_id] = 1
+        return None
+
+    def _end_game(self, winner_id):
+        self.game_over = True
+        self.game_result = winner_id
+        return None
+
+    def _end_turn(self):
+        self.current_player = 1 - self.current_player
+        self.turn_phase = 0
+        self.drawn_id = -1
+        return None
@@ -0,0 +1,102 @@
+import os
+
+import numpy as np
+
+from .deals import Deal, opening_wins, shuffle_deals
+from .rules import CARD_CATEGORIES
+
+# 文件格式：16 字节文件头（魔数 + 记录字节数）之后是定长发牌记录的数组，可直接内存映射并按编号随机访问。
+# 多个进程以只读方式映射同一文件时共享操作系统的页缓存，不复制数据。
+BANK_MAGIC = b"HFDEAL01"
+HEADER_SIZE = 16
+
+DEAL_DTYPE = np.dtype([
+    ("order", "u1", (48,)),  # 发牌顺序：玩家0手牌(8) | 玩家1手牌(8) | 场牌(8) | 牌堆(24，末尾先抽)
+    ("first_player", "u1"),
+    ("instant_win", "u1"),  # 开局即有一方手四/食付
+    ("lights", "u1", (3,)),  # 光牌张数：玩家0手牌 | 玩家1手牌 | 场牌
+    ("pairs", "u1", (3,)),  # 至少有2张同月牌的月份数：玩家0手牌 | 玩家1手牌 | 场牌
+    ("reserved", "u1", (8,)),  # 补齐到 64 字节
+])
+assert DEAL_DTYPE.itemsize == 64
+
+_IS_LIGHT = np.array([category == "光" for category in CARD_CATEGORIES])
+
+
+def make_deals(order, first_player):
+    """
+    由 (N, 48) 的发牌顺序与先手玩家批量生成 DEAL_DTYPE 记录，并计算开局特征。
+    """
+    order = np.asarray(order, dtype=np.uint8)
+    deals = np.zeros(len(order), dtype=DEAL_DTYPE)
+    deals["order"] = order
+    deals["first_player"] = first_player
+    win0, win1 = opening_wins(order)
+    deals["instant_win"] = win0 | win1
+
+    # 玩家0手牌、玩家1手牌、场牌三组各8张
+    groups = order[:, :24].reshape(-1, 3, 8)
+    deals["lights"] = _IS_LIGHT[groups].sum(axis=2)
+    month_counts = (groups[..., None] // 4 == np.arange(12)).sum(axis=2)
+    deals["pairs"] = (month_counts >= 2).sum(axis=2)
+    return deals
+
+
+def generate_deal_bank(path, num_deals, seed=0, chunk_size=65536):
+    """
+    生成含 num_deals 局发牌的发牌库文件（覆盖已有文件）。发牌由 np.random.default_rng(seed) 按块批量生成，
+    相同的 seed 与 num_deals 总是得到相同的文件。
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    np_random = np.random.default_rng(seed)
+    with open(path, "wb") as f:
+        f.write(_header())
+        for start in range(0, num_deals, chunk_size):
+            order, first_player = shuffle_deals(np_random, min(chunk_size, num_deals - start))
+            f.write(make_deals(order, first_player).tobytes())
+    return path
+
+
+def _header():
+    return BANK_MAGIC + DEAL_DTYPE.itemsize.to_bytes(4, "little") + bytes(HEADER_SIZE - len(BANK_MAGIC) - 4)
+
+
+class DealBank:
+    """
+    以内存映射方式只读打开发牌库，按编号取出发牌。
+
+    用法：
+        bank = DealBank("results/deals/eval.deals")
+        env = HanafudaEnv(deal_bank=bank)
+        env.reset(options={"deal_index": 123})  # 第 123 局发牌
+
+    DealBank 在进程间传递时只传递文件路径，子进程重新映射同一文件。
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        if header[:len(BANK_MAGIC)] != BANK_MAGIC or int.from_bytes(header[8:12], "little") != DEAL_DTYPE.itemsize:
+            raise ValueError(f"{path} is not a deal bank file")
+        self.path = path
+        count = (os.path.getsize(path) - HEADER_SIZE) // DEAL_DTYPE.itemsize
+        if count:
+            self.deals = np.memmap(path, dtype=DEAL_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,))
+        else:
+            self.deals = np.zeros(0, dtype=DEAL_DTYPE)
+
+    def __len__(self):
+        return len(self.deals)
+
+    def __getitem__(self, index):
+        return self.deals[index]
+
+    def __reduce__(self):
+        return DealBank, (self.path,)
+
+    def deal(self, index):
+        """
+        返回第 index 局的 Deal，可直接传给 HanafudaRules.reset(deal=...)。
+        """
+        record = self.deals[index]
+        return Deal(record["order"].tolist(), int(record["first_player"]), bool(record["instant_win"]))
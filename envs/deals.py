@@ -0,0 +1,92 @@
+from collections import namedtuple
+
+import numpy as np
+
+# 一局的发牌：48张牌的ID顺序（见 Deck.deal_from_order）、先手玩家、是否有一方开局即成手四/食付。
+# 可直接作为 HanafudaRules.reset / BitboardRules.reset 的 deal 参数；instant_win 为 False 时 reset 跳过手四/食付的逐张判定。
+Deal = namedtuple("Deal", ["order", "first_player", "instant_win"])
+
+_IDENTITY = np.arange(48)
+
+
+def shuffle_deals(np_random, count):
+    """
+    一次随机数调用生成 count 局的发牌，返回 ((count, 48) 的牌ID顺序, (count,) 的先手玩家)。
+    count 为 1 时与 Deck.deal + np_random.choice([0, 1]) 消耗相同的随机数、给出相同的发牌。
+    """
+    order = np_random.permuted(np.broadcast_to(_IDENTITY, (count, 48)), axis=1)
+    first_player = np_random.integers(0, 2, size=count)
+    return order, first_player
+
+
+def opening_wins(order):
+    """
+    按发牌顺序批量判定开局的手四（4张同月）与食付（4对同月），返回 (玩家0获胜, 玩家1获胜) 两个布尔数组。
+    判定顺序与 HanafudaRules.reset 相同：玩家0食付时不再判定玩家1，玩家0手四时玩家1只判定手四。
+    """
+    order = np.asarray(order)
+    # 两名玩家手牌的月份直方图 (count, 2, 12)：牌ID // 4 即月份下标
+    months = order[:, :16].reshape(-1, 2, 8) // 4
+    month_counts = (months[..., None] == np.arange(12)).sum(axis=2)
+    four = (month_counts >= 4).any(axis=2)
+    pairs = (month_counts >= 2).sum(axis=2) >= 4
+    win0 = four[:, 0] | pairs[:, 0]
+    checks_player1 = ~(pairs[:, 0] & ~four[:, 0])  # 玩家0食付时跳过玩家1的判定
+    win1 = checks_player1 & (four[:, 1] | (~four[:, 0] & pairs[:, 1]))
+    return win0, win1
+
+
+def mirror_deal(deal):
+    """
+    交换两名玩家的手牌并交换先手，场牌与牌堆不变。复式评估中同一发牌的第二局使用镜像发牌，
+    两个智能体因此各持一次对方的手牌与行动顺序。
+    """
+    order = list(deal[0])
+    instant_win = bool(deal[2]) if len(deal) > 2 else True  # 手四/食付与哪名玩家持有手牌无关
+    return Deal(order[8:16] + order[:8] + order[16:], 1 - int(deal[1]), instant_win)
+
+
+class DealGenerator:
+    """
+    批量预取的发牌生成器：每次从随机数生成器一次取出一批发牌并批量判定手四/食付，逐局交给 reset。
+
+    换用新的随机数生成器（例如 env.reset(seed=...) 重新设定种子）时丢弃预取的发牌，
+    批大小从 1 开始逐批翻倍至 batch_size。因此同一种子之后的发牌序列完全确定，
+    且设定种子后的第一局与逐局调用 Deck.deal 的发牌相同。
+    """
+
+    def __init__(self, batch_size=256):
+        self.batch_size = batch_size
+        self._source = None  # 预取发牌所用的随机数生成器
+        self._deals = []
+        self._position = 0
+        self._next_size = 1
+
+    def next_deal(self, np_random):
+        """
+        返回下一局的 Deal；预取的发牌用完时从 np_random 取出下一批。
+        """
+        if np_random is not self._source:
+            self._source = np_random
+            self._deals = []
+            self._position = 0
+            self._next_size = 1
+        if self._position == len(self._deals):
+            self._refill()
+        deal = self._deals[self._position]
+        self._position += 1
+        return deal
+
+    def _refill(self):
+        if self._next_size == 1:
+            # 设定种子后的第一局单独发牌（随机数消耗与 shuffle_deals(np_random, 1) 相同），手四/食付留给 reset 判定，
+            # 避免每局都重新设定种子时（如评估）批量判定的固定开销
+            self._deals = [Deal(self._source.permutation(48).tolist(), int(self._source.integers(0, 2)), True)]
+            self._position = 0
+            self._next_size = min(2, self.batch_size)
+            return
+        order, first_player = shuffle_deals(self._source, self._next_size)
+        win0, win1 = opening_wins(order)
+        self._deals = list(map(Deal, order.tolist(), first_player.tolist(), (win0 | win1).tolist()))
+        self._position = 0
+        self._next_size = min(2 * self._next_size, self.batch_size)
@@ -1,6 +1,32 @@
+import math
+from operator import attrgetter
+from time import perf_counter
 import gymnasium as gym
 import numpy as np
 from .rules import HanafudaRules
+from .bitboard import BitboardRules
+from .deals import DealGenerator
+from .records import deal_of
+from .timing import TIMER
+
+# 观测缓冲区布局：四个牌区（手牌、场牌、我方收集、对手收集）依次占用 48 位
+HAND_OFFSET, TABLE_OFFSET, MY_COLLECTED_OFFSET, OPP_COLLECTED_OFFSET = 0, 48, 96, 144
+CARDS_SIZE = 192
+CARD_INDEX = np.arange(CARDS_SIZE).reshape(4, 48)  # (牌区, 牌ID) → 缓冲区下标，牌区依次为手牌、场牌、我方收集、对手收集
+CARD_ID = attrgetter("card_id")
+# 扁平观测向量（flat=True）的布局：牌区 | drawn_card 独热(49) | 山牌剩余 | 役分(2) | 叫牌(2) | 役进度(11+11) | 阶段独热(4)
+FLAT_DRAWN_OFFSET = 192
+FLAT_DECK_OFFSET = 241
+FLAT_SCORES_OFFSET = 242
+FLAT_KOIKOI_OFFSET = 244
+FLAT_MY_PROGRESS_OFFSET = 246
+FLAT_OPP_PROGRESS_OFFSET = 257
+FLAT_PHASE_OFFSET = 268
+FLAT_SIZE = 272
+# belief_obs=True 时在扁平向量末尾追加：未见牌 multi-hot(48) | 各月未见张数 / 4 (12)
+FLAT_UNSEEN_OFFSET = 272
+FLAT_UNSEEN_MONTHS_OFFSET = 320
+FLAT_BELIEF_SIZE = 332
 
 
 class HanafudaEnv(gym.Env):
@@ -10,22 +36,29 @@ class HanafudaEnv(gym.Env):
 
     metadata = {"render_modes": ["human", "ansi"], "render_fps": 4}
 
-    def __init__(self, render_mode = None):
+    def __init__(self, render_mode = None, use_bitboard = False, flat = False, auto_advance = False, belief_obs = False,
+                 recorder = None, deal_batch_size = 256, deal_bank = None):
         super().__init__()
         self.render_mode = render_mode
-        self.rules = HanafudaRules()
-
-        # 定义观测量
-        self._hand = np.zeros(48, dtype=np.int8)  # 我方手牌
-        self._table = np.zeros(48, dtype=np.int8)  # 场牌
-        self._my_collected = np.zeros(48, dtype=np.int8)  # 我方收集牌
-        self._opp_collected = np.zeros(48, dtype=np.int8)  # 对手收集牌
+        self.use_bitboard = use_bitboard  # 是否使用位棋盘规则引擎（对局结果与默认引擎完全一致）
+        self.flat = flat  # 是否以单个 Box 向量输出观测
+        self.auto_advance = auto_advance  # 是否在环境内部自动执行行动方唯一合法的后续动作
+        self.belief_obs = belief_obs  # 是否在观测中加入未见牌集合与各月未见张数（由规则引擎增量维护）
+        self.recorder = recorder  # 可选的 GameRecordWriter / GameRecordBuffer，每局结束时写入一条对局记录
+        self._record = None  # 进行中对局的 (种子, 发牌, 已执行的动作)
+        self._skipped_steps = 0  # 上一次 step 中自动执行的动作数
+        # 批量预取发牌（每批一次随机数调用）；为 0 或 None 时每局单独调用 Deck.deal
+        self.deal_generator = DealGenerator(deal_batch_size) if deal_batch_size else None
+        # 可选的 DealBank：给出时按编号从发牌库取发牌（reset 的 options["deal_index"]，否则为种子，再否则依次取下一局）
+        self.deal_bank = deal_bank
+        self._next_deal_index = 0
+        self.rules = BitboardRules() if use_bitboard else HanafudaRules()
+
+        # 定义观测量：所有字段都是预分配缓冲区上的切片，_get_obs 原地写入，不引用规则引擎内部的数组。
+        # 两组缓冲区交替使用，一次返回的观测在下一次 reset/step 之后仍然有效；终局观测此后不再被改写
+        self._obs_buffers = [self._allocate_obs_buffer(), self._allocate_obs_buffer()]
+        self._obs_index = 0  # 下一次写入的缓冲区
         self._drawn_card = 48  # 抽中的牌
-        self._deck_remaining = np.array([1.], dtype=np.float32)  # 山牌剩余数
-        self._current_scores = np.zeros(2, dtype=np.float32)  # 当前役分
-        self._koikoi_flags = np.zeros(2, dtype=np.int8)  # 是否叫牌（双方）
-        self._my_yaku_progress = np.zeros(11, dtype=np.float32)  # 我方役进度表
-        self._opp_yaku_progress = np.zeros(11, dtype=np.float32)  # 对手役进度表
         self._turn_phase = 0  # 游戏阶段
 
         # 定义状态集（observations）
@@ -52,6 +85,18 @@ class HanafudaEnv(gym.Env):
             }
         )
 
+        if belief_obs:
+            self.observation_space = gym.spaces.Dict({
+                **self.observation_space.spaces,
+                # 未见牌信息（对手手牌 + 牌山）
+                "unseen_cards": gym.spaces.MultiBinary(48),  # 未见牌集合
+                "unseen_month_counts": gym.spaces.Box(low=0, high=1, shape=(12,), dtype=np.float32),  # 各月未见张数 / 4
+            })
+
+        if flat:
+            flat_size = FLAT_BELIEF_SIZE if belief_obs else FLAT_SIZE
+            self.observation_space = gym.spaces.Box(low=0, high=1, shape=(flat_size,), dtype=np.float32)
+
         # 定义动作
         self._action = {}
         # 出牌动作
@@ -71,67 +116,129 @@ class HanafudaEnv(gym.Env):
         # 跟踪当前玩家
         self.current_player = 0 
     
+    def _allocate_obs_buffer(self):
+        """
+        分配一组观测缓冲区，返回 {字段名: 缓冲区上的切片}。
+        """
+        if self.flat:
+            flat_obs = np.zeros(FLAT_BELIEF_SIZE if self.belief_obs else FLAT_SIZE, dtype=np.float32)  # 扁平观测向量
+            buffer = {
+                "flat": flat_obs,
+                "cards": flat_obs[:CARDS_SIZE],
+                "drawn_onehot": flat_obs[FLAT_DRAWN_OFFSET:FLAT_DECK_OFFSET],
+                "deck_remaining": flat_obs[FLAT_DECK_OFFSET:FLAT_SCORES_OFFSET],
+                "current_scores": flat_obs[FLAT_SCORES_OFFSET:FLAT_KOIKOI_OFFSET],
+                "koikoi_flags": flat_obs[FLAT_KOIKOI_OFFSET:FLAT_MY_PROGRESS_OFFSET],
+                "my_yaku_progress": flat_obs[FLAT_MY_PROGRESS_OFFSET:FLAT_OPP_PROGRESS_OFFSET],
+                "opp_yaku_progress": flat_obs[FLAT_OPP_PROGRESS_OFFSET:FLAT_PHASE_OFFSET],
+                "phase_onehot": flat_obs[FLAT_PHASE_OFFSET:FLAT_SIZE],
+                "unseen_cards": flat_obs[FLAT_UNSEEN_OFFSET:FLAT_UNSEEN_MONTHS_OFFSET],
+                "unseen_month_counts": flat_obs[FLAT_UNSEEN_MONTHS_OFFSET:FLAT_BELIEF_SIZE],
+            }
+        else:
+            binary_obs = np.zeros(CARDS_SIZE + 2, dtype=np.int8)  # 牌区 + 叫牌标志
+            numeric_obs = np.zeros(25, dtype=np.float32)  # 山牌剩余 + 役分 + 役进度
+            buffer = {
+                "cards": binary_obs[:CARDS_SIZE],
+                "koikoi_flags": binary_obs[CARDS_SIZE:],  # 是否叫牌（双方）
+                "deck_remaining": numeric_obs[0:1],  # 山牌剩余数
+                "current_scores": numeric_obs[1:3],  # 当前役分
+                "my_yaku_progress": numeric_obs[3:14],  # 我方役进度表
+                "opp_yaku_progress": numeric_obs[14:25],  # 对手役进度表
+                "unseen_cards": np.zeros(48, dtype=np.int8),  # 未见牌（对手手牌 + 牌山）
+                "unseen_month_counts": np.zeros(12, dtype=np.float32),  # 各月未见张数 / 4
+            }
+        cards = buffer["cards"]
+        buffer["hand"] = cards[HAND_OFFSET:TABLE_OFFSET]  # 我方手牌
+        buffer["table"] = cards[TABLE_OFFSET:MY_COLLECTED_OFFSET]  # 场牌
+        buffer["my_collected"] = cards[MY_COLLECTED_OFFSET:OPP_COLLECTED_OFFSET]  # 我方收集牌
+        buffer["opp_collected"] = cards[OPP_COLLECTED_OFFSET:]  # 对手收集牌
+        buffer["deck_remaining"][0] = 1.
+        return buffer
+
     def _get_obs(self, player_id):
         """
         更新并输出当前状态（指定玩家）。
         """
+        timed = TIMER.enabled
+        if timed:
+            start = perf_counter()
         opp_id = 1 - player_id
         # 更新阶段
         self._turn_phase = self.rules.turn_phase
 
-        # 从规则引擎获取全局信息
-        hand = self.rules.player_hands[player_id]
-        table = self.rules.table_cards
-        my_collected_cards = self.rules.collected_cards[player_id]
-        opp_collected_cards = self.rules.collected_cards[opp_id]
-
-        # 清空牌组状态
-        self._hand.fill(0)
-        self._table.fill(0)
-        self._my_collected.fill(0)
-        self._opp_collected.fill(0)
-
-        # 更新牌面信息
-        for card in hand: self._hand[card.card_id] = 1
-        for card in table: self._table[card.card_id] = 1
-        for card in my_collected_cards: self._my_collected[card.card_id] = 1
-        for card in opp_collected_cards: self._opp_collected[card.card_id] = 1
-
-        # 更新抽牌
-        if self._turn_phase == 1:
-            self._drawn_card = self.rules.drawn_card.card_id
+        rules = self.rules
+        buffer = self._obs_buffers[self._obs_index]
+        self._obs_index ^= 1
+        cards = buffer["cards"]
+
+        # 更新牌面信息：四个牌区一次性写入缓冲区
+        if self.use_bitboard:
+            # 位棋盘引擎：四个掩码拼成 24 字节后一次展开
+            packed = b"".join(mask.to_bytes(6, "little") for mask in (
+                rules.hand_masks[player_id], rules.table_mask,
+                rules.collected_masks[player_id], rules.collected_masks[opp_id],
+            ))
+            cards[:] = np.unpackbits(np.frombuffer(packed, dtype=np.uint8), bitorder="little")
+            self._drawn_card = rules.drawn_id if self._turn_phase == 1 else 48
+            deck_remaining = len(rules.pile)
         else:
-            self._drawn_card = 48
-
-        # 更新山牌剩余数
-        self._deck_remaining[0] = len(self.rules.draw_pile) / 24
-
-        # 更新当前役分
-        self._current_scores[0] = np.tanh(self.rules.yaku_points[player_id] / 5.0)
-        self._current_scores[1] = np.tanh(self.rules.yaku_points[opp_id] / 5.0)
-
-        # 更新叫牌情况
-        self._koikoi_flags[0] = self.rules.koikoi_flags[player_id]
-        self._koikoi_flags[1] = self.rules.koikoi_flags[opp_id]
-
-        # 更新役进度
-        self._my_yaku_progress = self.rules.yaku_progress[player_id]
-        self._opp_yaku_progress = self.rules.yaku_progress[opp_id]
-
-        return {
-            "hand": self._hand, 
-            "table": self._table,
-            "my_collected": self._my_collected,
-            "opp_collected": self._opp_collected,
-            "drawn_card": self._drawn_card,
-            "deck_remaining": self._deck_remaining,
-            "current_scores": self._current_scores,
-            "koikoi_flags": self._koikoi_flags,
-            "my_yaku_progress": self._my_yaku_progress,
-            "opp_yaku_progress": self._opp_yaku_progress,
-            "turn_phase": self._turn_phase,
-        }
-    
+            # 各牌的 (牌区, 牌ID) 经预先计算的 CARD_INDEX 映射为缓冲区下标，一次花式索引写入
+            hand, table = rules.player_hands[player_id], rules.table_cards
+            my_collected, opp_collected = rules.collected_cards[player_id], rules.collected_cards[opp_id]
+            card_ids = [*map(CARD_ID, hand), *map(CARD_ID, table), *map(CARD_ID, my_collected), *map(CARD_ID, opp_collected)]
+            zones = [0] * len(hand) + [1] * len(table) + [2] * len(my_collected) + [3] * len(opp_collected)
+            cards.fill(0)
+            cards[CARD_INDEX[zones, card_ids]] = 1
+            self._drawn_card = rules.drawn_card.card_id if self._turn_phase == 1 else 48
+            deck_remaining = len(rules.draw_pile)
+
+        # 更新山牌剩余数、当前役分、叫牌情况
+        buffer["deck_remaining"][0] = deck_remaining / 24
+        current_scores = buffer["current_scores"]
+        current_scores[0] = math.tanh(rules.yaku_points[player_id] / 5.0)
+        current_scores[1] = math.tanh(rules.yaku_points[opp_id] / 5.0)
+        koikoi_flags = buffer["koikoi_flags"]
+        koikoi_flags[0] = rules.koikoi_flags[player_id]
+        koikoi_flags[1] = rules.koikoi_flags[opp_id]
+
+        # 更新役进度（复制数值，观测不随规则引擎的后续变化而改变）
+        buffer["my_yaku_progress"][:] = rules.yaku_progress[player_id]
+        buffer["opp_yaku_progress"][:] = rules.yaku_progress[opp_id]
+
+        if self.belief_obs:
+            # 规则引擎已增量维护未见牌掩码与各月张数，这里只需展开
+            unseen = rules.unseen_masks[player_id].to_bytes(6, "little")
+            buffer["unseen_cards"][:] = np.unpackbits(np.frombuffer(unseen, dtype=np.uint8), bitorder="little")
+            np.multiply(rules.unseen_month_counts[player_id], 0.25, out=buffer["unseen_month_counts"])
+
+        if self.flat:
+            buffer["drawn_onehot"].fill(0)
+            buffer["drawn_onehot"][self._drawn_card] = 1
+            buffer["phase_onehot"].fill(0)
+            buffer["phase_onehot"][self._turn_phase] = 1
+            observation = buffer["flat"]
+        else:
+            observation = {
+                "hand": buffer["hand"],
+                "table": buffer["table"],
+                "my_collected": buffer["my_collected"],
+                "opp_collected": buffer["opp_collected"],
+                "drawn_card": self._drawn_card,
+                "deck_remaining": buffer["deck_remaining"],
+                "current_scores": current_scores,
+                "koikoi_flags": koikoi_flags,
+                "my_yaku_progress": buffer["my_yaku_progress"],
+                "opp_yaku_progress": buffer["opp_yaku_progress"],
+                "turn_phase": self._turn_phase,
+            }
+            if self.belief_obs:
+                observation["unseen_cards"] = buffer["unseen_cards"]
+                observation["unseen_month_counts"] = buffer["unseen_month_counts"]
+        if timed:
+            TIMER.time("env/get_obs", start)
+        return observation
+
     def _get_info(self, reward = 0):
         """
         输出动作掩码和当前玩家信息。
@@ -140,20 +247,37 @@ class HanafudaEnv(gym.Env):
             reward_dict = {self.current_player: reward, 1 - self.current_player: 0}
         else:
             reward_dict = {self.current_player: reward, 1 - self.current_player: -reward}
-        return {
+        info = {
             "action_mask": self.get_action_mask(),
             "current_player": self.current_player,
             "reward_dict": reward_dict
         }
+        if self.auto_advance:
+            info["skipped_steps"] = self._skipped_steps
+        return info
 
     def reset(self, seed = None, options=None):
         """
         重置游戏状态，返回初始 observation 和 info。
+        options={"deal": (48张牌的ID顺序, 先手玩家)} 按给出的发牌开局；
+        使用发牌库时，options={"deal_index": i} 取第 i 局发牌（对库大小取模）。
         """
         super().reset(seed=seed)
-        self.rules.reset(np_random=self.np_random)
+        if options and "deal" in options:
+            self.rules.reset(deal=options["deal"])
+        elif self.deal_bank is not None:
+            index = (options or {}).get("deal_index", seed if seed is not None else self._next_deal_index)
+            self.rules.reset(deal=self.deal_bank.deal(index % len(self.deal_bank)))
+            self._next_deal_index = index + 1
+        elif self.deal_generator is None:
+            self.rules.reset(np_random=self.np_random)
+        else:
+            self.rules.reset(deal=self.deal_generator.next_deal(self.np_random))
         self.current_player = self.rules.current_player
         self._turn_phase = 0
+        self._skipped_steps = 0
+        if self.recorder is not None:
+            self._record = (seed, deal_of(self.rules), [])
 
         observation = self._get_obs(self.current_player)
         info = self._get_info()
@@ -164,9 +288,13 @@ class HanafudaEnv(gym.Env):
         """
         执行动作，返回新的状态、奖励、是否终止、是否截断和额外信息。
         """
+        timed = TIMER.enabled
+        if timed:
+            start = perf_counter()
         player_id = self.rules.current_player
         former_points = self.rules.yaku_points[player_id]
         mask = self.get_action_mask()
+        self._skipped_steps = 0
 
         terminated = False # 游戏继续
         truncated = False
@@ -180,6 +308,8 @@ class HanafudaEnv(gym.Env):
 
         else:
             self.rules.perform_action(action, player_id)
+            if self._record is not None:
+                self._record[2].append(int(action))
             latter_points = self.rules.yaku_points[player_id]
 
             terminated = self.rules.game_over # 判断终止
@@ -187,16 +317,56 @@ class HanafudaEnv(gym.Env):
 
             self.current_player = self.rules.current_player # 更新当前玩家
 
+            if self.auto_advance:
+                reward += self._advance_forced_actions(player_id)
+                terminated = self.rules.game_over
+
+            if terminated and self._record is not None:
+                seed, deal, actions = self._record
+                self.recorder.add(seed, deal, actions, self.rules.game_result, (self.rules.yaku_points[0], self.rules.yaku_points[1]))
+                self._record = None
+
         # 返回新状态
         observation = self._get_obs(self.current_player)
+        if terminated:
+            # 终局观测交给调用方后不再写入：换上一组新的缓冲区，自动重置与对手的后续行动不会改写它
+            self._obs_buffers[self._obs_index ^ 1] = self._allocate_obs_buffer()
         info = self._get_info(reward)
+        if timed:
+            TIMER.time("env/step", start)
 
         return observation, reward, terminated, truncated, info
 
+    def _advance_forced_actions(self, player_id):
+        """
+        只要仍轮到 player_id 且其合法动作唯一（如无配对或只有一张可配对的抽牌），就直接执行该动作，
+        返回这些动作的奖励之和，执行次数记入 info["skipped_steps"]。
+        """
+        reward = 0.
+        self._skipped_steps = 0
+        while not self.rules.game_over and self.rules.current_player == player_id:
+            legal = np.flatnonzero(self.rules.get_legal_actions_mask(player_id))
+            if len(legal) != 1:
+                break
+            self._turn_phase = self.rules.turn_phase  # _calculate_reward 按执行动作前的阶段计算奖励
+            former_points = self.rules.yaku_points[player_id]
+            self.rules.perform_action(int(legal[0]), player_id)
+            if self._record is not None:
+                self._record[2].append(int(legal[0]))
+            reward += self._calculate_reward(former_points, self.rules.yaku_points[player_id])
+            self.current_player = self.rules.current_player
+            self._skipped_steps += 1
+        return reward
+
     def get_action_mask(self):
         """
         根据当前游戏阶段和局面，生成合法的动作掩码。
         """
+        if TIMER.enabled:
+            start = perf_counter()
+            mask = self.rules.get_legal_actions_mask(self.current_player)
+            TIMER.time("env/action_mask", start)
+            return mask
         mask = self.rules.get_legal_actions_mask(self.current_player)
             
         return mask
@@ -319,6 +489,7 @@ class HanafudaEnv(gym.Env):
 
     def close(self):
         """
-        清理环境资源。
+        清理环境资源（写入对局记录器中尚未落盘的记录）。
         """
-        pass
\ No newline at end of file
+        if self.recorder is not None:
+            self.recorder.close()
\ No newline at end of file
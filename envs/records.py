@@ -0,0 +1,191 @@
+import os
+
+import numpy as np
+
+from .rules import HanafudaRules
+
+# 文件格式：16 字节文件头（魔数 + 记录字节数）之后是定长记录的数组，可直接内存映射并按对局编号随机访问
+RECORD_MAGIC = b"HFREC001"
+HEADER_SIZE = 16
+MAX_ACTIONS = 64  # 每名玩家最多 8 回合，每回合最多 4 个动作（出牌、叫牌、抽牌配对、叫牌）
+NO_ACTION = 255  # actions 中未使用的位置
+
+RECORD_DTYPE = np.dtype([
+    ("seed", "<i8"),  # reset 的种子（未给出时为 -1）
+    ("deal", "u1", (48,)),  # 初始发牌：玩家0手牌(8) | 玩家1手牌(8) | 场牌(8) | 牌堆(24，末尾先抽)
+    ("first_player", "u1"),
+    ("num_actions", "u1"),
+    ("actions", "u1", (MAX_ACTIONS,)),  # 按执行顺序的动作ID（包括环境自动执行的动作）
+    ("winner", "i1"),  # 对局结果（-1 为平局）
+    ("points", "u1", (2,)),  # 双方役分
+    ("reserved", "u1", (3,)),  # 补齐到 128 字节
+])
+assert RECORD_DTYPE.itemsize == 128
+
+
+def deal_of(rules):
+    """
+    返回规则引擎当前发牌的 (48张牌的ID顺序, 先手玩家)，可传给 HanafudaRules.reset(deal=...)。需在 reset 之后、第一个动作之前调用。
+    """
+    order = [card.card_id for hand in rules.player_hands for card in hand]
+    order += [card.card_id for card in rules.table_cards]
+    order += [card.card_id for card in rules.draw_pile]
+    return np.array(order, dtype=np.uint8), int(rules.current_player)
+
+
+def make_record(seed, deal, actions, winner, points):
+    """
+    生成一条记录（RECORD_DTYPE 的标量）。
+    """
+    if len(actions) > MAX_ACTIONS:
+        raise ValueError(f"A game record holds at most {MAX_ACTIONS} actions, got {len(actions)}")
+    record = np.zeros((), dtype=RECORD_DTYPE)
+    record["seed"] = -1 if seed is None else seed
+    record["deal"] = deal[0]
+    record["first_player"] = deal[1]
+    record["num_actions"] = len(actions)
+    record["actions"] = NO_ACTION
+    record["actions"][:len(actions)] = actions
+    record["winner"] = -1 if winner is None else winner
+    record["points"] = points
+    return record
+
+
+class GameRecordBuffer:
+    """
+    在内存中收集对局记录（接口与 GameRecordWriter 相同），用于在子进程中记录后交给主进程写入文件。
+    """
+
+    def __init__(self):
+        self._records = []
+
+    def __len__(self):
+        return len(self._records)
+
+    def add(self, seed, deal, actions, winner, points):
+        self._records.append(make_record(seed, deal, actions, winner, points))
+
+    def records(self):
+        return np.array(self._records, dtype=RECORD_DTYPE).reshape(-1)
+
+    def close(self):
+        return None
+
+
+class GameRecordWriter(GameRecordBuffer):
+    """
+    把对局记录按块追加到记录文件；文件已存在时在末尾继续追加。
+
+    记录先在内存中攒满 chunk_size 条再一次写入，close（或作为上下文管理器退出）时写入剩余部分。
+    """
+
+    def __init__(self, path, chunk_size=65536):
+        super().__init__()
+        self.path = path
+        self.chunk_size = chunk_size
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, "wb") as f:
+                f.write(_header())
+        else:
+            _check_header(path)
+
+    def add(self, seed, deal, actions, winner, points):
+        super().add(seed, deal, actions, winner, points)
+        if len(self._records) >= self.chunk_size:
+            self.flush()
+
+    def add_records(self, records):
+        """
+        追加一批 RECORD_DTYPE 记录。
+        """
+        self.flush()
+        with open(self.path, "ab") as f:
+            f.write(np.ascontiguousarray(records, dtype=RECORD_DTYPE).tobytes())
+
+    def flush(self):
+        if self._records:
+            records = self.records()
+            self._records = []
+            with open(self.path, "ab") as f:
+                f.write(records.tobytes())
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _header():
+    return RECORD_MAGIC + RECORD_DTYPE.itemsize.to_bytes(4, "little") + bytes(HEADER_SIZE - len(RECORD_MAGIC) - 4)
+
+
+def _check_header(path):
+    with open(path, "rb") as f:
+        header = f.read(HEADER_SIZE)
+    if header[:len(RECORD_MAGIC)] != RECORD_MAGIC or int.from_bytes(header[8:12], "little") != RECORD_DTYPE.itemsize:
+        raise ValueError(f"{path} is not a game record file")
+
+
+def replay(record, num_actions=None, rules=None):
+    """
+    从记录的发牌开始，经 HanafudaRules 重新执行前 num_actions 个动作（默认全部），返回得到的规则引擎。
+    """
+    rules = rules if rules is not None else HanafudaRules()
+    rules.reset(deal=(record["deal"], record["first_player"]))
+    count = int(record["num_actions"]) if num_actions is None else num_actions
+    for action in record["actions"][:count]:
+        rules.perform_action(int(action), rules.current_player)
+    return rules
+
+
+class GameRecords:
+    """
+    以内存映射方式只读打开记录文件，按对局编号随机访问。
+
+    用法：
+        records = GameRecords("results/records/eval.rec")
+        rules = records.replay(12345, num_actions=10)  # 第 12345 局执行 10 个动作后的局面
+    """
+
+    def __init__(self, path):
+        _check_header(path)
+        self.path = path
+        count = (os.path.getsize(path) - HEADER_SIZE) // RECORD_DTYPE.itemsize
+        if count:
+            self.records = np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=RECORD_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        return self.records[index]
+
+    def actions(self, index):
+        record = self.records[index]
+        return record["actions"][:record["num_actions"]].astype(np.int64)
+
+    def replay(self, index, num_actions=None, rules=None):
+        """
+        重建第 index 局执行前 num_actions 个动作（默认全部）后的局面。
+        """
+        return replay(self.records[index], num_actions, rules)
+
+    def positions(self, index):
+        """
+        依次产生第 index 局每个动作执行前的 (规则引擎, 行动玩家, 动作)；规则引擎对象在各步之间复用。
+        """
+        record = self.records[index]
+        rules = HanafudaRules()
+        rules.reset(deal=(record["deal"], record["first_player"]))
+        for action in self.actions(index):
+            player = rules.current_player
+            yield rules, player, int(action)
+            rules.perform_action(int(action), player)
@@ -1,154 +1,78 @@
+from collections import namedtuple
+
 import numpy as np
 
 class Card:
     """
     花札牌类，表示一张花札牌。
+
+    48张牌对象全部位于模块级的 CARDS 目录中、在进程内共享且不可修改；
+    复制或反序列化时返回目录中的同一对象，因此不同规则引擎、不同环境之间可以直接按身份比较牌。
     """
 
+    __slots__ = ("card_id", "month", "category", "points", "card_name")
+
     def __init__(self, card_id, month, category, points, card_name):
-        self.card_id = card_id  # 牌的全局唯一ID（0-47）
-        self.month = month      # 月份（1-12，对应1-12月）
-        self.category = category  # 牌的类型："光"、"种"、"短册"、"佳士"
-        self.points = points    # 牌的基础分数
-        self.card_name = card_name  # 牌的名称
+        object.__setattr__(self, "card_id", card_id)  # 牌的全局唯一ID（0-47）
+        object.__setattr__(self, "month", month)  # 月份（1-12，对应1-12月）
+        object.__setattr__(self, "category", category)  # 牌的类型："光"、"种"、"短册"、"佳士"
+        object.__setattr__(self, "points", points)  # 牌的基础分数
+        object.__setattr__(self, "card_name", card_name)  # 牌的名称
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Card is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Card is immutable")
+
+    def __reduce__(self):
+        return card_by_id, (self.card_id,)
 
     def __repr__(self):
         return f"Card(id={self.card_id}, month={self.month}, category='{self.category}', points={self.points}, name='{self.card_name}')"
 
 
+# 各月份的4张牌（类型, 名称），按牌ID顺序排列（第 m 月的牌ID为 4*(m-1) 到 4*(m-1)+3）
+_MONTH_CARDS = (
+    (("光", "松上鹤"), ("短册", "松上赤短"), ("佳士", "松"), ("佳士", "松")),  # 一月 - 松
+    (("种", "梅上莺"), ("短册", "梅上赤短"), ("佳士", "梅"), ("佳士", "梅")),  # 二月 - 梅
+    (("光", "樱上幕"), ("短册", "樱上赤短"), ("佳士", "樱"), ("佳士", "樱")),  # 三月 - 樱
+    (("种", "藤上杜鹃"), ("短册", "藤上短册"), ("佳士", "藤"), ("佳士", "藤")),  # 四月 - 藤
+    (("种", "溪间八桥"), ("短册", "溪上短册"), ("佳士", "溪"), ("佳士", "溪")),  # 五月 - 菖蒲
+    (("种", "牡丹上蝶"), ("短册", "牡丹青短"), ("佳士", "牡丹"), ("佳士", "牡丹")),  # 六月 - 牡丹
+    (("种", "萩间野猪"), ("短册", "萩上短册"), ("佳士", "萩"), ("佳士", "萩")),  # 七月 - 萩
+    (("光", "芒上月"), ("种", "芒上雁"), ("佳士", "芒"), ("佳士", "芒")),  # 八月 - 芒
+    (("种", "菊上杯"), ("短册", "菊上青短"), ("佳士", "菊"), ("佳士", "菊")),  # 九月 - 菊
+    (("种", "枫间鹿"), ("短册", "枫上青短"), ("佳士", "枫"), ("佳士", "枫")),  # 十月 - 枫
+    (("光", "柳间小野道风"), ("种", "柳间燕"), ("短册", "柳上短册"), ("佳士", "柳")),  # 十一月 - 柳
+    (("光", "桐上凤凰"), ("佳士", "桐"), ("佳士", "桐"), ("佳士", "桐")),  # 十二月 - 桐
+)
+CATEGORY_POINTS = {"光": 20, "种": 10, "短册": 5, "佳士": 1}  # 牌类型 → 基础分数
+
+# 进程内共享的牌目录（下标即牌ID）
+CARDS = tuple(
+    Card(4 * (month - 1) + slot, month, category, CATEGORY_POINTS[category], card_name)
+    for month, month_cards in enumerate(_MONTH_CARDS, start=1)
+    for slot, (category, card_name) in enumerate(month_cards)
+)
+CARD_MONTHS = tuple(card.month for card in CARDS)  # 牌ID → 月份
+CARD_CATEGORIES = tuple(card.category for card in CARDS)  # 牌ID → 类型
+CARD_POINTS = tuple(card.points for card in CARDS)  # 牌ID → 基础分数
+
+
+def card_by_id(card_id):
+    """
+    返回牌目录中的牌对象。
+    """
+    return CARDS[card_id]
+
+
 class Deck:
     """
-    花札牌组类，管理牌的初始化和发牌逻辑。
+    花札牌组类，管理发牌逻辑。牌对象来自共享的 CARDS 目录，建立 Deck 不会复制牌。
     """
 
-    def __init__(self):
-        self.cards = self._initialize_deck()
-
-    def _initialize_deck(self):
-        """
-        初始化花札牌组，共48张牌。
-        """
-        cards = []
-        card_id = 0
-
-        # 月份与牌的定义（1-12月）
-        months = [
-            ("松", ["光", "短册", "佳士", "佳士"]),
-            ("梅", ["种", "短册", "佳士", "佳士"]),
-            ("樱", ["光", "短册", "佳士", "佳士"]),
-            ("藤", ["种", "短册", "佳士", "佳士"]),
-            ("菖蒲", ["种", "短册", "佳士", "佳士"]),
-            ("牡丹", ["种", "短册", "佳士", "佳士"]),
-            ("萩", ["种", "短册", "佳士", "佳士"]),
-            ("芒", ["光", "种", "佳士", "佳士"]),
-            ("菊", ["种", "短册", "佳士", "佳士"]),
-            ("枫", ["种", "短册", "佳士", "佳士"]),
-            ("柳", ["光", "种", "短册", "佳士"]),
-            ("桐", ["光", "佳士", "佳士", "佳士"]),
-        ]
-
-        # 为每个月创建4张牌
-        for month_idx, (month_name, categories) in enumerate(months, start=1):
-            for category in categories:
-                # 根据牌类型分配基础分数
-                if category == "光":
-                    points = 20
-                elif category == "种":
-                    points = 10
-                elif category == "短册":
-                    points = 5
-                else:
-                    points = 1
-
-                # 根据月份和类别生成牌的名称
-                if month_idx == 1:  # 一月 - 松
-                    if category == "光":
-                        card_name = "松上鹤"
-                    elif category == "短册":
-                        card_name = "松上赤短"
-                    else:
-                        card_name = "松"
-                elif month_idx == 2:  # 二月 - 梅
-                    if category == "种":
-                        card_name = "梅上莺"
-                    elif category == "短册":
-                        card_name = "梅上赤短"
-                    else:
-                        card_name = "梅"
-                elif month_idx == 3:  # 三月 - 樱
-                    if category == "光":
-                        card_name = "樱上幕"
-                    elif category == "短册":
-                        card_name = "樱上赤短"
-                    else:
-                        card_name = "樱"
-                elif month_idx == 4:  # 四月 - 藤
-                    if category == "种":
-                        card_name = "藤上杜鹃"
-                    elif category == "短册":
-                        card_name = "藤上短册"
-                    else:
-                        card_name = "藤"
-                elif month_idx == 5:  # 五月 - 菖蒲
-                    if category == "种":
-                        card_name = "溪间八桥"
-                    elif category == "短册":
-                        card_name = "溪上短册"
-                    else:
-                        card_name = "溪"
-                elif month_idx == 6:  # 六月 - 牡丹
-                    if category == "种":
-                        card_name = "牡丹上蝶"
-                    elif category == "短册":
-                        card_name = "牡丹青短"
-                    else:
-                        card_name = "牡丹"
-                elif month_idx == 7:  # 七月 - 萩
-                    if category == "种":
-                        card_name = "萩间野猪"
-                    elif category == "短册":
-                        card_name = "萩上短册"
-                    else:
-                        card_name = "萩"
-                elif month_idx == 8:  # 八月 - 芒
-                    if category == "光":
-                        card_name = "芒上月"
-                    elif category == "种":
-                        card_name = "芒上雁"
-                    else:
-                        card_name = "芒"
-                elif month_idx == 9:  # 九月 - 菊
-                    if category == "种":
-                        card_name = "菊上杯"
-                    elif category == "短册":
-                        card_name = "菊上青短"
-                    else:
-                        card_name = "菊"
-                elif month_idx == 10:  # 十月 - 枫
-                    if category == "种":
-                        card_name = "枫间鹿"
-                    elif category == "短册":
-                        card_name = "枫上青短"
-                    else:
-                        card_name = "枫"
-                elif month_idx == 11:  # 十一月 - 柳
-                    if category == "光":
-                        card_name = "柳间小野道风"
-                    elif category == "种":
-                        card_name = "柳间燕"
-                    elif category == "短册":
-                        card_name = "柳上短册"
-                    else:
-                        card_name = "柳"
-                elif month_idx == 12:  # 十二月 - 桐
-                    if category == "光":
-                        card_name = "桐上凤凰"
-                    else:
-                        card_name = "桐"
-                cards.append(Card(card_id, month_idx, category, points, card_name))
-                card_id += 1
-
-        return cards
+    cards = CARDS
 
     def deal(self, np_random = None):
         """
@@ -159,29 +83,184 @@ class Deck:
         """
         if np_random is None:
             np_random = np.random.default_rng()
-        shuffled_cards = np_random.permutation(self.cards)
-        shuffled_cards = list(shuffled_cards)
+        return self.deal_from_order(np_random.permutation(len(CARDS)))
 
-        # 玩家手牌（每人8张）
-        player1_hand = sorted(shuffled_cards[:8], key=lambda card: card.card_id)
-        player2_hand = sorted(shuffled_cards[8:16], key=lambda card: card.card_id)
+    def deal_from_order(self, order):
+        """
+        按给定的牌ID顺序发牌：前8张为玩家0手牌，接着8张为玩家1手牌，再8张为场牌，其余为牌堆（末尾先抽）。
+        发牌只对牌ID排序，最后才换成牌对象。
+        """
+        order = order.tolist() if isinstance(order, np.ndarray) else [int(card_id) for card_id in order]
+        cards = CARDS
 
-        # 场牌（8张）
-        table_cards = sorted(shuffled_cards[16:24], key=lambda card: card.card_id)
+        # 玩家手牌（每人8张）与场牌（8张）
+        player1_hand = [cards[card_id] for card_id in sorted(order[:8])]
+        player2_hand = [cards[card_id] for card_id in sorted(order[8:16])]
+        table_cards = [cards[card_id] for card_id in sorted(order[16:24])]
 
         # 剩余牌堆
-        draw_pile = shuffled_cards[24:]
+        draw_pile = [cards[card_id] for card_id in order[24:]]
 
         return [player1_hand, player2_hand], table_cards, draw_pile
 
 
+DECK = Deck()  # 共享的牌组（无状态）
+
+
+# 役种牌组（下标与 yaku_progress 一致）及各组的归一化分母
+# 0 雨光, 1 其余光牌, 2 樱上幕, 3 菊上杯, 4 芒上月, 5 猪鹿蝶, 6 赤短, 7 青短, 8 短册, 9 种, 10 佳士
+YAKU_GROUP_SIZES = (1, 4, 1, 1, 1, 3, 3, 3, 5, 5, 10)
+
+
+def _build_yaku_group_table(cards):
+    """
+    预计算每张牌所属的役种牌组（牌ID → 牌组下标元组）。
+    """
+    table = []
+    for card in cards:
+        groups = []
+        if card.card_name == "柳间小野道风":
+            groups.append(0)
+        if card.category == "光" and card.card_name != "柳间小野道风":
+            groups.append(1)
+        if card.card_name == "樱上幕":
+            groups.append(2)
+        if card.card_name == "菊上杯":
+            groups.append(3)
+        if card.card_name == "芒上月":
+            groups.append(4)
+        if card.card_name in ["萩间野猪", "枫间鹿", "牡丹上蝶"]:
+            groups.append(5)
+        if card.card_name in ["松上赤短", "梅上赤短", "樱上赤短"]:
+            groups.append(6)
+        if card.card_name in ["牡丹青短", "菊上青短", "枫上青短"]:
+            groups.append(7)
+        if card.category == "短册":
+            groups.append(8)
+        if card.category == "种":
+            groups.append(9)
+        if card.category == "佳士":
+            groups.append(10)
+        table.append(tuple(groups))
+    return table
+
+
+YAKU_GROUP_TABLE = _build_yaku_group_table(CARDS)  # 牌ID → 所属役种牌组下标
+
+
+# Zobrist 哈希的随机键（固定种子生成，各进程、各次运行一致）
+# 牌区下标：0/1 为玩家手牌，2 为场牌，3/4 为玩家收集牌
+ZONE_HAND, ZONE_TABLE, ZONE_COLLECTED = 0, 2, 3
+_zobrist_rng = np.random.default_rng(0x5A0B8157)
+ZOBRIST_ZONE = [[int(key) for key in row] for row in _zobrist_rng.integers(0, 2**64, size=(5, 48), dtype=np.uint64)]
+ZOBRIST_PILE = [[int(key) for key in row] for row in _zobrist_rng.integers(0, 2**64, size=(24, 48), dtype=np.uint64)]  # 牌山位置 × 牌ID
+ZOBRIST_DRAWN = [int(key) for key in _zobrist_rng.integers(0, 2**64, size=48, dtype=np.uint64)]
+ZOBRIST_PHASE = [int(key) for key in _zobrist_rng.integers(0, 2**64, size=4, dtype=np.uint64)]
+ZOBRIST_KOIKOI = [int(key) for key in _zobrist_rng.integers(0, 2**64, size=2, dtype=np.uint64)]
+ZOBRIST_PLAYER, ZOBRIST_GAME_OVER = (int(key) for key in _zobrist_rng.integers(0, 2**64, size=2, dtype=np.uint64))
+ZOBRIST_DECISION = [ZOBRIST_PHASE[phase] ^ ZOBRIST_PHASE[phase + 2] for phase in (0, 1)]  # 出牌/抽牌阶段 → 对应叫牌阶段
+
+
+def zobrist_hash(player_hands, table, collected, pile, drawn_id, current_player, turn_phase, koikoi_flags, game_over):
+    """
+    从头计算状态的 64 位 Zobrist 哈希。牌区参数为牌ID的可迭代对象，pile 按牌山顺序（末尾先抽），drawn_id 为 -1 表示没有抽中的牌。
+    HanafudaRules 增量维护的 zobrist_hash 与本函数的结果相同。
+    """
+    value = ZOBRIST_PHASE[turn_phase]
+    for zone, card_ids in ((0, player_hands[0]), (1, player_hands[1]), (ZONE_TABLE, table),
+                           (ZONE_COLLECTED, collected[0]), (ZONE_COLLECTED + 1, collected[1])):
+        keys = ZOBRIST_ZONE[zone]
+        for card_id in card_ids:
+            value ^= keys[card_id]
+    for position, card_id in enumerate(pile):
+        value ^= ZOBRIST_PILE[position][card_id]
+    if drawn_id >= 0:
+        value ^= ZOBRIST_DRAWN[drawn_id]
+    if current_player:
+        value ^= ZOBRIST_PLAYER
+    for player_id in range(2):
+        if koikoi_flags[player_id]:
+            value ^= ZOBRIST_KOIKOI[player_id]
+    if game_over:
+        value ^= ZOBRIST_GAME_OVER
+    return value
+
+
+def score_yaku(counts):
+    """
+    根据各役种牌组的张数计算役分与役种列表。
+    """
+    rain, hikari, flower, wine, moon, animal, red_tan, blue_tan, tan, tane, kasu = counts
+    yaku_points = 0
+    yaku_list = []
+
+    # 五光 / 四光 / 雨四光 / 三光
+    if rain + hikari == 5:
+        yaku_points += 10.
+        yaku_list.append("五光")
+    elif hikari == 4:
+        yaku_points += 8.
+        yaku_list.append("四光")
+    elif hikari == 3 and rain == 1:
+        yaku_points += 7.
+        yaku_list.append("雨四光")
+    elif hikari == 3:
+        yaku_points += 6.
+        yaku_list.append("三光")
+
+    # 花见酒（樱上幕 + 菊上杯）
+    if flower + wine == 2:
+        yaku_points += 5.
+        yaku_list.append("花见酒")
+
+    # 月见酒（芒上月 + 菊上杯）
+    if moon + wine == 2:
+        yaku_points += 5.
+        yaku_list.append("月见酒")
+
+    # 猪鹿蝶 / 赤短 / 青短
+    if animal == 3:
+        yaku_points += 5.
+        yaku_list.append("猪鹿蝶")
+    if red_tan == 3:
+        yaku_points += 5.
+        yaku_list.append("赤短")
+    if blue_tan == 3:
+        yaku_points += 5.
+        yaku_list.append("青短")
+
+    # 短册、种（基础5张1分）与佳士（基础10张1分），每多1张加1分
+    if tan >= 5:
+        yaku_points += 1. + (tan - 5)
+        yaku_list.append(f"短册 x{1 + (tan - 5)}")
+    if tane >= 5:
+        yaku_points += 1. + (tane - 5)
+        yaku_list.append(f"种 x{1 + (tane - 5)}")
+    if kasu >= 10:
+        yaku_points += 1. + (kasu - 10)
+        yaku_list.append(f"佳士 x{1 + (kasu - 10)}")
+
+    return yaku_points, yaku_list
+
+
+# HanafudaRules 的紧凑状态记录：牌区为 Card 引用的元组（Card 对象共享而不复制），其余为标量或小元组
+RulesSnapshot = namedtuple("RulesSnapshot", [
+    "player_hands", "table_cards", "collected_cards", "draw_pile", "drawn_card",
+    "yaku_points", "koikoi_flags", "yaku_list", "yaku_counts",
+    "current_player", "turn_phase", "game_over", "game_result", "zobrist_hash",
+    "unseen_masks", "unseen_month_counts",
+])
+
+
 class HanafudaRules:
     """
     花札规则引擎，处理游戏的核心逻辑。
     """
 
     def __init__(self):
-        self.deck = Deck()
+        self._mask_cache = {}  # 玩家ID → 当前状态下的只读动作掩码
+        self._history = []  # push_action 记录的状态快照（用于 undo）
+        self.deck = DECK
         self.player_hands = None
         self.table_cards = None
         self.draw_pile = None
@@ -191,36 +270,50 @@ class HanafudaRules:
         self.koikoi_flags = {0: 0, 1: 0}  # 玩家0和玩家1是否叫牌
         self.yaku_list = {0: [], 1: []}  # 玩家0和玩家1的役种列表
         self.yaku_progress = {0: np.zeros(11, dtype=np.float32), 1: np.zeros(11, dtype=np.float32)} # 玩家0和玩家1的役种进度
+        self.yaku_counts = {0: [0] * 11, 1: [0] * 11}  # 玩家0和玩家1各役种牌组的收集张数（随收集增量更新）
         self.current_player = 0  # 当前玩家（0或1）
         self.turn_phase = 0  # 当前阶段（0：出牌阶段，1：抽牌阶段，2：出牌后叫牌阶段，3：抽牌后叫牌阶段）
         self.game_over = False  # 游戏是否结束
         self.game_result = None # 游戏是否结束（None：未结束，-1：平局，0：玩家0获胜，1：玩家1获胜）
+        self.zobrist_hash = 0  # 当前状态的 Zobrist 哈希（随动作增量更新）
+        self.unseen_masks = [0, 0]  # 各玩家看不到的牌（对手手牌 + 牌山）的48位掩码（随动作增量更新）
+        self.unseen_month_counts = {0: [0] * 12, 1: [0] * 12}  # 各玩家看不到的牌按月份（1-12月）的张数
 
-    def reset(self, np_random = np.random.default_rng()):
+    def reset(self, np_random = np.random.default_rng(), deal = None):
         """
         重置游戏状态，返回初始发牌结果。
         同时检查手牌是否符合"手四"或"食付"条件。
+        给出 deal = (48张牌的ID顺序, 先手玩家) 时按该发牌开局（见 Deck.deal_from_order），不消耗随机数；
+        deal 也可以是 deals.Deal，其 instant_win 为 False 时不再判定手四和食付。
         """
-        self.player_hands, self.table_cards, self.draw_pile = self.deck.deal(np_random)
+        self._mask_cache = {}
+        if deal is None:
+            self.player_hands, self.table_cards, self.draw_pile = self.deck.deal(np_random)
+        else:
+            self.player_hands, self.table_cards, self.draw_pile = self.deck.deal_from_order(deal[0])
         self.collected_cards = {0: [], 1: []}
         self.yaku_points = {0: 0, 1: 0}
         self.koikoi_flags = {0: 0, 1: 0}
         self.yaku_list = {0: [], 1: []}
         self.yaku_progress = {0: np.zeros(11, dtype=np.float32), 1: np.zeros(11, dtype=np.float32)}
+        self.yaku_counts = {0: [0] * 11, 1: [0] * 11}
         self.drawn_card = None
-        self.current_player = np_random.choice([0, 1])
+        self.current_player = np_random.choice([0, 1]) if deal is None else int(deal[1])
         self.turn_phase = 0
         self.game_over = False
         self.game_result = None
+        self._history = []
         
         # 检查手四和食付
-        for player in range(2):
+        # 发牌已批量判定为无人手四/食付时（Deal.instant_win 为 False）跳过逐张判定
+        checked_players = range(2) if deal is None or len(deal) < 3 or deal[2] else ()
+        for player in checked_players:
             # 手四：4张同月份
-            month_counts = {}
+            month_counts = [0] * 13
             for card in self.player_hands[player]:
-                month_counts[card.month] = month_counts.get(card.month, 0) + 1
-            
-            for month, count in month_counts.items():
+                month_counts[card.month] += 1
+
+            for count in month_counts:
                 if count >= 4:
                     self.yaku_points[player] = 6
                     self.yaku_list[player].append("手四")
@@ -230,46 +323,171 @@ class HanafudaRules:
             
             # 食付：4对2张同月份
             if not self.game_over:
-                pairs = sum(1 for count in month_counts.values() if count >= 2)
+                pairs = sum(1 for count in month_counts if count >= 2)
                 if pairs >= 4:
                     self.yaku_points[player] = 6
                     self.yaku_list[player].append("食付")
                     self.game_over = True
                     self.game_result = player
                     break
-        
+
+        self.zobrist_hash = self.compute_hash()
+        self._rebuild_unseen()
+        return None
+
+    def snapshot(self):
+        """
+        返回当前状态的紧凑记录（RulesSnapshot），可用 restore 恢复。
+        """
+        return RulesSnapshot(
+            (tuple(self.player_hands[0]), tuple(self.player_hands[1])),
+            tuple(self.table_cards),
+            (tuple(self.collected_cards[0]), tuple(self.collected_cards[1])),
+            tuple(self.draw_pile),
+            self.drawn_card,
+            (self.yaku_points[0], self.yaku_points[1]),
+            (self.koikoi_flags[0], self.koikoi_flags[1]),
+            (tuple(self.yaku_list[0]), tuple(self.yaku_list[1])),
+            (tuple(self.yaku_counts[0]), tuple(self.yaku_counts[1])),
+            self.current_player,
+            self.turn_phase,
+            self.game_over,
+            self.game_result,
+            self.zobrist_hash,
+            tuple(self.unseen_masks),
+            (tuple(self.unseen_month_counts[0]), tuple(self.unseen_month_counts[1])),
+        )
+
+    def restore(self, snapshot):
+        """
+        将状态恢复为 snapshot 记录的状态。哈希与未见牌信息取自记录，不重新计算。
+        """
+        self._mask_cache = {}
+        self.player_hands = [list(snapshot.player_hands[0]), list(snapshot.player_hands[1])]
+        self.table_cards = list(snapshot.table_cards)
+        self.collected_cards = {0: list(snapshot.collected_cards[0]), 1: list(snapshot.collected_cards[1])}
+        self.draw_pile = list(snapshot.draw_pile)
+        self.drawn_card = snapshot.drawn_card
+        self.yaku_points = {0: snapshot.yaku_points[0], 1: snapshot.yaku_points[1]}
+        self.koikoi_flags = {0: snapshot.koikoi_flags[0], 1: snapshot.koikoi_flags[1]}
+        self.yaku_list = {0: list(snapshot.yaku_list[0]), 1: list(snapshot.yaku_list[1])}
+        self.yaku_counts = {0: list(snapshot.yaku_counts[0]), 1: list(snapshot.yaku_counts[1])}
+        for player_id in range(2):
+            # 役进度由计数导出，写入已有数组
+            self.yaku_progress[player_id][:] = [count / size for count, size in zip(snapshot.yaku_counts[player_id], YAKU_GROUP_SIZES)]
+        self.current_player = snapshot.current_player
+        self.turn_phase = snapshot.turn_phase
+        self.game_over = snapshot.game_over
+        self.game_result = snapshot.game_result
+        self.zobrist_hash = snapshot.zobrist_hash
+        self.unseen_masks = list(snapshot.unseen_masks)
+        self.unseen_month_counts = {0: list(snapshot.unseen_month_counts[0]), 1: list(snapshot.unseen_month_counts[1])}
+
+        return None
+
+    def _rebuild_unseen(self):
+        """
+        由牌区重新计算各玩家的未见牌掩码与按月份的张数（reset 后使用）。
+        """
+        masks, month_counts = [0, 0], {0: [0] * 12, 1: [0] * 12}
+        for player_id in range(2):
+            for card in self.player_hands[1 - player_id] + self.draw_pile:
+                masks[player_id] |= 1 << card.card_id
+                month_counts[player_id][card.month - 1] += 1
+        self.unseen_masks = masks
+        self.unseen_month_counts = month_counts
+
+        return None
+
+    def compute_hash(self):
+        """
+        从头计算当前状态的 Zobrist 哈希。直接改写状态属性后，用 self.zobrist_hash = self.compute_hash() 重新同步。
+        """
+        return zobrist_hash(
+            [[card.card_id for card in hand] for hand in self.player_hands],
+            [card.card_id for card in self.table_cards],
+            [[card.card_id for card in self.collected_cards[player_id]] for player_id in range(2)],
+            [card.card_id for card in self.draw_pile],
+            self.drawn_card.card_id if self.drawn_card is not None else -1,
+            self.current_player, self.turn_phase, self.koikoi_flags, self.game_over,
+        )
+
+    def clone(self):
+        """
+        返回当前状态的独立副本（共享牌组与 Card 对象），代价远小于 copy.deepcopy。
+        """
+        other = HanafudaRules.__new__(HanafudaRules)
+        other._mask_cache = {}
+        other.deck = self.deck
+        other._history = []
+        other.yaku_progress = {0: np.zeros(11, dtype=np.float32), 1: np.zeros(11, dtype=np.float32)}
+        other.restore(self.snapshot())
+        return other
+
+    def push_action(self, action, player_id):
+        """
+        记录当前状态后执行动作，之后可用 undo 撤销。
+        """
+        self._history.append(self.snapshot())
+        self.perform_action(action, player_id)
+
         return None
 
+    def undo(self):
+        """
+        撤销最近一次 push_action。
+        """
+        self.restore(self._history.pop())
+
+        return None
+
+    def invalidate_mask_cache(self):
+        """
+        使缓存的动作掩码失效。perform_action / reset / restore 会自动调用；
+        在此之外直接改写状态（如 turn_phase = 2 或 player_hands[0].append(...)）后需手动调用。
+        """
+        self._mask_cache = {}
+
     def get_legal_actions_mask(self, player_id): 
         """
         生成合法动作掩码。
+        每个状态只计算一次，直到下一次状态变化前都返回同一个只读数组。
         """
+        mask = self._mask_cache.get(player_id)
+        if mask is None:
+            mask = self._compute_legal_actions_mask(player_id)
+            mask.flags.writeable = False
+            self._mask_cache[player_id] = mask
+        return mask
+
+    def _compute_legal_actions_mask(self, player_id):
         mask = np.zeros(38, dtype=bool)
 
         if self.current_player != player_id:
             return mask
 
+        # 场牌按月份计数，每张手牌（或抽到的牌）的可配对数即为一次查表
+        month_counts = [0] * 13
+        for card in self.table_cards:
+            month_counts[card.month] += 1
+
         if self.turn_phase == 0:  # 0: 出牌阶段
-            hand = self.player_hands[player_id]
-            for play_card, hand_card in enumerate(hand):
-                matching_table_cards = [card for card in self.table_cards if card.month == hand_card.month]
-                if not matching_table_cards:
+            for play_card, hand_card in enumerate(self.player_hands[player_id]):
+                matches = month_counts[hand_card.month]
+                if not matches:
                     # 如果没有同月牌，只有“不配对”（选项3）是合法的
                     # 动作ID = 手牌槽位 * 4 + 配对选项
                     mask[play_card * 4 + 3] = True
                 else:
                     # 如果有同月牌，可以选择配对其中任意一张
-                    for match_card in range(len(matching_table_cards)):
-                        mask[play_card * 4 + match_card] = True
+                    mask[play_card * 4:play_card * 4 + matches] = True
 
         elif self.turn_phase == 1:  # 1: 抽牌配对阶段
-            drawn_card = self.drawn_card
-            matching_table_cards = [card for card in self.table_cards if card.month == drawn_card.month]
-            if not matching_table_cards:
+            matches = month_counts[self.drawn_card.month]
+            if not matches:
                 mask[32 + 3] = True # 抽牌不配对
             else:
-                for match_card in range(len(matching_table_cards)):
-                    mask[32 + match_card] = True
+                mask[32:32 + matches] = True
 
         else:  # 2 & 3: 叫牌决策阶段
             # 动作36(不叫牌/结束) 和 37(叫牌) 都是合法的
@@ -282,6 +500,8 @@ class HanafudaRules:
         """
         根据动作ID执行动作。
         """
+        self._mask_cache = {} # 状态即将改变，缓存的掩码失效
+
         # 动作解析
         if self.turn_phase == 0: # 出牌阶段
             if not self.player_hands[player_id]:
@@ -311,18 +531,23 @@ class HanafudaRules:
 
     def _play_card(self, card_to_play, match_choice, player_id):
         self.player_hands[player_id].remove(card_to_play)
+        # 打出的牌对对手公开
+        self.unseen_masks[1 - player_id] &= ~(1 << card_to_play.card_id)
+        self.unseen_month_counts[1 - player_id][card_to_play.month - 1] -= 1
         matched_cards = [card for card in self.table_cards if card.month == card_to_play.month]
 
         if matched_cards and match_choice < len(matched_cards):
             collected_card = matched_cards[match_choice]
             self.table_cards.remove(collected_card)
-            self.collected_cards[player_id].extend([card_to_play, collected_card])
+            self.zobrist_hash ^= ZOBRIST_ZONE[player_id][card_to_play.card_id] ^ ZOBRIST_ZONE[ZONE_TABLE][collected_card.card_id]
+            self._collect_cards(player_id, card_to_play, collected_card)
             self._evaluate_yaku(player_id) # 检查役
             if self.turn_phase == 0:
                 self._draw_card(player_id) # 抽牌
         else:
             self.table_cards.append(card_to_play)
             self.table_cards.sort(key=lambda card: card.card_id)
+            self.zobrist_hash ^= ZOBRIST_ZONE[player_id][card_to_play.card_id] ^ ZOBRIST_ZONE[ZONE_TABLE][card_to_play.card_id]
             self._draw_card(player_id) # 抽牌
 
         if not self.player_hands[player_id] and not self.player_hands[1 - player_id]:
@@ -335,6 +560,13 @@ class HanafudaRules:
         抽牌
         """
         self.drawn_card = self.draw_pile.pop()
+        card_id = self.drawn_card.card_id
+        # 抽出的牌对双方公开
+        for player in range(2):
+            self.unseen_masks[player] &= ~(1 << card_id)
+            self.unseen_month_counts[player][self.drawn_card.month - 1] -= 1
+        self.zobrist_hash ^= (ZOBRIST_PILE[len(self.draw_pile)][card_id] ^ ZOBRIST_DRAWN[card_id]
+                              ^ ZOBRIST_PHASE[self.turn_phase] ^ ZOBRIST_PHASE[1])
         self.turn_phase = 1 # 进入抽牌配对阶段
         return None
 
@@ -349,120 +581,61 @@ class HanafudaRules:
         if matched_cards and draw_choice < len(matched_cards):
             chosen_card = matched_cards[draw_choice]
             self.table_cards.remove(chosen_card)
-            self.collected_cards[player_id].extend([self.drawn_card, chosen_card])
+            self.zobrist_hash ^= ZOBRIST_ZONE[ZONE_TABLE][chosen_card.card_id]
+            self._collect_cards(player_id, self.drawn_card, chosen_card)
             self._evaluate_yaku(player_id) # 检查役
             if self.turn_phase == 1:
                 self._end_turn() # 进入下回合
         else:
             self.table_cards.append(self.drawn_card)
             self.table_cards.sort(key=lambda card: card.card_id)
+            self.zobrist_hash ^= ZOBRIST_ZONE[ZONE_TABLE][self.drawn_card.card_id]
             self._end_turn() # 进入下回合
         
         return None
 
-    def _evaluate_yaku(self, player_id):
+    def _collect_cards(self, player_id, *cards):
         """
-        役判定模块：根据玩家收集的牌更新役点数和牌型。
+        将牌加入玩家的收集牌，并增量更新役种牌组计数、役进度与 Zobrist 哈希。
         """
-        collected_cards = self.collected_cards[player_id]
-        yaku_points = 0
-        self.yaku_list[player_id] = []  # 清空当前牌型
-
-        # 统计各类牌的数量
-        hikari_with_rain = [card for card in collected_cards if card.card_name == "柳间小野道风"]
-        self.yaku_progress[player_id][0] = len(hikari_with_rain) / 1
-
-        hikari_without_rain = [card for card in collected_cards if card.category == "光" and card.card_name != "柳间小野道风"]
-        self.yaku_progress[player_id][1] = len(hikari_without_rain) / 4
-
-        flower = [card for card in collected_cards if card.card_name == "樱上幕"]
-        self.yaku_progress[player_id][2] = len(flower) / 1
-
-        wine = [card for card in collected_cards if card.card_name == "菊上杯"]
-        self.yaku_progress[player_id][3] = len(wine) / 1
+        self.collected_cards[player_id].extend(cards)
+        counts = self.yaku_counts[player_id]
+        progress = self.yaku_progress[player_id]
+        keys = ZOBRIST_ZONE[ZONE_COLLECTED + player_id]
+        key = 0
+        for card in cards:
+            key ^= keys[card.card_id]
+            for group in YAKU_GROUP_TABLE[card.card_id]:
+                counts[group] += 1
+                progress[group] = counts[group] / YAKU_GROUP_SIZES[group]
+        self.zobrist_hash ^= key
 
-        moon = [card for card in collected_cards if card.card_name == "芒上月"]
-        self.yaku_progress[player_id][4] = len(moon) / 1
-
-        animal = [card for card in collected_cards if card.card_name in ["萩间野猪", "枫间鹿", "牡丹上蝶"]]
-        self.yaku_progress[player_id][5] = len(animal) / 3
-
-        red_tan = [card for card in collected_cards if card.card_name in ["松上赤短", "梅上赤短", "樱上赤短"]]
-        self.yaku_progress[player_id][6] = len(red_tan) / 3
-
-        blue_tan = [card for card in collected_cards if card.card_name in ["牡丹青短", "菊上青短", "枫上青短"]]
-        self.yaku_progress[player_id][7] = len(blue_tan) / 3
-
-        tan = [card for card in collected_cards if card.category == "短册"]
-        self.yaku_progress[player_id][8] = len(tan) / 5
-
-        tane = [card for card in collected_cards if card.category == "种"]
-        self.yaku_progress[player_id][9] = len(tane) / 5
-
-        kasu = [card for card in collected_cards if card.category == "佳士"]
-        self.yaku_progress[player_id][10] = len(kasu) / 10
-
-        # 五光
-        if len(hikari_with_rain) + len(hikari_without_rain) == 5:
-            yaku_points += 10.
-            self.yaku_list[player_id].append("五光")
-
-        # 四光
-        elif len(hikari_without_rain) == 4:
-            yaku_points += 8.
-            self.yaku_list[player_id].append("四光")
-
-        # 雨四光
-        elif len(hikari_without_rain) == 3 and len(hikari_with_rain) == 1:
-            yaku_points += 7.
-            self.yaku_list[player_id].append("雨四光")
-
-        # 三光
-        elif len(hikari_without_rain) == 3:
-            yaku_points += 6.
-            self.yaku_list[player_id].append("三光")
-
-        # 花见酒（樱上幕 + 菊上杯）
-        if len(flower) + len(wine) == 2:
-            yaku_points += 5.
-            self.yaku_list[player_id].append("花见酒")
-
-        # 月见酒（芒上月 + 菊上杯）
-        if len(moon) + len(wine) == 2:
-            yaku_points += 5.
-            self.yaku_list[player_id].append("月见酒")
-
-        # 猪鹿蝶
-        if len(animal) == 3:
-            yaku_points += 5.
-            self.yaku_list[player_id].append("猪鹿蝶")
-
-        # 赤短
-        if len(red_tan) == 3:
-            yaku_points += 5.
-            self.yaku_list[player_id].append("赤短")
-
-        # 青短
-        if len(blue_tan) == 3:
-            yaku_points += 5.
-            self.yaku_list[player_id].append("青短")
+        return None
 
-        # 短册（基础5张1分，每多1张加1分）
-        if len(tan) >= 5:
-            yaku_points += 1. + (len(tan) - 5)
-            self.yaku_list[player_id].append(f"短册 x{1 + (len(tan) - 5)}")
+    def set_collected_cards(self, collected_cards):
+        """
+        改写双方的收集牌（{玩家ID: Card 列表}），并重新统计役种牌组计数与役进度。
+        直接给 collected_cards 赋值不会更新计数，构造任意局面时应使用本方法。
+        """
+        self.collected_cards = {player_id: list(collected_cards[player_id]) for player_id in range(2)}
+        for player_id in range(2):
+            counts = [0] * 11
+            for card in self.collected_cards[player_id]:
+                for group in YAKU_GROUP_TABLE[card.card_id]:
+                    counts[group] += 1
+            self.yaku_counts[player_id] = counts
+            self.yaku_progress[player_id][:] = [count / size for count, size in zip(counts, YAKU_GROUP_SIZES)]
 
-        # 种（基础5张1分，每多1张加1分）
-        if len(tane) >= 5:
-            yaku_points += 1. + (len(tane) - 5)
-            self.yaku_list[player_id].append(f"种 x{1 + (len(tane) - 5)}")
+        return None
 
-        # 佳士（基础10张1分，每多1张加1分）
-        if len(kasu) >= 10:
-            yaku_points += 1. + (len(kasu) - 10)
-            self.yaku_list[player_id].append(f"佳士 x{1 + (len(kasu) - 10)}")
+    def _evaluate_yaku(self, player_id):
+        """
+        役判定模块：根据玩家的役种牌组计数更新役点数和牌型。
+        """
+        yaku_points, self.yaku_list[player_id] = score_yaku(self.yaku_counts[player_id])
 
         if yaku_points > self.yaku_points[player_id]:
+            self.zobrist_hash ^= ZOBRIST_DECISION[self.turn_phase & 1]
             self.turn_phase += 2
             self.yaku_points[player_id] = yaku_points
 
@@ -472,11 +645,12 @@ class HanafudaRules:
         """
         判断是否叫牌
         """
+        flag = 1 if koikoi else 0
+        if self.koikoi_flags[player_id] != flag:
+            self.zobrist_hash ^= ZOBRIST_KOIKOI[player_id]
+        self.koikoi_flags[player_id] = flag
         if not koikoi:
-            self.koikoi_flags[player_id] = 0
             self._end_game(winner_id=player_id) # 结束游戏
-        else:
-            self.koikoi_flags[player_id] = 1
 
         return None
     
@@ -484,6 +658,8 @@ class HanafudaRules:
         """
         判断游戏结束
         """
+        if not self.game_over:
+            self.zobrist_hash ^= ZOBRIST_GAME_OVER
         self.game_over = True
         self.game_result = winner_id
 
@@ -493,6 +669,10 @@ class HanafudaRules:
         """
         结束回合，切换玩家
         """
+        key = ZOBRIST_PLAYER ^ ZOBRIST_PHASE[self.turn_phase] ^ ZOBRIST_PHASE[0]
+        if self.drawn_card is not None:
+            key ^= ZOBRIST_DRAWN[self.drawn_card.card_id]
+        self.zobrist_hash ^= key
         self.current_player = 1 - self.current_player
         self.turn_phase = 0 # 进入出牌阶段
         self.drawn_card = None # 重置抽牌
@@ -0,0 +1,53 @@
+from time import perf_counter
+
+
+class PhaseTimer:
+    """
+    进程内的分阶段计时器：热路径上按名字累计耗时与调用次数，默认关闭。
+
+    关闭时每个计时点只多一次属性读取；打开后各计时点调用 perf_counter 并累加到 seconds / calls。
+    同名计时可以嵌套在其它计时之内（如 env/step 包含其中的 env/get_obs），汇总时不做扣除。
+    每个进程（例如 SubprocVecEnv 的每个 worker）各有一个 TIMER，由 pop 取出后在主进程中用 merge_timings 合并。
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.seconds = {}  # 名字 → 累计秒数
+        self.calls = {}  # 名字 → 累计调用次数
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def add(self, name, seconds):
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def time(self, name, start):
+        """
+        累计从 start（perf_counter 的读数）到现在的耗时。
+        """
+        self.add(name, perf_counter() - start)
+
+    def pop(self):
+        """
+        返回 {名字: (累计秒数, 调用次数)} 并清零。
+        """
+        timings = {name: (seconds, self.calls[name]) for name, seconds in self.seconds.items()}
+        self.seconds = {}
+        self.calls = {}
+        return timings
+
+
+def merge_timings(*timings):
+    """
+    合并多个 pop 的结果（例如各 worker 的计时），同名计时的秒数与次数分别相加。
+    """
+    merged = {}
+    for timing in timings:
+        for name, (seconds, calls) in timing.items():
+            total_seconds, total_calls = merged.get(name, (0.0, 0))
+            merged[name] = (total_seconds + seconds, total_calls + calls)
+    return merged
+
+
+TIMER = PhaseTimer()  # 本进程的计时器
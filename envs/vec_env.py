@@ -0,0 +1,466 @@
+import gymnasium as gym
+import numpy as np
+from stable_baselines3.common.vec_env import VecEnv
+
+from .bitboard import YAKU_GROUP_MASKS, mask_to_array
+from .deals import opening_wins, shuffle_deals
+from .rules import YAKU_GROUP_SIZES, score_yaku
+
+# 役种统计用的牌组矩阵 (48, 11)，列顺序与 yaku_progress 一致
+YAKU_GROUPS = np.stack([mask_to_array(group_mask) for group_mask in YAKU_GROUP_MASKS], axis=1).astype(np.int16)
+YAKU_DENOMINATORS = np.array(YAKU_GROUP_SIZES, dtype=np.float32)
+
+NO_CARD = 48  # drawn_card 的空值
+NO_RESULT = -2  # 对局未结束时的 game_result
+
+
+# score_yaku 的役分是若干互不相关的牌组组合各自得分之和（光、酒、猪鹿蝶、赤短、青短、短册、种、佳士），
+# 因此按组合分别查表再相加即可批量计分。查表由 score_yaku 生成（组合之外的张数取0），计分规则只有一份
+_YAKU_COMPONENTS = ((0, 1), (2, 3, 4), (5,), (6,), (7,), (8,), (9,), (10,))  # 各组合包含的牌组下标
+
+
+def _component_table(groups):
+    table = np.zeros([YAKU_GROUPS[:, group].sum() + 1 for group in groups], dtype=np.float32)
+    for index in np.ndindex(table.shape):
+        counts = [0] * 11
+        for group, count in zip(groups, index):
+            counts[group] = count
+        table[index] = score_yaku(counts)[0]
+    return table
+
+
+_YAKU_TABLES = [_component_table(groups) for groups in _YAKU_COMPONENTS]
+
+
+def yaku_points_from_counts(counts):
+    """
+    由各牌组张数 (k, 11) 批量计算役分，结果与逐行调用 score_yaku 相同。
+    """
+    points = np.zeros(len(counts), dtype=np.float32)
+    for groups, table in zip(_YAKU_COMPONENTS, _YAKU_TABLES):
+        points += table[tuple(counts[:, group] for group in groups)]
+    return points
+
+
+class HanafudaVecEnv(VecEnv):
+    """
+    批量花札环境：以堆叠的 NumPy 数组同时推进 N 局“RL 智能体 vs 对手”的对局。
+
+    对每局的语义与 SelfPlayEnvWrapper(HanafudaEnv) 相同：RL 智能体固定为玩家0，
+    对手在轮到它时一直行动，直到再次轮到 RL 智能体或对局结束；终局时奖励用对手最后一步的奖励修正。
+    对局结束后自动重置，终局观测放在 info["terminal_observation"] 中。
+    开局即结束的对局（手四/食付，或对手先手时在首回合内结束）不会再被推进：
+    其掩码只开放动作36，RL 智能体的下一步直接报告终局及其奖励。
+
+    对手若实现了 select_actions(observations, action_masks) 则按批调用，
+    否则逐局调用 select_action(observation, action_mask)。
+    """
+
+    metadata = {"render_modes": []}
+
+    def __init__(self, num_envs, opponent, seed = None):
+        self.render_mode = None
+        observation_space = gym.spaces.Dict(
+            {
+                "hand": gym.spaces.MultiBinary(48),
+                "table": gym.spaces.MultiBinary(48),
+                "my_collected": gym.spaces.MultiBinary(48),
+                "opp_collected": gym.spaces.MultiBinary(48),
+                "drawn_card": gym.spaces.Discrete(49),
+                "deck_remaining": gym.spaces.Box(low=0, high=1, shape=(1,), dtype=np.float32),
+                "current_scores": gym.spaces.Box(low=0, high=1, shape=(2,), dtype=np.float32),
+                "koikoi_flags": gym.spaces.MultiBinary(2),
+                "my_yaku_progress": gym.spaces.Box(low=0, high=1, shape=(11,), dtype=np.float32),
+                "opp_yaku_progress": gym.spaces.Box(low=0, high=1, shape=(11,), dtype=np.float32),
+                "turn_phase": gym.spaces.Discrete(4),
+            }
+        )
+        super().__init__(num_envs, observation_space, gym.spaces.Discrete(38))
+        self.opponent = opponent
+        self.rl_player_id = 0
+        self.np_random = np.random.default_rng(seed)
+
+        # 对局状态（第一维为对局编号）
+        self._hands = np.zeros((num_envs, 2, 48), dtype=bool)  # 双方手牌
+        self._table = np.zeros((num_envs, 48), dtype=bool)  # 场牌
+        self._collected = np.zeros((num_envs, 2, 48), dtype=bool)  # 双方收集牌
+        self._pile = np.zeros((num_envs, 24), dtype=np.int64)  # 牌堆（从 _pile_left-1 处向前抽牌）
+        self._pile_left = np.zeros(num_envs, dtype=np.int64)  # 牌堆剩余数
+        self._drawn = np.full(num_envs, NO_CARD, dtype=np.int64)  # 抽中的牌
+        self._phase = np.zeros(num_envs, dtype=np.int64)  # 游戏阶段
+        self._player = np.zeros(num_envs, dtype=np.int64)  # 当前玩家
+        self._scores = np.zeros((num_envs, 2), dtype=np.float32)  # 双方役分
+        self._koikoi = np.zeros((num_envs, 2), dtype=np.int8)  # 双方叫牌标志
+        self._progress = np.zeros((num_envs, 2, 11), dtype=np.float32)  # 双方役进度
+        self._over = np.zeros(num_envs, dtype=bool)  # 对局是否结束
+        self._result = np.full(num_envs, NO_RESULT, dtype=np.int64)  # 对局结果
+        self._finished = np.zeros(num_envs, dtype=bool)  # 轮到 RL 智能体之前即已结束的对局
+
+        self._masks = np.zeros((num_envs, 38), dtype=bool)  # RL 智能体当前的动作掩码
+        self._actions = None
+
+    # --- VecEnv 接口 ---
+    def reset(self):
+        if self._seeds[0] is not None:
+            self.np_random = np.random.default_rng(self._seeds[0])
+        self._reset_seeds()
+        self._reset_options()
+
+        rows = np.arange(self.num_envs)
+        self._reset_games(rows)
+        self._masks = self._rl_masks()
+        return self._build_obs(rows, np.full(self.num_envs, self.rl_player_id))
+
+    def step_async(self, actions):
+        self._actions = np.asarray(actions, dtype=np.int64).reshape(self.num_envs)
+
+    def step_wait(self):
+        all_rows = np.arange(self.num_envs)
+        actions = self._actions
+        rewards = np.full(self.num_envs, -1.0, dtype=np.float32)  # 非法动作：惩罚且保持状态不变
+        terminated = np.zeros(self.num_envs, dtype=bool)
+
+        # 开局即结束的对局：不执行动作，直接报告终局
+        finished = np.flatnonzero(self._finished)
+        rewards[finished] = self._final_rewards(finished)
+        terminated[finished] = True
+
+        # RL 智能体行动
+        legal_rows = np.flatnonzero(self._masks[all_rows, actions] & ~self._finished)
+        rewards[legal_rows] = self._step_rows(legal_rows, actions[legal_rows])
+        terminated[legal_rows] = self._over[legal_rows]
+
+        # 对手行动，直到再次轮到 RL 智能体或对局结束
+        pending = np.flatnonzero(~terminated & (self._player != self.rl_player_id))
+        opp_rewards, opp_terminated = self._opponent_play(pending)
+        ended = pending[opp_terminated]
+        terminated[ended] = True
+        rewards[ended] -= opp_rewards[opp_terminated]  # 用对手的得分修正RL智能体的得分
+
+        # 自动重置已结束的对局
+        infos = [{} for _ in range(self.num_envs)]
+        done_rows = np.flatnonzero(terminated)
+        if len(done_rows):
+            terminal_obs = self._build_obs(done_rows, self._player[done_rows])
+            for i, row in enumerate(done_rows):
+                infos[row]["terminal_observation"] = {key: value[i] for key, value in terminal_obs.items()}
+            self._reset_games(done_rows)
+
+        self._masks = self._rl_masks()
+        return self._build_obs(all_rows, np.full(self.num_envs, self.rl_player_id)), rewards, terminated, infos
+
+    def action_masks(self):
+        """
+        返回 RL 智能体当前的动作掩码 (N, 38)。
+        """
+        return self._masks.copy()
+
+    def close(self):
+        pass
+
+    def get_attr(self, attr_name, indices = None):
+        return [getattr(self, attr_name) for _ in self._get_indices(indices)]
+
+    def set_attr(self, attr_name, value, indices = None):
+        setattr(self, attr_name, value)
+
+    def has_attr(self, attr_name):
+        return hasattr(self, attr_name)
+
+    def env_method(self, method_name, *method_args, indices = None, **method_kwargs):
+        indices = list(self._get_indices(indices))
+        if method_name == "action_masks":
+            # MaskablePPO 通过 env_method("action_masks") 逐环境取掩码
+            return list(self._masks[indices])
+        result = getattr(self, method_name)(*method_args, **method_kwargs)
+        return [result for _ in indices]
+
+    def set_opponent(self, opponent):
+        """
+        更换对手智能体。
+        """
+        self.opponent = opponent
+
+    def set_opponent_parameters(self, policy_class, policy_kwargs, parameters):
+        """
+        用策略网络参数更新对手（首次调用时建立对手策略网络），与 SelfPlayEnvWrapper 的同名方法相同。
+        """
+        from hanafuda_rl.agents.sb3_agent import PolicyAgent
+
+        if not isinstance(self.opponent, PolicyAgent):
+            self.opponent = PolicyAgent(policy_class, self.observation_space, self.action_space, policy_kwargs)
+        self.opponent.load_parameters(parameters)
+
+    def env_is_wrapped(self, wrapper_class, indices = None):
+        return [False for _ in self._get_indices(indices)]
+
+    # --- 对局推进 ---
+    def _reset_games(self, rows):
+        """
+        为指定对局重新发牌，并在对手先手时让其行动到轮到 RL 智能体。
+        """
+        self._deal(rows)
+        self._play_opening(rows)
+
+    def _play_opening(self, rows):
+        """
+        对手先手的对局由对手行动到轮到 RL 智能体；在此之前已结束的对局标记为 _finished。
+        """
+        pending = rows[(self._player[rows] != self.rl_player_id) & ~self._over[rows]]
+        self._opponent_play(pending)
+        self._finished[rows] = self._over[rows]
+
+    def _final_rewards(self, rows):
+        """
+        RL 智能体视角的终局奖励：获胜得己方役分，失败扣对手役分，平局为0。
+        """
+        result = self._result[rows]
+        return np.select(
+            [result == self.rl_player_id, result == 1 - self.rl_player_id],
+            [self._scores[rows, self.rl_player_id], -self._scores[rows, 1 - self.rl_player_id]],
+            default=0.,
+        ).astype(np.float32)
+
+    def _rl_masks(self):
+        """
+        RL 智能体在所有对局中的动作掩码；已结束的对局只开放动作36（仅作占位，不会被执行）。
+        """
+        rows = np.arange(self.num_envs)
+        masks = self._compute_masks(rows, np.full(self.num_envs, self.rl_player_id))
+        masks[self._finished] = False
+        masks[self._finished, 36] = True
+        return masks
+
+    def _deal(self, rows):
+        """
+        批量发牌：一次随机数调用生成 len(rows) 个排列，并检查手四和食付。
+        """
+        count = len(rows)
+        if count == 0:
+            return
+        order, first_player = shuffle_deals(self.np_random, count)
+
+        column = np.arange(count)[:, None]
+        hands = np.zeros((count, 2, 48), dtype=bool)
+        hands[column, 0, order[:, :8]] = True
+        hands[column, 1, order[:, 8:16]] = True
+        table = np.zeros((count, 48), dtype=bool)
+        table[column, order[:, 16:24]] = True
+
+        self._hands[rows] = hands
+        self._table[rows] = table
+        self._collected[rows] = False
+        self._pile[rows] = order[:, 24:]
+        self._pile_left[rows] = 24
+        self._drawn[rows] = NO_CARD
+        self._phase[rows] = 0
+        self._player[rows] = first_player
+        self._scores[rows] = 0.
+        self._koikoi[rows] = 0
+        self._progress[rows] = 0.
+        self._over[rows] = False
+        self._result[rows] = NO_RESULT
+
+        # 手四（4张同月）与食付（4对同月），判定顺序与 HanafudaRules.reset 相同
+        win0, win1 = opening_wins(order)
+        self._scores[rows[win0], 0] = 6.
+        self._scores[rows[win1], 1] = 6.
+        self._over[rows] = win0 | win1
+        self._result[rows[win0]] = 0
+        self._result[rows[win1]] = 1
+
+    def _opponent_play(self, rows):
+        """
+        让对手在指定对局中一直行动，直到轮到 RL 智能体或对局结束。
+        返回每局对手最后一步的奖励和是否因对手的动作而结束。
+        """
+        last_rewards = np.zeros(len(rows), dtype=np.float32)
+        terminated = np.zeros(len(rows), dtype=bool)
+        active = self._player[rows] != self.rl_player_id
+        while active.any():
+            positions = np.flatnonzero(active)
+            sub = rows[positions]
+            viewer = self._player[sub]
+            masks = self._compute_masks(sub, viewer)
+            actions = self._select_opponent_actions(self._build_obs(sub, viewer), masks)
+
+            rewards = np.full(len(sub), -1.0, dtype=np.float32)
+            legal = masks[np.arange(len(sub)), actions]
+            rewards[legal] = self._step_rows(sub[legal], actions[legal])
+            last_rewards[positions] = rewards
+            terminated[positions] = self._over[sub]
+
+            active[positions] = (self._player[sub] != self.rl_player_id) & ~self._over[sub]
+        return last_rewards, terminated
+
+    def _select_opponent_actions(self, observations, masks):
+        if hasattr(self.opponent, "select_actions"):
+            return np.asarray(self.opponent.select_actions(observations, masks), dtype=np.int64)
+        return np.array([
+            self.opponent.select_action({key: value[i] for key, value in observations.items()}, masks[i])
+            for i in range(len(masks))
+        ], dtype=np.int64)
+
+    def _step_rows(self, rows, actions):
+        """
+        在指定对局中由当前玩家执行（合法的）动作，返回该玩家获得的奖励。
+        奖励规则与 HanafudaEnv._calculate_reward 相同。
+        """
+        players = self._player[rows].copy()
+        phase_before = self._phase[rows].copy()
+        former_points = self._scores[rows, players].copy()
+
+        for phase, handler in ((0, self._play_card), (1, self._judge_draw)):
+            selected = phase_before == phase
+            if selected.any():
+                handler(rows[selected], actions[selected], players[selected])
+        selected = phase_before >= 2
+        if selected.any():
+            self._judge_koikoi(rows[selected], actions[selected] - 36, players[selected])
+
+        latter_points = self._scores[rows, players]
+        result = self._result[rows]
+        running_reward = np.where(
+            phase_before <= 1,
+            (latter_points - former_points) * 0.1,
+            np.where(self._koikoi[rows, players] == 1, 0., latter_points),
+        )
+        final_reward = np.select(
+            [result == players, result == 1 - players],
+            [latter_points, -self._scores[rows, 1 - players]],
+            default=0.,
+        )
+        return np.where(self._over[rows], final_reward, running_reward).astype(np.float32)
+
+    def _match(self, rows, cards, choices):
+        """
+        返回场上与 cards 同月的第 choices 张牌（按ID升序），不存在时为 -1。
+        """
+        months = cards // 4
+        nibbles = self._table.reshape(-1, 12, 4)[rows, months]
+        rank = np.cumsum(nibbles, axis=1)
+        position = np.argmax(nibbles & (rank == choices[:, None] + 1), axis=1)
+        valid = choices < nibbles.sum(axis=1)
+        return np.where(valid, months * 4 + position, -1)
+
+    def _play_card(self, rows, actions, players):
+        empty = ~self._hands[rows, players].any(axis=1)
+        self._end_game(rows[empty], -1)
+        rows, actions, players = rows[~empty], actions[~empty], players[~empty]
+
+        slots, choices = np.divmod(actions, 4)
+        hands = self._hands[rows, players]
+        cards = np.argmax(hands & (np.cumsum(hands, axis=1) == slots[:, None] + 1), axis=1)
+        self._hands[rows, players, cards] = False
+        matched = self._match(rows, cards, choices)
+
+        has_match = matched >= 0
+        self._capture(rows[has_match], players[has_match], cards[has_match], matched[has_match])
+        captured = rows[has_match]
+        self._draw_card(captured[self._phase[captured] == 0])
+        self._table[rows[~has_match], cards[~has_match]] = True
+        self._draw_card(rows[~has_match])
+
+        both_empty = ~self._hands[rows].any(axis=(1, 2))
+        self._end_game(rows[both_empty], -1)
+
+    def _judge_draw(self, rows, actions, players):
+        cards = self._drawn[rows]
+        matched = self._match(rows, cards, actions - 32)
+
+        has_match = matched >= 0
+        self._capture(rows[has_match], players[has_match], cards[has_match], matched[has_match])
+        captured = rows[has_match]
+        self._end_turn(captured[self._phase[captured] == 1])
+        self._table[rows[~has_match], cards[~has_match]] = True
+        self._end_turn(rows[~has_match])
+
+    def _judge_koikoi(self, rows, koikoi, players):
+        self._koikoi[rows, players] = koikoi
+        stop = koikoi == 0
+        self._over[rows[stop]] = True
+        self._result[rows[stop]] = players[stop]
+        go_on = rows[~stop]
+        self._draw_card(go_on[self._phase[go_on] == 2])
+        self._end_turn(go_on[self._phase[go_on] == 3])
+
+    def _capture(self, rows, players, cards, matched):
+        self._table[rows, matched] = False
+        self._collected[rows, players, cards] = True
+        self._collected[rows, players, matched] = True
+        self._evaluate_yaku(rows, players)
+
+    def _evaluate_yaku(self, rows, players):
+        counts = self._collected[rows, players].astype(np.int16) @ YAKU_GROUPS
+        self._progress[rows, players] = counts / YAKU_DENOMINATORS
+        points = yaku_points_from_counts(counts)
+        improved = points > self._scores[rows, players]
+        self._scores[rows[improved], players[improved]] = points[improved]
+        self._phase[rows[improved]] += 2
+
+    def _draw_card(self, rows):
+        self._pile_left[rows] -= 1
+        self._drawn[rows] = self._pile[rows, self._pile_left[rows]]
+        self._phase[rows] = 1
+
+    def _end_turn(self, rows):
+        self._player[rows] = 1 - self._player[rows]
+        self._phase[rows] = 0
+        self._drawn[rows] = NO_CARD
+
+    def _end_game(self, rows, winner_id):
+        self._over[rows] = True
+        self._result[rows] = winner_id
+
+    # --- 观测与掩码 ---
+    def _compute_masks(self, rows, viewer):
+        """
+        批量生成指定对局中 viewer 玩家的合法动作掩码 (len(rows), 38)。
+        """
+        masks = np.zeros((len(rows), 38), dtype=bool)
+        month_counts = self._table[rows].reshape(-1, 12, 4).sum(axis=2)
+        acting = self._player[rows] == viewer
+        phase = self._phase[rows]
+
+        play = np.flatnonzero(acting & (phase == 0))
+        if len(play):
+            hands = self._hands[rows[play], viewer[play]]
+            slots = np.cumsum(hands, axis=1) - 1
+            counts = np.repeat(month_counts[play], 4, axis=1)
+            for choice in range(4):
+                r, c = np.nonzero(hands & (counts > choice))
+                masks[play[r], slots[r, c] * 4 + choice] = True
+            r, c = np.nonzero(hands & (counts == 0))
+            masks[play[r], slots[r, c] * 4 + 3] = True
+
+        draw = np.flatnonzero(acting & (phase == 1))
+        if len(draw):
+            counts = month_counts[draw, self._drawn[rows[draw]] // 4]
+            for choice in range(4):
+                masks[draw[counts > choice], 32 + choice] = True
+            masks[draw[counts == 0], 35] = True
+
+        koikoi = np.flatnonzero(acting & (phase >= 2))
+        masks[koikoi, 36] = True
+        masks[koikoi, 37] = True
+        return masks
+
+    def _build_obs(self, rows, viewer):
+        """
+        批量构建指定对局中 viewer 玩家视角的观测（与 HanafudaEnv._get_obs 的内容相同）。
+        """
+        opponent = 1 - viewer
+        phase = self._phase[rows]
+        return {
+            "hand": self._hands[rows, viewer].astype(np.int8),
+            "table": self._table[rows].astype(np.int8),
+            "my_collected": self._collected[rows, viewer].astype(np.int8),
+            "opp_collected": self._collected[rows, opponent].astype(np.int8),
+            "drawn_card": np.where(phase == 1, self._drawn[rows], NO_CARD),
+            "deck_remaining": (self._pile_left[rows] / 24).astype(np.float32)[:, None],
+            "current_scores": np.tanh(np.stack([self._scores[rows, viewer], self._scores[rows, opponent]], axis=1) / 5.0),
+            "koikoi_flags": np.stack([self._koikoi[rows, viewer], self._koikoi[rows, opponent]], axis=1),
+            "my_yaku_progress": self._progress[rows, viewer],
+            "opp_yaku_progress": self._progress[rows, opponent],
+            "turn_phase": phase.copy(),
+        }
@@ -0,0 +1,39 @@
+"""
+吞吐量基准 (train/benchmark.py) 的测试：小规模运行能产出全部指标，比较模式能识别退化。
+"""
+
+import json
+
+from hanafuda_rl.train.benchmark import run_benchmarks, compare, main
+
+
+def test_run_benchmarks_reports_all_metrics():
+    results = run_benchmarks(only=["rules", "env", "vec_env", "components"], num_games=3, num_states=50,
+                             vec_num_envs=8, vec_steps=5, repeats=1)
+    for name in ("rules/HanafudaRules", "rules/BitboardRules", "env/HanafudaEnv", "env/HanafudaEnv-bitboard",
+                 "env/HanafudaEnv-flat", "vec_env/HanafudaVecEnv"):
+        assert results[name]["steps_per_sec"] > 0 and results[name]["games"] >= 0
+    assert results["rules/HanafudaRules"]["steps"] == results["rules/BitboardRules"]["steps"]  # 两个引擎走完全相同的对局
+    for name in ("get_obs", "get_legal_actions_mask", "evaluate_yaku"):
+        assert results[f"components/{name}"]["us_per_call"] > 0
+
+
+def test_compare_flags_regressions():
+    baseline = {"a": {"steps_per_sec": 100.0, "games_per_sec": 10.0}, "b": {"us_per_call": 2.0}}
+    current = {"a": {"steps_per_sec": 80.0, "games_per_sec": 10.5}, "b": {"us_per_call": 2.1}}
+    rows = {(name, metric): regressed for name, metric, _, _, _, regressed in compare(current, baseline, tolerance=0.1)}
+    assert rows == {("a", "steps_per_sec"): True, ("a", "games_per_sec"): False, ("b", "us_per_call"): False}
+
+
+def test_cli_writes_json_and_compares(tmp_path):
+    output = tmp_path / "baseline.json"
+    args = ["--only", "rules", "--games", "2", "--repeats", "1"]
+    assert main(args + ["--output", str(output)]) == 0
+    report = json.loads(output.read_text(encoding="utf-8"))
+    assert "rules/HanafudaRules" in report["results"] and report["meta"]["seed"] == 0
+
+    # 把基线改成不可能达到的吞吐量，比较模式应返回 1
+    for metrics in report["results"].values():
+        metrics["steps_per_sec"] *= 1000
+    output.write_text(json.dumps(report), encoding="utf-8")
+    assert main(args + ["--compare", str(output)]) == 1
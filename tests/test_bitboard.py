@@ -0,0 +1,131 @@
+"""
+位棋盘规则引擎 (BitboardRules) 的一致性测试。
+
+在相同种子与相同动作序列下，BitboardRules 必须与 HanafudaRules 逐步给出完全相同的
+动作掩码、役分、役种列表、役进度和对局结果。
+"""
+
+import pytest
+import numpy as np
+
+from hanafuda_rl.envs.hanafuda_env import HanafudaEnv
+from hanafuda_rl.envs.rules import HanafudaRules
+from hanafuda_rl.envs.bitboard import BitboardRules
+
+
+def assert_same_state(rules, bitboard):
+    """比较两个引擎的全部可观测状态。"""
+    for player in range(2):
+        assert [c.card_id for c in rules.player_hands[player]] == [c.card_id for c in bitboard.player_hands[player]]
+        assert sorted(c.card_id for c in rules.collected_cards[player]) == [c.card_id for c in bitboard.collected_cards[player]]
+        assert rules.yaku_points[player] == bitboard.yaku_points[player]
+        assert rules.yaku_list[player] == bitboard.yaku_list[player]
+        assert rules.koikoi_flags[player] == bitboard.koikoi_flags[player]
+        np.testing.assert_array_equal(rules.yaku_progress[player], bitboard.yaku_progress[player])
+        assert rules.unseen_masks[player] == bitboard.unseen_masks[player]
+        assert rules.unseen_month_counts[player] == bitboard.unseen_month_counts[player]
+    assert [c.card_id for c in rules.table_cards] == [c.card_id for c in bitboard.table_cards]
+    assert [c.card_id for c in rules.draw_pile] == bitboard.pile
+    assert (rules.drawn_card.card_id if rules.drawn_card else -1) == bitboard.drawn_id
+    assert rules.current_player == bitboard.current_player
+    assert rules.turn_phase == bitboard.turn_phase
+    assert rules.game_over == bitboard.game_over
+    assert rules.game_result == bitboard.game_result
+
+
+@pytest.mark.parametrize("seed", range(300))
+def test_bitboard_matches_rules(seed):
+    """随机对局中两个引擎逐步一致。"""
+    rules, bitboard = HanafudaRules(), BitboardRules()
+    rules.reset(np_random=np.random.default_rng(seed))
+    bitboard.reset(np_random=np.random.default_rng(seed))
+    assert_same_state(rules, bitboard)
+
+    action_rng = np.random.default_rng(seed + 10000)
+    while not rules.game_over:
+        player = rules.current_player
+        mask = rules.get_legal_actions_mask(player)
+        np.testing.assert_array_equal(mask, bitboard.get_legal_actions_mask(player))
+        np.testing.assert_array_equal(rules.get_legal_actions_mask(1 - player), bitboard.get_legal_actions_mask(1 - player))
+
+        action = action_rng.choice(np.where(mask)[0])
+        rules.perform_action(action, player)
+        bitboard.perform_action(action, player)
+        assert_same_state(rules, bitboard)
+
+
+def test_bitboard_env_observations_match():
+    """使用位棋盘引擎的环境与默认环境给出相同的观测与奖励。"""
+    env, fast_env = HanafudaEnv(), HanafudaEnv(use_bitboard=True)
+    for seed in range(20):
+        obs, info = env.reset(seed=seed)
+        fast_obs, fast_info = fast_env.reset(seed=seed)
+        terminated = False
+        while not terminated:
+            for key in obs:
+                np.testing.assert_array_equal(obs[key], fast_obs[key])
+            np.testing.assert_array_equal(info["action_mask"], fast_info["action_mask"])
+            action = env.np_random.choice(np.where(info["action_mask"])[0])
+            fast_env.np_random.choice(np.where(fast_info["action_mask"])[0])
+            obs, reward, terminated, _, info = env.step(action)
+            fast_obs, fast_reward, _, _, fast_info = fast_env.step(action)
+            assert reward == fast_reward
+
+
+def test_bitboard_snapshot_restore():
+    """位棋盘引擎的 snapshot/restore/clone 恢复完整状态。"""
+    bitboard = BitboardRules()
+    bitboard.reset(np_random=np.random.default_rng(4))
+    rng = np.random.default_rng(4)
+    while not bitboard.game_over:
+        snapshot = bitboard.snapshot()
+        clone = bitboard.clone()
+        player = bitboard.current_player
+        bitboard.perform_action(rng.choice(np.flatnonzero(bitboard.get_legal_actions_mask(player))), player)
+        after = bitboard.snapshot()
+        bitboard.restore(snapshot)
+        assert bitboard.snapshot() == snapshot == clone.snapshot()
+        bitboard.restore(after)
+
+
+def test_restore_copies_unseen_state():
+    """两个引擎的 restore 直接取回记录中的未见牌信息，与由牌区重新计算的结果相同，且之后的增量更新不改写记录。"""
+    from hanafuda_rl.envs.bitboard import snapshot_from_rules
+
+    rules, bitboard = HanafudaRules(), BitboardRules()
+    rules.reset(np_random=np.random.default_rng(5))
+    rng = np.random.default_rng(5)
+    snapshots = []
+    while not rules.game_over:
+        snapshots.append((rules.snapshot(), snapshot_from_rules(rules)))
+        player = rules.current_player
+        rules.perform_action(rng.choice(np.flatnonzero(rules.get_legal_actions_mask(player))), player)
+    for snapshot, bitboard_snapshot in snapshots:
+        for engine, recorded in ((rules, snapshot), (bitboard, bitboard_snapshot)):
+            engine.restore(recorded)
+            restored = (list(engine.unseen_masks), dict(engine.unseen_month_counts))
+            engine._rebuild_unseen()
+            assert restored == (engine.unseen_masks, engine.unseen_month_counts)
+        assert_same_state(rules, bitboard)
+        if not rules.game_over:
+            player = rules.current_player
+            action = np.flatnonzero(rules.get_legal_actions_mask(player))[0]
+            for engine, recorded in ((rules, snapshot), (bitboard, bitboard_snapshot)):
+                engine.perform_action(action, player)
+                engine.restore(recorded)
+                assert engine.snapshot() == recorded
+
+
+def test_reset_from_recorded_deal():
+    """按 deal_of 记录的发牌重新开局，两个引擎都得到与原对局相同的初始状态。"""
+    from hanafuda_rl.envs.records import deal_of
+
+    for seed in range(20):
+        original = HanafudaRules()
+        original.reset(np_random=np.random.default_rng(seed))
+        deal = deal_of(original)
+        rules, bitboard = HanafudaRules(), BitboardRules()
+        rules.reset(deal=deal)
+        bitboard.reset(deal=deal)
+        assert_same_state(rules, bitboard)
+        assert rules.zobrist_hash == original.zobrist_hash and rules.game_over == original.game_over
@@ -0,0 +1,70 @@
+"""
+发牌库 (DealBank) 的测试：文件可重现、开局特征正确、环境按编号取发牌、评估在相同发牌上进行。
+"""
+
+import pickle
+
+import numpy as np
+
+from hanafuda_rl.envs.deal_bank import DealBank, generate_deal_bank
+from hanafuda_rl.envs.hanafuda_env import HanafudaEnv
+from hanafuda_rl.envs.records import deal_of
+from hanafuda_rl.envs.rules import HanafudaRules
+from hanafuda_rl.train.eval import evaluate_duel, evaluate_duel_parallel
+from hanafuda_rl.agents.rule_agent import RuleAgent
+
+
+def test_bank_is_reproducible_and_features_match_rules(tmp_path):
+    """相同种子生成相同的文件（与分块大小无关）；开局特征与按规则引擎逐张统计的结果一致。"""
+    path = generate_deal_bank(tmp_path / "a.deals", 3000, seed=5, chunk_size=1000)
+    generate_deal_bank(tmp_path / "b.deals", 3000, seed=5, chunk_size=1000)
+    assert (tmp_path / "a.deals").read_bytes() == (tmp_path / "b.deals").read_bytes()
+
+    bank = DealBank(path)
+    assert len(bank) == 3000 and len(set(map(bytes, bank.deals["order"][:, :24]))) == 3000
+    rules = HanafudaRules()
+    for index in range(0, 3000, 7):
+        rules.reset(deal=bank.deal(index))
+        record = bank[index]
+        groups = [rules.player_hands[0], rules.player_hands[1], rules.table_cards]
+        assert record["lights"].tolist() == [sum(card.category == "光" for card in group) for group in groups]
+        assert record["pairs"].tolist() == [
+            sum(1 for month in range(1, 13) if sum(card.month == month for card in group) >= 2) for group in groups
+        ]
+        assert bool(record["instant_win"]) == rules.game_over
+        assert rules.current_player == record["first_player"]
+
+
+def test_env_draws_deals_by_index(tmp_path):
+    """环境按 deal_index（未给出时按种子）取发牌；发牌库在进程间传递时只传递路径。"""
+    bank = DealBank(generate_deal_bank(tmp_path / "eval.deals", 100, seed=0))
+    expected = HanafudaRules()
+
+    def dealt(index):
+        expected.reset(deal=(bank[index]["order"], bank[index]["first_player"]))
+        return deal_of(expected)[0].tolist(), expected.current_player
+
+    env = HanafudaEnv(deal_bank=bank)
+    for index in (0, 41, 99, 141):
+        env.reset(options={"deal_index": index})
+        order, first_player = deal_of(env.rules)
+        assert (order.tolist(), first_player) == dealt(index % 100)
+
+    env.reset(seed=12)
+    assert deal_of(env.rules)[0].tolist() == dealt(12)[0]
+    env.reset()
+    assert deal_of(env.rules)[0].tolist() == dealt(13)[0]
+
+    copied = pickle.loads(pickle.dumps(bank))
+    assert copied.path == bank.path and isinstance(copied.deals, np.memmap)
+    assert len(pickle.dumps(bank)) < 1000
+
+
+def test_evaluation_on_bank_is_independent_of_seed(tmp_path):
+    """使用发牌库时，确定性智能体的评估结果与种子、进程数无关，并与串行评估一致。"""
+    path = str(generate_deal_bank(tmp_path / "eval.deals", 50, seed=1))
+    specs = [("rule", None), ("rule", None)]
+    first = evaluate_duel_parallel(specs, num_games=50, seed=3, num_workers=1, lockstep_games=8, deal_bank_path=path)
+    second = evaluate_duel_parallel(specs, num_games=50, seed=11, num_workers=2, lockstep_games=16, deal_bank_path=path)
+    serial = evaluate_duel(RuleAgent(), RuleAgent(), num_games=50, seed=3, deal_bank_path=path)
+    assert first == second == serial
@@ -0,0 +1,87 @@
+"""
+批量发牌生成器 (DealGenerator) 的测试。
+"""
+
+import pytest
+import numpy as np
+
+from hanafuda_rl.envs.bitboard import BitboardRules
+from hanafuda_rl.envs.deals import Deal, DealGenerator, opening_wins, shuffle_deals
+from hanafuda_rl.envs.hanafuda_env import HanafudaEnv
+from hanafuda_rl.envs.rules import HanafudaRules
+
+
+def opening_of(rules):
+    return rules.game_over, rules.game_result, dict(rules.yaku_points), {p: list(rules.yaku_list[p]) for p in range(2)}
+
+
+def test_opening_wins_match_rules_reset():
+    """批量判定的手四/食付与 HanafudaRules.reset 的逐张判定一致（包含两名玩家同时满足条件的发牌）。"""
+    order, first_player = shuffle_deals(np.random.default_rng(0), 20000)
+    crafted = [
+        list(range(0, 8)) + list(range(8, 16)),  # 两人都是两组手四
+        [0, 1, 4, 5, 8, 9, 12, 13] + list(range(16, 24)),  # 玩家0食付、玩家1手四
+        [0, 1, 2, 3, 8, 9, 12, 16] + [4, 5, 20, 21, 24, 25, 28, 29],  # 玩家0手四、玩家1食付
+    ]
+    for head in crafted:
+        order = np.vstack([order, head + [card for card in range(48) if card not in head]])
+    win0, win1 = opening_wins(order)
+    assert win0.sum() > 10 and win1.sum() > 10
+
+    rules = HanafudaRules()
+    for row in range(len(order)):
+        rules.reset(deal=(order[row], 0))
+        assert rules.game_result == (1 if win1[row] else 0 if win0[row] else None)
+        assert rules.yaku_points[0] == (6 if win0[row] else 0)
+        assert rules.yaku_points[1] == (6 if win1[row] else 0)
+        assert rules.game_over == bool(win0[row] | win1[row])
+
+
+@pytest.mark.parametrize("rules_class", [HanafudaRules, BitboardRules])
+def test_reset_from_generated_deals_matches_full_check(rules_class):
+    """instant_win 为 False 时跳过判定，reset 的结果与完整判定相同。"""
+    generator = DealGenerator(batch_size=64)
+    np_random = np.random.default_rng(1)
+    fast, full = rules_class(), rules_class()
+    for _ in range(500):
+        deal = generator.next_deal(np_random)
+        fast.reset(deal=deal)
+        full.reset(deal=deal[:2])
+        assert opening_of(fast) == opening_of(full)
+        assert fast.compute_hash() == full.compute_hash()
+
+
+def test_generator_is_reproducible_and_matches_deck_deal_after_seeding():
+    """相同种子给出相同的发牌序列；设定种子后的第一局与逐局 Deck.deal 的发牌相同。"""
+    def deals(seed, count):
+        generator, np_random = DealGenerator(batch_size=16), np.random.default_rng(seed)
+        return [(tuple(deal.order), deal.first_player) for deal in (generator.next_deal(np_random) for _ in range(count))]
+
+    assert deals(3, 100) == deals(3, 100) != deals(4, 100)
+    assert len(set(deals(3, 100))) == 100
+
+    for seed in range(20):
+        rules, reference = HanafudaRules(), HanafudaRules()
+        rules.reset(deal=DealGenerator().next_deal(np.random.default_rng(seed)))
+        reference.reset(np_random=np.random.default_rng(seed))
+        assert rules.zobrist_hash == reference.zobrist_hash
+
+
+def test_env_reset_with_seed_is_reproducible():
+    """批量发牌的环境在 reset(seed=...) 后给出与逐局发牌相同的开局，之后的发牌序列由种子确定。"""
+    env, reference = HanafudaEnv(), HanafudaEnv(deal_batch_size=0)
+    for seed in range(10):
+        env.reset(seed=seed)
+        reference.reset(seed=seed)
+        assert env.rules.zobrist_hash == reference.rules.zobrist_hash
+
+    def unseeded_hashes(seed):
+        env.reset(seed=seed)
+        hashes = []
+        for _ in range(40):
+            env.reset()
+            hashes.append(env.rules.zobrist_hash)
+        return hashes
+
+    assert unseeded_hashes(7) == unseeded_hashes(7)
+    assert isinstance(env.deal_generator.next_deal(env.np_random), Deal)
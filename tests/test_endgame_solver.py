@@ -0,0 +1,98 @@
+"""
+精确残局求解器 (EndgameSolver) 的测试：与不剪枝的穷举极小极大结果一致，并可作为智能体模式与打标签工具使用。
+"""
+
+import numpy as np
+import pytest
+
+from hanafuda_rl.envs.hanafuda_env import HanafudaEnv
+from hanafuda_rl.envs.rules import HanafudaRules
+from hanafuda_rl.envs.bitboard import BitboardRules, snapshot_from_rules
+from hanafuda_rl.agents.endgame_solver import EndgameSolver
+from hanafuda_rl.agents.mcts_agent import MCTSAgent
+from hanafuda_rl.agents.random_agent import RandomAgent
+from hanafuda_rl.train.label_endgames import label_endgames
+
+
+def late_game(seed, pile_size):
+    """随机下到牌山剩余 pile_size 张（总是叫牌以免对局提前结束）；对局已结束时返回 None。"""
+    rules = HanafudaRules()
+    rules.reset(np_random=np.random.default_rng(seed))
+    rng = np.random.default_rng(seed)
+    while not rules.game_over and len(rules.draw_pile) > pile_size:
+        player = rules.current_player
+        action = int(rng.choice(np.flatnonzero(rules.get_legal_actions_mask(player))))
+        rules.perform_action(37 if action == 36 else action, player)
+    return None if rules.game_over else rules
+
+
+def minimax(rules, player_id):
+    """不剪枝、不用置换表的穷举搜索（player_id 视角）。"""
+    if rules.game_over:
+        if rules.game_result in (0, 1):
+            return rules.yaku_points[rules.game_result] * (1 if rules.game_result == player_id else -1)
+        return 0.0
+    player = rules.current_player
+    values = []
+    for action in np.flatnonzero(rules.get_legal_actions_mask(player)):
+        rules.push_action(int(action), player)
+        values.append(minimax(rules, player_id))
+        rules.undo()
+    return max(values) if player == player_id else min(values)
+
+
+@pytest.mark.parametrize("seed", range(12))
+def test_solver_matches_exhaustive_minimax(seed):
+    rules = late_game(seed, 14)
+    if rules is None:
+        pytest.skip("game ended early")
+    before = rules.zobrist_hash
+    solver = EndgameSolver()
+    values = solver.solve(rules)
+    assert rules.zobrist_hash == before  # 求解不修改输入的引擎
+
+    player = rules.current_player
+    for action, value in values.items():
+        rules.push_action(action, player)
+        assert value == minimax(rules, player)
+        rules.undo()
+    assert sorted(values) == [int(a) for a in np.flatnonzero(rules.get_legal_actions_mask(player))]
+
+    # 置换表跨求解复用，对手视角的价值取相反数
+    assert solver.solve(snapshot_from_rules(rules), player_id=1 - player) == {a: -v for a, v in values.items()}
+
+
+def test_solver_gives_up_beyond_budget():
+    rules = late_game(3, 20)
+    assert EndgameSolver(max_nodes=10).solve(rules) is None
+    assert EndgameSolver(max_nodes=10).best_action(rules) is None
+    action = EndgameSolver().best_action(rules)
+    assert rules.get_legal_actions_mask(rules.current_player)[action]
+
+
+def test_bitboard_hash_matches_rules_hash():
+    rules = late_game(5, 16)
+    bitboard = BitboardRules()
+    bitboard.restore(snapshot_from_rules(rules))
+    assert bitboard.compute_hash() == rules.zobrist_hash
+
+
+def test_mcts_endgame_mode_plays_legal_moves():
+    env = HanafudaEnv()
+    agent = MCTSAgent(num_rollouts=50, seed=0, endgame_solver=EndgameSolver(), endgame_determinizations=4)
+    opponent = RandomAgent(seed=0)
+    for game in range(6):
+        obs, info = env.reset(seed=game)
+        terminated = False
+        while not terminated:
+            player = agent if env.current_player == game % 2 else opponent
+            action = player.select_action(obs, info["action_mask"])
+            assert info["action_mask"][action]
+            obs, _, terminated, _, info = env.step(action)
+
+
+def test_label_endgames():
+    observations, masks, values = label_endgames(num_games=10, max_pile=14, seed=0)
+    assert len(masks) == len(values) == len(observations["hand"]) > 0
+    assert np.array_equal(~np.isnan(values), masks)
+    assert np.all(observations["deck_remaining"] <= 14 / 24 + 1e-6)
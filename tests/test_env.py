@@ -114,6 +114,7 @@ def test_action_mask_play_phase(env, deck):
     env.rules.player_hands[0] = [matsu_hikari]
     env.rules.player_hands[1] = [deck.cards[i] for i in range(8, 16)] # 填充对手手牌
     env.rules.table_cards = [ume_kasu]
+    env.rules.invalidate_mask_cache()
     mask_a = env.get_action_mask()
     expected_a = np.zeros(38, dtype=bool)
     # 动作ID = 手牌槽位 * 4 + 配对选项
@@ -123,6 +124,7 @@ def test_action_mask_play_phase(env, deck):
     # 场景B: 手牌有一张牌，场上有一张匹配项
     env.rules.player_hands[0] = [matsu_hikari]
     env.rules.table_cards = [matsu_tan]
+    env.rules.invalidate_mask_cache()
     mask_b = env.get_action_mask()
     expected_b = np.zeros(38, dtype=bool)
     expected_b[0 * 4 + 0] = True # 第0张手牌，选择配对第0张场牌
@@ -143,6 +145,7 @@ def test_action_mask_draw_phase(env, deck):
     # 场景A: 抽中的牌在场上没有匹配项
     env.rules.drawn_card = matsu_hikari # 手动设置抽中的牌
     env.rules.table_cards = [ume_kasu]
+    env.rules.invalidate_mask_cache()
     mask_a = env.get_action_mask()
     expected_a = np.zeros(38, dtype=bool)
     expected_a[32 + 3] = True # 抽牌动作(32-35)，选择“不配对”(选项3)
@@ -151,6 +154,7 @@ def test_action_mask_draw_phase(env, deck):
     # 场景B: 抽中的牌在场上有一张匹配项
     env.rules.drawn_card = matsu_hikari
     env.rules.table_cards = [matsu_tan]
+    env.rules.invalidate_mask_cache()
     mask_b = env.get_action_mask()
     expected_b = np.zeros(38, dtype=bool)
     expected_b[32 + 0] = True # 抽牌动作，选择配对第0张场牌
@@ -164,6 +168,7 @@ def test_action_mask_koikoi_phase(env, phase):
     env.reset(seed=1)
     env.rules.current_player = 0
     env.rules.turn_phase = phase # 设置为出牌后(2)或抽牌后(3)的叫牌阶段
+    env.rules.invalidate_mask_cache()
 
     mask = env.get_action_mask()
     expected = np.zeros(38, dtype=bool)
@@ -214,4 +219,151 @@ def test_random_rollout_stability(env):
 
             step_count += 1
             # 防止无限循环的保护
-            assert step_count < 200, f"第 {i+1} 局游戏超过200步，可能存在无限循环"
\ No newline at end of file
+            assert step_count < 200, f"第 {i+1} 局游戏超过200步，可能存在无限循环"
+
+# --- 测试 5: 观测缓冲区与扁平观测模式 ---
+def test_obs_does_not_alias_rules_state(env):
+    """观测中的役进度是数值拷贝，不会随规则引擎内部数组的改变而改变。"""
+    obs, _ = env.reset(seed=3)
+    progress = obs["my_yaku_progress"].copy()
+    env.rules.yaku_progress[env.current_player][:] = 0.5
+    np.testing.assert_array_equal(obs["my_yaku_progress"], progress)
+
+
+@pytest.mark.parametrize("flat", [False, True])
+def test_returned_obs_is_not_overwritten(flat):
+    """相邻两次返回的观测不共享缓冲区；终局观测在自动重置和之后的对局中保持不变。"""
+    env = HanafudaEnv(flat=flat)
+    as_array = (lambda obs: obs.copy()) if flat else (lambda obs: np.concatenate([obs["hand"], obs["table"], obs["current_scores"]]))
+    obs, info = env.reset(seed=0)
+    terminated = False
+    while not terminated:
+        previous, expected = obs, as_array(obs)
+        obs, _, terminated, _, info = env.step(np.flatnonzero(info["action_mask"])[0])
+        np.testing.assert_array_equal(as_array(previous), expected)
+    terminal, expected = obs, as_array(obs)
+    for seed in range(1, 4):
+        obs, info = env.reset(seed=seed)
+        for _ in range(3):
+            obs, _, _, _, info = env.step(np.flatnonzero(info["action_mask"])[0])
+    np.testing.assert_array_equal(as_array(terminal), expected)
+
+
+@pytest.mark.skipif(check_env is None, reason="stable-baselines3 is not installed")
+def test_flat_env_api_compliance():
+    """flat=True 时环境同样符合标准 API。"""
+    check_env(HanafudaEnv(flat=True), warn=True)
+
+
+@pytest.mark.parametrize("use_bitboard", [False, True])
+def test_flat_obs_matches_dict_obs(use_bitboard):
+    """扁平观测向量与 Dict 观测逐字段一致（离散字段为独热编码）。"""
+    env = HanafudaEnv(use_bitboard=use_bitboard)
+    flat_env = HanafudaEnv(use_bitboard=use_bitboard, flat=True)
+    for seed in range(5):
+        obs, info = env.reset(seed=seed)
+        flat_obs, _ = flat_env.reset(seed=seed)
+        terminated = False
+        while not terminated:
+            assert flat_obs.shape == flat_env.observation_space.shape
+            expected = np.concatenate([
+                obs["hand"], obs["table"], obs["my_collected"], obs["opp_collected"],
+                np.eye(49)[obs["drawn_card"]], obs["deck_remaining"], obs["current_scores"],
+                obs["koikoi_flags"], obs["my_yaku_progress"], obs["opp_yaku_progress"],
+                np.eye(4)[obs["turn_phase"]],
+            ]).astype(np.float32)
+            np.testing.assert_array_equal(flat_obs, expected)
+
+            action = np.where(info["action_mask"])[0][0]
+            obs, _, terminated, _, info = env.step(action)
+            flat_obs, _, _, _, _ = flat_env.step(action)
+
+
+@pytest.mark.parametrize("use_bitboard", [False, True])
+def test_belief_obs_matches_visible_zones(use_bitboard):
+    """未见牌观测等于可见牌区的补集，各月张数与之一致；其余字段与默认观测相同。"""
+    env = HanafudaEnv(use_bitboard=use_bitboard)
+    belief_env = HanafudaEnv(use_bitboard=use_bitboard, belief_obs=True)
+    flat_env = HanafudaEnv(use_bitboard=use_bitboard, belief_obs=True, flat=True)
+    for seed in range(5):
+        obs, info = env.reset(seed=seed)
+        belief_obs, _ = belief_env.reset(seed=seed)
+        flat_obs, _ = flat_env.reset(seed=seed)
+        terminated = False
+        while not terminated:
+            for key in ("unseen_cards", "unseen_month_counts"):
+                assert belief_env.observation_space[key].contains(belief_obs[key])
+            for key in obs:
+                np.testing.assert_array_equal(belief_obs[key], obs[key])
+            seen = obs["hand"] | obs["table"] | obs["my_collected"] | obs["opp_collected"]
+            if obs["turn_phase"] == 1:
+                seen[obs["drawn_card"]] = 1
+            np.testing.assert_array_equal(belief_obs["unseen_cards"], 1 - seen)
+            np.testing.assert_array_equal(belief_obs["unseen_month_counts"] * 4, (1 - seen).reshape(12, 4).sum(axis=1))
+            np.testing.assert_array_equal(
+                flat_obs[272:], np.concatenate([belief_obs["unseen_cards"], belief_obs["unseen_month_counts"]]),
+            )
+
+            rules = belief_env.rules
+            maintained = (list(rules.unseen_masks), dict(rules.unseen_month_counts))
+            rules._rebuild_unseen()
+            assert maintained == (rules.unseen_masks, rules.unseen_month_counts)
+
+            action = info["action_mask"].nonzero()[0][-1]
+            obs, _, terminated, _, info = env.step(action)
+            belief_obs, _, _, _, _ = belief_env.step(action)
+            flat_obs, _, _, _, _ = flat_env.step(action)
+
+
+def _play_decisions(env, seed):
+    """只在合法动作多于一个时随机选择，返回 (各玩家奖励之和, 对局结果, 决策步数, 总步数, 自动执行的步数)。"""
+    rng = np.random.default_rng(seed)
+    obs, info = env.reset(seed=seed)
+    totals, decisions, steps, skipped = {0: 0., 1: 0.}, 0, 0, 0
+    terminated = False
+    while not terminated:
+        legal = np.flatnonzero(info["action_mask"])
+        action = legal[0] if len(legal) == 1 else rng.choice(legal)
+        decisions += len(legal) > 1
+        steps += 1
+        player = env.current_player
+        obs, reward, terminated, _, info = env.step(action)
+        totals[player] += reward
+        skipped += info.get("skipped_steps", 0)
+    return totals, env.rules.game_result, decisions, steps, skipped
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_auto_advance_preserves_game_and_rewards(seed):
+    """自动推进唯一合法动作不改变对局与各玩家的奖励之和，只减少步数。"""
+    totals, result, decisions, steps, _ = _play_decisions(HanafudaEnv(), seed)
+    auto_totals, auto_result, auto_decisions, auto_steps, skipped = _play_decisions(HanafudaEnv(auto_advance=True), seed)
+    assert auto_result == result and auto_decisions == decisions
+    assert auto_totals == pytest.approx(totals)
+    assert auto_steps + skipped == steps
+
+
+def test_selfplay_wrapper_auto_advance_skips_forced_decisions():
+    """SelfPlayEnvWrapper 配合 auto_advance 时，RL 智能体只会遇到需要选择的局面，奖励之和不变。"""
+    from hanafuda_rl.agents.rule_agent import RuleAgent
+    from hanafuda_rl.train.train_sb3 import SelfPlayEnvWrapper
+
+    for seed in range(20):
+        returns, steps = [], []
+        for auto_advance in (False, True):
+            env = SelfPlayEnvWrapper(HanafudaEnv(auto_advance=auto_advance), opponent_agent=RuleAgent())
+            rng = np.random.default_rng(seed)
+            env.reset(seed=seed)
+            total, count, terminated = 0., 0, False
+            while not terminated:
+                legal = np.flatnonzero(env.get_action_mask())
+                if auto_advance:
+                    assert len(legal) > 1
+                action = legal[0] if len(legal) == 1 else rng.choice(legal)
+                _, reward, terminated, _, info = env.step(action)
+                total += reward
+                count += 1
+            returns.append(total)
+            steps.append(count)
+        assert returns[0] == pytest.approx(returns[1])
+        assert steps[1] < steps[0]
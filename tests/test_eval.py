@@ -0,0 +1,66 @@
+"""
+并行分片评估 (evaluate_duel_parallel) 的测试：
+结果与进程数无关，且对确定性智能体与串行的 evaluate_duel 完全一致；复式评估 (evaluate_duplicate) 的镜像发牌与序贯检验。
+"""
+
+from hanafuda_rl.train import eval as eval_module
+from hanafuda_rl.train.eval import duplicate_deal, evaluate_duel, evaluate_duel_parallel, evaluate_duplicate, evaluate_shard
+from hanafuda_rl.agents.rule_agent import RuleAgent
+
+
+def test_parallel_matches_serial_for_deterministic_agents():
+    """规则智能体互相对战时，分片评估与串行评估的统计完全相同。"""
+    serial = evaluate_duel(RuleAgent(), RuleAgent(), num_games=80, seed=7)
+    parallel = evaluate_duel_parallel([("rule", None), ("rule", None)], num_games=80, seed=7, num_workers=1, lockstep_games=16)
+    assert serial == parallel
+
+
+def test_parallel_is_independent_of_worker_count():
+    """同一组种子下，不同的进程数与同步局数给出相同的统计。"""
+    specs = [("random", None), ("rule", None)]
+    single = evaluate_duel_parallel(specs, num_games=60, seed=3, num_workers=1, lockstep_games=7)
+    multi = evaluate_duel_parallel(specs, num_games=60, seed=3, num_workers=3, lockstep_games=32)
+    assert single == multi
+    assert single["wins_agent0"] + single["wins_agent1"] + single["draws"] == 60
+
+
+def test_shards_reuse_agents_created_by_worker_initializer(monkeypatch):
+    """worker 初始化时创建的智能体供之后的所有分片使用，分片中不再创建（加载）智能体。"""
+    specs = [("rule", None), ("random", None)]
+    monkeypatch.setattr(eval_module, "_WORKER_AGENTS", {})
+    eval_module._init_worker(specs, 5)
+    created = eval_module._WORKER_AGENTS[eval_module._agents_key(specs, 5)]
+
+    def fail(*args):
+        raise AssertionError("agents should not be created per shard")
+
+    monkeypatch.setattr(eval_module, "create_agent", fail)
+    results = evaluate_shard(specs, range(10), seed=5) + evaluate_shard(specs, range(10, 20), seed=5)
+    assert len(results) == 20 and len(created) == 2
+
+
+def test_duplicate_deals_are_mirrored():
+    """复式评估中同一发牌的两局交换双方手牌与先手，场牌与牌堆相同。"""
+    first, second = duplicate_deal(10, seed=3), duplicate_deal(11, seed=3)
+    assert second.order == first.order[8:16] + first.order[:8] + first.order[16:]
+    assert second.first_player == 1 - first.first_player
+    assert duplicate_deal(12, seed=3).order != first.order
+
+
+def test_duplicate_mirror_cancels_deal_luck():
+    """相同的确定性智能体对战时，每个发牌的两局互为镜像，配对净得分恰好为 0，评估不会提前结束。"""
+    stats = evaluate_duplicate([("rule", None), ("rule", None)], max_deals=40, seed=5, num_workers=1, batch_deals=20)
+    assert stats["deals"] == 40 and not stats["stopped_early"]
+    assert stats["net_score"] == 0 and stats["net_score_ci"] == (0, 0)
+    assert stats["wins_agent0"] == stats["wins_agent1"]
+
+
+def test_duplicate_stops_once_significant():
+    """规则智能体明显强于随机智能体：序贯检验在达到上限前结束，结果与进程数无关。"""
+    specs = [("rule", None), ("random", None)]
+    single = evaluate_duplicate(specs, max_deals=2000, seed=1, num_workers=1, lockstep_games=32, batch_deals=50)
+    multi = evaluate_duplicate(specs, max_deals=2000, seed=1, num_workers=2, lockstep_games=16, batch_deals=50)
+    assert single == multi
+    assert single["stopped_early"] and single["deals"] < 2000
+    assert single["net_score_ci"][0] > 0 and single["win_rate_ci"][0] > 0.5
+    assert single["wins_agent0"] + single["wins_agent1"] + single["draws"] == 2 * single["deals"]
@@ -0,0 +1,104 @@
+"""
+对手推理服务 (OpponentInferenceServer) 的测试：
+多个客户端并发提交观测时，服务返回的动作与直接使用 PPOAgent 的结果一致。
+"""
+
+from functools import partial
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from hanafuda_rl.envs.hanafuda_env import HanafudaEnv
+from hanafuda_rl.envs.vec_env import HanafudaVecEnv
+from hanafuda_rl.agents.random_agent import RandomAgent
+from hanafuda_rl.agents.sb3_agent import PPOAgent
+from hanafuda_rl.agents.inference_server import OpponentInferenceServer
+
+
+@pytest.fixture(scope="module")
+def model_path(tmp_path_factory):
+    from sb3_contrib import MaskablePPO
+
+    path = str(tmp_path_factory.mktemp("models") / "opponent.zip")
+    MaskablePPO("MultiInputPolicy", HanafudaVecEnv(4, opponent=RandomAgent(seed=0), seed=0), seed=0).save(path)
+    return path
+
+
+def test_server_matches_ppo_agent(model_path):
+    """并发客户端得到的动作与 PPOAgent 逐个预测的动作相同。"""
+    env = HanafudaEnv()
+    reference = PPOAgent(model_path)
+    num_clients = 4
+    server = OpponentInferenceServer(model_path, env.observation_space, num_clients=num_clients).start()
+    try:
+        failures = []
+        reference_lock = threading.Lock()  # PPOAgent 本身不是线程安全的
+
+        def play(rank):
+            client = server.client(rank)
+            local_env = HanafudaEnv()
+            obs, info = local_env.reset(seed=rank)
+            for _ in range(30):
+                mask = info["action_mask"]
+                action = client.select_action(obs, mask)
+                with reference_lock:
+                    if action != reference.select_action(obs, mask):
+                        failures.append((rank, action))
+                obs, _, terminated, _, info = local_env.step(action)
+                if terminated:
+                    obs, info = local_env.reset()
+
+        threads = [threading.Thread(target=play, args=(rank,)) for rank in range(num_clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not failures
+    finally:
+        server.close()
+
+
+def test_server_clients_work_in_subproc_workers(model_path):
+    """客户端随 make_env_func 传入 SubprocVecEnv 的 worker 后仍能与服务进程通信。"""
+    from stable_baselines3.common.vec_env import SubprocVecEnv
+    from hanafuda_rl.train.train_sb3 import make_env_func
+
+    num_envs = 2
+    server = OpponentInferenceServer(model_path, HanafudaEnv().observation_space, num_clients=num_envs).start()
+    venv = SubprocVecEnv([make_env_func(rank, 0, opponent_client=server.client(rank)) for rank in range(num_envs)])
+    try:
+        obs = venv.reset()
+        agent = RandomAgent(seed=0)
+        for _ in range(30):
+            masks = np.stack(venv.env_method("action_masks"))
+            obs, _, _, _ = venv.step(agent.select_actions(obs, masks))
+    finally:
+        venv.close()
+        server.close()
+
+
+def test_server_answers_without_waiting_when_all_clients_are_ready(model_path):
+    """所有客户端都已提交请求时服务立即计算，不等满 max_wait（客户端运行在 SubprocVecEnv 的 worker 中）。"""
+    from stable_baselines3.common.vec_env import SubprocVecEnv
+    from hanafuda_rl.train.train_sb3 import SelfPlayEnvWrapper
+
+    max_wait, num_steps = 0.05, 40
+    server = OpponentInferenceServer(model_path, HanafudaEnv().observation_space, num_clients=1, max_wait=max_wait).start()
+    venv = SubprocVecEnv([partial(SelfPlayEnvWrapper, HanafudaEnv(), server.client(0))])
+    try:
+        obs = venv.reset()
+        agent = RandomAgent(seed=0)
+        step_seconds = []
+        for _ in range(num_steps):
+            start = time.perf_counter()
+            masks = np.stack(venv.env_method("get_action_mask"))
+            obs, _, _, _ = venv.step(agent.select_actions(obs, masks))
+            step_seconds.append(time.perf_counter() - start)
+        # 每一步至少有一次对手请求；等满时间窗时每步不少于 max_wait。
+        # 取中位数，排除服务进程第一次前向计算的预热时间
+        assert np.median(step_seconds) < max_wait / 2
+    finally:
+        venv.close()
+        server.close()
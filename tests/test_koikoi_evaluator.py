@@ -0,0 +1,107 @@
+"""
+叫牌决策评估器 (KoikoiEvaluator / KoikoiOverrideAgent) 的测试。
+"""
+
+import random
+
+import numpy as np
+
+from hanafuda_rl.envs.hanafuda_env import HanafudaEnv
+from hanafuda_rl.agents.endgame_solver import EndgameSolver
+from hanafuda_rl.agents.koikoi_evaluator import KoikoiEvaluator, KoikoiOverrideAgent
+from hanafuda_rl.agents.mcts_agent import information_state, sample_determinization
+from hanafuda_rl.agents.random_agent import RandomAgent
+
+
+def decision_states(num_games, min_pile=0):
+    """随机对局中遇到的叫牌决策局面：(观测, 动作掩码, 决策方当前役分, 牌山张数)。"""
+    env = HanafudaEnv()
+    rng = np.random.default_rng(0)
+    states = []
+    for seed in range(num_games):
+        obs, info = env.reset(seed=seed)
+        terminated = False
+        while not terminated:
+            mask = info["action_mask"]
+            if mask[36] and mask[37]:
+                observation = {key: np.copy(value) for key, value in obs.items()}  # 环境会复用观测数组
+                states.append((observation, mask, env.rules.yaku_points[env.current_player], len(env.rules.draw_pile)))
+                action = 37  # 总是叫牌，使对局继续并覆盖更多局面
+            else:
+                action = rng.choice(np.flatnonzero(mask))
+            obs, _, terminated, _, info = env.step(action)
+    return states
+
+
+def test_evaluate_decision_states():
+    evaluator = KoikoiEvaluator(num_samples=16, time_limit=None, seed=0)
+    states = decision_states(30)
+    assert states
+    for obs, mask, points, _ in states:
+        stop_value, continue_value = evaluator.evaluate(obs)
+        assert stop_value == points
+        assert -50 <= continue_value <= 50
+        assert evaluator.evaluate(obs) == (stop_value, continue_value)
+    assert evaluator.cache_hits == len(states)
+
+    env = HanafudaEnv()
+    obs, _ = env.reset(seed=0)
+    assert evaluator.evaluate(obs) is None
+
+    batch = {key: np.stack([state[0][key] for state in states] + [obs[key]]) for key in obs}
+    values = evaluator.evaluate_batch(batch)
+    np.testing.assert_array_equal(values[:-1], [evaluator.evaluate(state[0]) for state in states])
+    assert np.isnan(values[-1]).all()
+
+
+def test_time_limit_keeps_minimum_samples():
+    """时间上限已耗尽时仍抽满 min_samples 个分配。"""
+    obs = decision_states(10)[0][0]
+    evaluator = KoikoiEvaluator(num_samples=64, time_limit=0.0, min_samples=24, seed=0)
+    playouts = []
+    playout = evaluator._playout
+    evaluator._playout = lambda snapshot: playouts.append(snapshot) or playout(snapshot)
+    evaluator.evaluate(obs)
+    assert len(playouts) == 24
+
+
+def test_exact_mode_averages_solver_values():
+    """残局中叫牌价值为各确定化局面精确价值的平均。"""
+    obs = next(state[0] for state in decision_states(60) if state[3] <= 14)
+    evaluator = KoikoiEvaluator(num_samples=8, time_limit=None, endgame_solver=EndgameSolver(), seed=3)
+    _, continue_value = evaluator.evaluate(obs)
+
+    rng, solver = random.Random(3), EndgameSolver()
+    known, unseen, opp_hand_size = information_state(obs)
+    expected = [solver.solve(sample_determinization(known, unseen, opp_hand_size, rng), player_id=0)[37] for _ in range(8)]
+    assert continue_value == sum(expected) / 8
+
+
+def test_override_agent_improves_random_agent():
+    env = HanafudaEnv()
+    agent = KoikoiOverrideAgent(RandomAgent(seed=1), KoikoiEvaluator(num_samples=32, time_limit=None, seed=0))
+    scores = {}
+    for name, player in (("override", agent), ("base", RandomAgent(seed=1))):
+        opponent, total = RandomAgent(seed=2), 0
+        for game in range(150):
+            obs, info = env.reset(seed=game)
+            me = game % 2
+            terminated = False
+            while not terminated:
+                current = player if env.current_player == me else opponent
+                action = current.select_action(obs, info["action_mask"])
+                assert info["action_mask"][action]
+                obs, _, terminated, _, info = env.step(action)
+            winner = env.rules.game_result
+            if winner in (0, 1):
+                total += env.rules.yaku_points[winner] * (1 if winner == me else -1)
+        scores[name] = total
+    assert scores["override"] > scores["base"]
+
+
+def test_override_agent_batch_matches_single():
+    states = decision_states(10)
+    agent = KoikoiOverrideAgent(RandomAgent(seed=0), KoikoiEvaluator(num_samples=8, time_limit=None, seed=0))
+    batch = {key: np.stack([state[0][key] for state in states]) for key in states[0][0]}
+    actions = agent.select_actions(batch, np.stack([state[1] for state in states]))
+    assert list(actions) == [agent.select_action(state[0], state[1]) for state in states]
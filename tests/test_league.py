@@ -0,0 +1,90 @@
+"""
+对手联盟 (OpponentLeague) 与策略注册表 (PolicyRegistry) 的测试。
+"""
+
+import numpy as np
+import pytest
+
+from hanafuda_rl.envs.hanafuda_env import HanafudaEnv
+from hanafuda_rl.agents.random_agent import RandomAgent
+from hanafuda_rl.agents.rule_agent import RuleAgent
+from hanafuda_rl.agents.league import PolicyRegistry, OpponentLeague
+from hanafuda_rl.agents.sb3_agent import policy_parameters
+from hanafuda_rl.train import train_sb3
+
+
+@pytest.fixture(scope="module")
+def checkpoints(tmp_path_factory):
+    """三个参数不同的检查点：(路径, 策略类, policy_kwargs, 参数)。"""
+    from sb3_contrib import MaskablePPO
+    from hanafuda_rl.envs.vec_env import HanafudaVecEnv
+
+    directory = tmp_path_factory.mktemp("league")
+    result = []
+    for seed in range(3):
+        model = MaskablePPO("MultiInputPolicy", HanafudaVecEnv(4, opponent=RandomAgent(seed=0), seed=0), seed=seed)
+        path = str(directory / f"ckpt_{seed}.zip")
+        model.save(path)
+        result.append((path, type(model.policy), model.policy_kwargs, policy_parameters(model.policy)))
+    return result
+
+
+def test_registry_lru_cache_respects_memory_cap(checkpoints):
+    """缓存超过上限时淘汰最久未使用的策略，命中缓存时不读取磁盘。"""
+    env = HanafudaEnv()
+    probe = PolicyRegistry(env.observation_space, env.action_space)
+    path, policy_class, policy_kwargs, parameters = checkpoints[0]
+    probe.register_checkpoint("probe", path, policy_class, policy_kwargs, parameters)
+    one_policy = probe.cache_bytes
+
+    registry = PolicyRegistry(env.observation_space, env.action_space, max_bytes=2 * one_policy)
+    for index, (path, policy_class, policy_kwargs, parameters) in enumerate(checkpoints):
+        registry.register_checkpoint(f"c{index}", path, policy_class, policy_kwargs, parameters)
+    assert registry.cache_bytes <= 2 * one_policy and registry.disk_loads == 0
+
+    registry.get("c1")
+    registry.get("c2")
+    assert registry.disk_loads == 0  # c1、c2 仍在缓存中
+    agent = registry.get("c0")  # c0 已被淘汰，从磁盘重新加载并淘汰 c1
+    assert registry.disk_loads == 1
+    for name, value in checkpoints[0][3].items():
+        np.testing.assert_array_equal(policy_parameters(agent.policy)[name], value)
+    registry.get("c2")
+    assert registry.disk_loads == 1
+    registry.get("c1")
+    assert registry.disk_loads == 2
+
+
+def test_league_samples_by_weight():
+    env = HanafudaEnv()
+    registry = PolicyRegistry(env.observation_space, env.action_space)
+    random_agent, rule_agent = RandomAgent(seed=0), RuleAgent()
+    registry.register_agent("random", random_agent)
+    registry.register_agent("rule", rule_agent)
+    league = OpponentLeague(registry, {"random": 1.0, "rule": 3.0, "missing": 5.0}, seed=0)
+    names = [league.sample_name() for _ in range(4000)]
+    assert set(names) == {"random", "rule"}
+    assert abs(names.count("rule") / len(names) - 0.75) < 0.03
+    league.weights["random"] = 0.0
+    assert league.sample() is rule_agent
+
+
+def test_selfplay_wrapper_switches_league_opponent_at_reset(checkpoints):
+    """SelfPlayEnvWrapper 每局 reset 时从联盟抽取对手，新检查点可在运行中加入。"""
+    env = HanafudaEnv()
+    registry = PolicyRegistry(env.observation_space, env.action_space)
+    registry.register_agent("rule", RuleAgent())
+    league = OpponentLeague(registry, {"rule": 1.0}, seed=0)
+    wrapper = train_sb3.SelfPlayEnvWrapper(env, opponent_agent=RandomAgent(seed=0), league=league)
+    wrapper.reset(seed=0)
+    assert isinstance(wrapper.opponent_agent, RuleAgent)
+
+    path, policy_class, policy_kwargs, parameters = checkpoints[1]
+    wrapper.add_league_opponent("ckpt", 1.0, policy_class, policy_kwargs, parameters, path=path)
+    league.weights["rule"] = 0.0
+    wrapper.reset(seed=1)
+    assert wrapper.opponent_agent is registry.get("ckpt") and registry.disk_loads == 0
+    terminated = False
+    while not terminated:
+        legal = np.flatnonzero(wrapper.get_action_mask())
+        _, _, terminated, _, _ = wrapper.step(legal[0])
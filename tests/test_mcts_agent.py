@@ -0,0 +1,82 @@
+"""
+确定化蒙特卡洛搜索智能体 (MCTSAgent) 的测试。
+"""
+
+import numpy as np
+
+from hanafuda_rl.envs.hanafuda_env import HanafudaEnv
+from hanafuda_rl.envs.bitboard import BitboardRules
+from hanafuda_rl.agents.mcts_agent import MCTSAgent
+from hanafuda_rl.agents.random_agent import RandomAgent
+
+
+def test_determinization_is_consistent_with_observation():
+    """确定化局面与观测一致：已知牌区、牌山张数、对手手牌张数、役分与合法动作都相同。"""
+    for flat in (False, True):
+        env = HanafudaEnv(flat=flat)
+        agent = MCTSAgent(seed=0)
+        sim = BitboardRules()
+        rng = np.random.default_rng(0)
+        for seed in range(10):
+            obs, info = env.reset(seed=seed)
+            terminated = False
+            while not terminated:
+                rules = env.rules
+                me = env.current_player
+                sim.restore(agent.determinize(obs))
+                assert [c.card_id for c in sim.player_hands[0]] == [c.card_id for c in rules.player_hands[me]]
+                assert len(sim.player_hands[1]) == len(rules.player_hands[1 - me])
+                assert [c.card_id for c in sim.table_cards] == [c.card_id for c in rules.table_cards]
+                assert len(sim.pile) == len(rules.draw_pile)
+                assert sim.yaku_points == {0: rules.yaku_points[me], 1: rules.yaku_points[1 - me]}
+                np.testing.assert_array_equal(sim.get_legal_actions_mask(0), info["action_mask"])
+                all_cards = sim.hand_masks[0] | sim.hand_masks[1] | sim.table_mask | sim.collected_masks[0] | sim.collected_masks[1]
+                all_cards |= sum(1 << card_id for card_id in sim.pile)
+                if sim.drawn_id >= 0:
+                    all_cards |= 1 << sim.drawn_id
+                assert all_cards == (1 << 48) - 1
+                # 确定化局面自带的未见牌信息与由牌区重新计算的结果相同
+                recorded = (list(sim.unseen_masks), dict(sim.unseen_month_counts))
+                sim._rebuild_unseen()
+                assert recorded == (sim.unseen_masks, sim.unseen_month_counts)
+
+                action = rng.choice(np.flatnonzero(info["action_mask"]))
+                obs, _, terminated, _, info = env.step(action)
+
+
+def test_mcts_agent_beats_random_agent():
+    """小预算下也只选择合法动作，且平均得分高于随机智能体。"""
+    env = HanafudaEnv()
+    agent, opponent = MCTSAgent(num_rollouts=100, seed=0), RandomAgent(seed=0)
+    total = 0
+    for game in range(40):
+        obs, info = env.reset(seed=game)
+        me = game % 2
+        terminated = False
+        while not terminated:
+            player = agent if env.current_player == me else opponent
+            action = player.select_action(obs, info["action_mask"])
+            assert info["action_mask"][action]
+            obs, _, terminated, _, info = env.step(action)
+        winner = env.rules.game_result
+        if winner in (0, 1):
+            total += env.rules.yaku_points[winner] * (1 if winner == me else -1)
+    assert total > 0
+
+
+def test_mcts_agent_with_ppo_prior(tmp_path):
+    """以 PPO 策略为先验时，先验只覆盖合法动作，搜索照常给出合法动作。"""
+    from sb3_contrib import MaskablePPO
+    from hanafuda_rl.envs.vec_env import HanafudaVecEnv
+    from hanafuda_rl.agents.sb3_agent import PPOAgent
+
+    path = str(tmp_path / "model.zip")
+    MaskablePPO("MultiInputPolicy", HanafudaVecEnv(4, opponent=RandomAgent(seed=0), seed=0), seed=0).save(path)
+    ppo = PPOAgent(path)
+    agent = MCTSAgent(num_rollouts=50, prior_agent=ppo, seed=0)
+
+    env = HanafudaEnv()
+    obs, info = env.reset(seed=1)
+    probs = ppo.action_probabilities(obs, info["action_mask"])
+    assert np.isclose(probs.sum(), 1.0) and not probs[~info["action_mask"]].any()
+    assert info["action_mask"][agent.select_action(obs, info["action_mask"])]
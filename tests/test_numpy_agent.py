@@ -0,0 +1,81 @@
+"""
+纯 NumPy 推理路径 (export_actor_npz + NumpyPolicyAgent) 的测试：在测试对局语料上与 PPOAgent 逐步一致。
+"""
+
+import numpy as np
+import pytest
+
+from hanafuda_rl.envs.hanafuda_env import HanafudaEnv
+from hanafuda_rl.agents.random_agent import RandomAgent
+from hanafuda_rl.agents.numpy_agent import NumpyPolicyAgent
+from hanafuda_rl.agents.sb3_agent import PPOAgent, export_actor_npz
+
+
+def trained_model_path(directory, flat):
+    from sb3_contrib import MaskablePPO
+    from hanafuda_rl.envs.vec_env import HanafudaVecEnv
+    from hanafuda_rl.train.train_sb3 import SelfPlayEnvWrapper
+    from sb3_contrib.common.wrappers import ActionMasker
+
+    if flat:
+        env = ActionMasker(SelfPlayEnvWrapper(HanafudaEnv(flat=True), RandomAgent(seed=0)), lambda env: env.get_action_mask())
+        model = MaskablePPO("MlpPolicy", env, n_steps=64, batch_size=64, n_epochs=2, seed=0)
+    else:
+        model = MaskablePPO("MultiInputPolicy", HanafudaVecEnv(16, opponent=RandomAgent(seed=0), seed=0), n_steps=16,
+                            batch_size=64, n_epochs=2, seed=0)
+    model.learn(total_timesteps=512)  # 训练几步，使各层参数都偏离初始化
+    path = str(directory / "model.zip")
+    model.save(path)
+    return path
+
+
+@pytest.mark.parametrize("flat", [False, True])
+def test_numpy_agent_matches_ppo_agent(tmp_path, flat):
+    path = trained_model_path(tmp_path, flat)
+    npz_path = export_actor_npz(path, str(tmp_path / "actor.npz"))
+    reference, agent = PPOAgent(path), NumpyPolicyAgent(npz_path)
+
+    env = HanafudaEnv(flat=flat)
+    rng = np.random.default_rng(0)
+    observations, masks = [], []
+    for seed in range(20):
+        obs, info = env.reset(seed=seed)
+        terminated = False
+        while not terminated:
+            mask = info["action_mask"]
+            action = agent.select_action(obs, mask)
+            assert action == reference.select_action(obs, mask)
+            observations.append(obs.copy() if flat else {key: np.copy(value) for key, value in obs.items()})
+            masks.append(np.array(mask))
+            # 用随机动作推进对局，使语料覆盖各个阶段
+            obs, _, terminated, _, info = env.step(rng.choice(np.flatnonzero(mask)))
+
+    # 批量模式与逐个调用结果相同
+    if flat:
+        batch = np.stack(observations)
+    else:
+        batch = {key: np.stack([obs[key] for obs in observations]) for key in observations[0]}
+    expected = [agent.select_action(obs, mask) for obs, mask in zip(observations, masks)]
+    np.testing.assert_array_equal(agent.select_actions(batch, np.stack(masks)), expected)
+
+
+def test_export_rejects_custom_features_extractor(tmp_path):
+    """自定义特征提取器的参数不会被导出，导出时直接报错。"""
+    import torch
+    from sb3_contrib import MaskablePPO
+    from stable_baselines3.common.torch_layers import BaseFeaturesExtractor
+    from hanafuda_rl.train.train_sb3 import SelfPlayEnvWrapper
+    from sb3_contrib.common.wrappers import ActionMasker
+
+    class LinearExtractor(BaseFeaturesExtractor):
+        def __init__(self, observation_space):
+            super().__init__(observation_space, features_dim=16)
+            self.linear = torch.nn.Linear(observation_space.shape[0], 16)
+
+        def forward(self, observations):
+            return self.linear(observations)
+
+    env = ActionMasker(SelfPlayEnvWrapper(HanafudaEnv(flat=True), RandomAgent(seed=0)), lambda env: env.get_action_mask())
+    model = MaskablePPO("MlpPolicy", env, policy_kwargs=dict(features_extractor_class=LinearExtractor), seed=0)
+    with pytest.raises(ValueError, match="LinearExtractor"):
+        export_actor_npz(model, str(tmp_path / "actor.npz"))
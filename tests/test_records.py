@@ -0,0 +1,81 @@
+"""
+对局记录 (envs/records.py) 的测试：记录的对局经 HanafudaRules 重放后与原对局完全一致，文件可追加并按编号随机访问。
+"""
+
+import numpy as np
+import pytest
+
+from hanafuda_rl.envs.hanafuda_env import HanafudaEnv
+from hanafuda_rl.envs.records import GameRecords, GameRecordWriter, RECORD_DTYPE, replay
+from hanafuda_rl.agents.random_agent import RandomAgent
+from hanafuda_rl.train.eval import evaluate_duel_parallel
+
+
+def state_of(rules):
+    """局面的可比较摘要（Card 对象属于各自的牌组，快照不能跨引擎直接比较）。"""
+    return rules.zobrist_hash, rules.current_player, dict(rules.yaku_points), rules.game_result
+
+
+def play(env, seeds, agent):
+    """用 agent 下完若干局，返回每局每个动作执行前（及终局）的局面摘要列表。"""
+    games = []
+    for seed in seeds:
+        obs, info = env.reset(seed=seed)
+        snapshots, terminated = [], False
+        while not terminated:
+            snapshots.append(state_of(env.rules))
+            obs, _, terminated, _, info = env.step(agent.select_action(obs, info["action_mask"]))
+        snapshots.append(state_of(env.rules))
+        games.append(snapshots)
+    return games
+
+
+@pytest.mark.parametrize("auto_advance", [False, True])
+def test_recorded_games_replay_exactly(tmp_path, auto_advance):
+    path = str(tmp_path / "games.rec")
+    env = HanafudaEnv(auto_advance=auto_advance, recorder=GameRecordWriter(path, chunk_size=7))
+    games = play(env, range(30), RandomAgent(seed=0))
+    env.close()
+
+    records = GameRecords(path)
+    assert len(records) == 30
+    assert list(records.records["seed"]) == list(range(30))
+    for index, snapshots in enumerate(games):
+        rules = records.replay(index)
+        assert state_of(rules) == snapshots[-1]
+        assert records[index]["winner"] == rules.game_result
+        if not auto_advance:
+            # 无自动执行时，每个 step 恰好对应一个记录的动作
+            assert len(records.actions(index)) == len(snapshots) - 1
+            middle = len(snapshots) // 2
+            assert state_of(records.replay(index, num_actions=middle)) == snapshots[middle]
+            for (rules, player, action), snapshot in zip(records.positions(index), snapshots):
+                assert state_of(rules) == snapshot and player == snapshot[1]
+
+
+def test_record_file_appends_across_writers(tmp_path):
+    path = str(tmp_path / "games.rec")
+    for start in (0, 5):
+        env = HanafudaEnv(recorder=GameRecordWriter(path))
+        play(env, range(start, start + 5), RandomAgent(seed=start))
+        env.close()
+    records = GameRecords(path)
+    assert list(records.records["seed"]) == list(range(10))
+    assert (tmp_path / "games.rec").stat().st_size == 16 + 10 * RECORD_DTYPE.itemsize
+
+    (tmp_path / "bad.rec").write_bytes(b"not a record file")
+    with pytest.raises(ValueError):
+        GameRecords(str(tmp_path / "bad.rec"))
+
+
+def test_evaluate_duel_parallel_records_games_in_order(tmp_path):
+    path = str(tmp_path / "eval.rec")
+    specs = [("random", None), ("rule", None)]
+    stats = evaluate_duel_parallel(specs, num_games=40, seed=7, num_workers=1, lockstep_games=8, record_path=path)
+    records = GameRecords(path)
+    assert list(records.records["seed"]) == [7 + i for i in range(40)]
+    assert sum(records.records["winner"] == 0) == stats["wins_agent0"]
+    for record in records.records:
+        rules = replay(record)
+        assert rules.game_over and rules.game_result == record["winner"]
+        assert np.array_equal(record["points"], [rules.yaku_points[0], rules.yaku_points[1]])
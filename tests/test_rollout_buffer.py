@@ -0,0 +1,62 @@
+"""
+位压缩回合缓冲区 (PackedMaskableDictRolloutBuffer) 的测试：
+与 MaskableDictRolloutBuffer 给出完全相同的 minibatch，且观测与掩码的内存占用大幅减少。
+"""
+
+import numpy as np
+import torch as th
+from sb3_contrib.common.maskable.buffers import MaskableDictRolloutBuffer
+
+from hanafuda_rl.envs.vec_env import HanafudaVecEnv
+from hanafuda_rl.agents.random_agent import RandomAgent
+from hanafuda_rl.train.rollout_buffer import PackedMaskableDictRolloutBuffer
+
+
+def fill(buffers, num_envs, num_steps):
+    venv = HanafudaVecEnv(num_envs, opponent=RandomAgent(seed=0), seed=0)
+    agent, rng = RandomAgent(seed=1), np.random.default_rng(2)
+    obs = venv.reset()
+    starts = np.ones(num_envs, dtype=np.float32)
+    for _ in range(num_steps):
+        masks = venv.action_masks()
+        actions = agent.select_actions(obs, masks)
+        values, log_probs = th.as_tensor(rng.normal(size=num_envs)), th.as_tensor(rng.normal(size=num_envs))
+        next_obs, rewards, dones, _ = venv.step(actions)
+        for buffer in buffers:
+            buffer.add(obs, actions, rewards, starts, values, log_probs, action_masks=masks)
+        obs, starts = next_obs, dones.astype(np.float32)
+    for buffer in buffers:
+        buffer.compute_returns_and_advantage(last_values=th.zeros(num_envs), dones=starts)
+
+
+def test_packed_buffer_matches_default_buffer():
+    num_envs, num_steps = 8, 32
+    venv = HanafudaVecEnv(1, opponent=RandomAgent(seed=0), seed=0)
+    args = (num_steps, venv.observation_space, venv.action_space)
+    default = MaskableDictRolloutBuffer(*args, device="cpu", n_envs=num_envs)
+    packed = PackedMaskableDictRolloutBuffer(*args, device="cpu", n_envs=num_envs)
+    fill([default, packed], num_envs, num_steps)
+
+    np.random.seed(0)
+    expected = list(default.get(batch_size=64))
+    np.random.seed(0)
+    actual = list(packed.get(batch_size=64))
+    assert len(expected) == len(actual)
+    for sample, packed_sample in zip(expected, actual):
+        for key in sample.observations:
+            assert th.equal(sample.observations[key].double(), packed_sample.observations[key].double()), key
+        for field in ("actions", "old_values", "old_log_prob", "advantages", "returns", "action_masks"):
+            assert th.equal(getattr(sample, field), getattr(packed_sample, field)), field
+
+    default_bytes = sum(obs.nbytes for obs in default.observations.values()) + default.action_masks.nbytes
+    assert packed.nbytes() * 7 < default_bytes
+
+
+def test_maskable_ppo_trains_with_packed_buffer():
+    from sb3_contrib import MaskablePPO
+
+    venv = HanafudaVecEnv(16, opponent=RandomAgent(seed=0), seed=0)
+    model = MaskablePPO("MultiInputPolicy", venv, n_steps=16, batch_size=64, n_epochs=1, seed=0,
+                        rollout_buffer_class=PackedMaskableDictRolloutBuffer)
+    model.learn(total_timesteps=512)
+    assert isinstance(model.rollout_buffer, PackedMaskableDictRolloutBuffer)
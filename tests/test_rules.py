@@ -0,0 +1,248 @@
+"""
+规则引擎 (HanafudaRules) 的测试。
+
+役种判定的性质测试：在随机的收集牌集合上，增量更新的查表式役种判定
+必须与逐张筛选牌列表的原始判定给出相同的役分、役种列表和役进度。
+"""
+
+import copy
+import pickle
+
+import pytest
+import numpy as np
+
+from hanafuda_rl.envs.rules import CARD_MONTHS, CARDS, Deck, HanafudaRules
+
+
+def reference_evaluate_yaku(collected_cards):
+    """原始的役种判定：按牌名与类别逐张筛选收集牌。返回 (役分, 役种列表, 役进度)。"""
+    progress = np.zeros(11, dtype=np.float32)
+    yaku_points = 0
+    yaku_list = []
+
+    hikari_with_rain = [card for card in collected_cards if card.card_name == "柳间小野道风"]
+    progress[0] = len(hikari_with_rain) / 1
+    hikari_without_rain = [card for card in collected_cards if card.category == "光" and card.card_name != "柳间小野道风"]
+    progress[1] = len(hikari_without_rain) / 4
+    flower = [card for card in collected_cards if card.card_name == "樱上幕"]
+    progress[2] = len(flower) / 1
+    wine = [card for card in collected_cards if card.card_name == "菊上杯"]
+    progress[3] = len(wine) / 1
+    moon = [card for card in collected_cards if card.card_name == "芒上月"]
+    progress[4] = len(moon) / 1
+    animal = [card for card in collected_cards if card.card_name in ["萩间野猪", "枫间鹿", "牡丹上蝶"]]
+    progress[5] = len(animal) / 3
+    red_tan = [card for card in collected_cards if card.card_name in ["松上赤短", "梅上赤短", "樱上赤短"]]
+    progress[6] = len(red_tan) / 3
+    blue_tan = [card for card in collected_cards if card.card_name in ["牡丹青短", "菊上青短", "枫上青短"]]
+    progress[7] = len(blue_tan) / 3
+    tan = [card for card in collected_cards if card.category == "短册"]
+    progress[8] = len(tan) / 5
+    tane = [card for card in collected_cards if card.category == "种"]
+    progress[9] = len(tane) / 5
+    kasu = [card for card in collected_cards if card.category == "佳士"]
+    progress[10] = len(kasu) / 10
+
+    if len(hikari_with_rain) + len(hikari_without_rain) == 5:
+        yaku_points += 10.
+        yaku_list.append("五光")
+    elif len(hikari_without_rain) == 4:
+        yaku_points += 8.
+        yaku_list.append("四光")
+    elif len(hikari_without_rain) == 3 and len(hikari_with_rain) == 1:
+        yaku_points += 7.
+        yaku_list.append("雨四光")
+    elif len(hikari_without_rain) == 3:
+        yaku_points += 6.
+        yaku_list.append("三光")
+    if len(flower) + len(wine) == 2:
+        yaku_points += 5.
+        yaku_list.append("花见酒")
+    if len(moon) + len(wine) == 2:
+        yaku_points += 5.
+        yaku_list.append("月见酒")
+    if len(animal) == 3:
+        yaku_points += 5.
+        yaku_list.append("猪鹿蝶")
+    if len(red_tan) == 3:
+        yaku_points += 5.
+        yaku_list.append("赤短")
+    if len(blue_tan) == 3:
+        yaku_points += 5.
+        yaku_list.append("青短")
+    if len(tan) >= 5:
+        yaku_points += 1. + (len(tan) - 5)
+        yaku_list.append(f"短册 x{1 + (len(tan) - 5)}")
+    if len(tane) >= 5:
+        yaku_points += 1. + (len(tane) - 5)
+        yaku_list.append(f"种 x{1 + (len(tane) - 5)}")
+    if len(kasu) >= 10:
+        yaku_points += 1. + (len(kasu) - 10)
+        yaku_list.append(f"佳士 x{1 + (len(kasu) - 10)}")
+
+    return yaku_points, yaku_list, progress
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_incremental_yaku_matches_reference(seed):
+    """按随机顺序逐对收集随机子集中的牌，每一步的判定都与原始判定一致。"""
+    rng = np.random.default_rng(seed)
+    cards = Deck().cards
+    rules = HanafudaRules()
+    rules.turn_phase = 0
+    subset = rng.permutation(48)[:rng.integers(2, 49)]
+
+    for i in range(0, len(subset) - 1, 2):
+        rules._collect_cards(0, cards[subset[i]], cards[subset[i + 1]])
+        rules.yaku_points[0] = 0
+        rules._evaluate_yaku(0)
+
+        points, yaku_list, progress = reference_evaluate_yaku(rules.collected_cards[0])
+        assert rules.yaku_points[0] == points
+        assert rules.yaku_list[0] == yaku_list
+        np.testing.assert_array_equal(rules.yaku_progress[0], progress)
+
+
+def test_set_collected_cards_rebuilds_yaku_counts():
+    """set_collected_cards 重新统计的计数与增量统计一致。"""
+    cards = Deck().cards
+    rules = HanafudaRules()
+    rules._collect_cards(1, cards[0], cards[8], cards[28], cards[40])
+    counts = list(rules.yaku_counts[1])
+    progress = rules.yaku_progress[1].copy()
+
+    other = HanafudaRules()
+    other.set_collected_cards({0: [], 1: [cards[0], cards[8], cards[28], cards[40]]})
+    assert other.yaku_counts[1] == counts
+    assert other.yaku_counts[0] == [0] * 11
+    np.testing.assert_array_equal(other.yaku_progress[1], progress)
+
+
+def test_legal_actions_mask_is_cached_until_state_changes():
+    """同一状态下重复调用返回同一个只读数组；执行动作或调用 invalidate_mask_cache 后重新计算。"""
+    rules = HanafudaRules()
+    rules.reset(np_random=np.random.default_rng(5))
+    player = rules.current_player
+
+    mask = rules.get_legal_actions_mask(player)
+    assert rules.get_legal_actions_mask(player) is mask
+    assert not mask.flags.writeable
+
+    rules.perform_action(int(np.flatnonzero(mask)[0]), player)
+    new_mask = rules.get_legal_actions_mask(rules.current_player)
+    assert new_mask is not mask
+
+    rules.turn_phase = 2
+    assert rules.get_legal_actions_mask(rules.current_player) is new_mask  # 直接改写状态不会自动使缓存失效
+    rules.invalidate_mask_cache()
+    koikoi_mask = rules.get_legal_actions_mask(rules.current_player)
+    assert list(np.flatnonzero(koikoi_mask)) == [36, 37]
+
+
+def state_of(rules):
+    """用于比较的完整状态（牌以ID表示）。"""
+    ids = lambda cards: [card.card_id for card in cards]
+    return (
+        [ids(hand) for hand in rules.player_hands], ids(rules.table_cards),
+        {p: ids(cards) for p, cards in rules.collected_cards.items()}, ids(rules.draw_pile),
+        rules.drawn_card.card_id if rules.drawn_card else None,
+        dict(rules.yaku_points), dict(rules.koikoi_flags), {p: list(y) for p, y in rules.yaku_list.items()},
+        {p: list(c) for p, c in rules.yaku_counts.items()}, {p: rules.yaku_progress[p].tolist() for p in range(2)},
+        rules.current_player, rules.turn_phase, rules.game_over, rules.game_result,
+    )
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_push_action_and_undo_restore_every_state(seed):
+    """沿随机对局逐步 push_action，再逐步 undo，每一步都恢复到原来的状态。"""
+    rules = HanafudaRules()
+    rules.reset(np_random=np.random.default_rng(seed))
+    rng = np.random.default_rng(seed)
+    states = []
+    while not rules.game_over:
+        states.append(state_of(rules))
+        player = rules.current_player
+        rules.push_action(rng.choice(np.flatnonzero(rules.get_legal_actions_mask(player))), player)
+
+    final_state = state_of(rules)
+    clone = rules.clone()
+    assert state_of(clone) == final_state == state_of(copy.deepcopy(rules))
+    assert clone.deck is rules.deck
+
+    for expected in reversed(states):
+        rules.undo()
+        assert state_of(rules) == expected
+        np.testing.assert_array_equal(
+            rules.get_legal_actions_mask(rules.current_player),
+            rules._compute_legal_actions_mask(rules.current_player),
+        )
+    assert state_of(clone) == final_state # 副本不受原对象撤销的影响
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_zobrist_hash_is_maintained_incrementally(seed):
+    """增量维护的 Zobrist 哈希与从头计算的结果一致，undo 后恢复，且不同状态的哈希不同。"""
+    rules = HanafudaRules()
+    rules.reset(np_random=np.random.default_rng(seed))
+    rng = np.random.default_rng(seed + 1)
+    hashes = {}
+    while True:
+        assert rules.zobrist_hash == rules.compute_hash()
+        key = state_of(rules)[:-1]  # 哈希不区分胜负结果以外的同一局面
+        assert hashes.setdefault(rules.zobrist_hash, key) == key
+        if rules.game_over:
+            break
+        player = rules.current_player
+        before = rules.zobrist_hash
+        rules.push_action(rng.choice(np.flatnonzero(rules.get_legal_actions_mask(player))), player)
+        assert rules.zobrist_hash != before
+
+    while rules._history:
+        rules.undo()
+        assert rules.zobrist_hash == rules.compute_hash()
+    assert rules.clone().zobrist_hash == rules.zobrist_hash
+
+
+def test_zobrist_hash_identifies_transpositions():
+    """以不同顺序收集同样的牌、到达同一局面时，哈希相同。"""
+    rules = HanafudaRules()
+    rules.reset(np_random=np.random.default_rng(0))
+    snapshot = rules.snapshot()
+    hands, collected = snapshot.player_hands, snapshot.collected_cards
+    # 交换两名玩家收集牌的加入顺序不改变局面（改写后的记录中的哈希已失效，从头计算）
+    rules.restore(snapshot._replace(collected_cards=(hands[0][:2], ())))
+    first = rules.compute_hash()
+    rules.restore(snapshot._replace(collected_cards=(hands[0][1::-1], ())))
+    assert rules.compute_hash() == first
+    rules.restore(snapshot._replace(collected_cards=((), hands[0][:2])))
+    assert rules.compute_hash() != first
+
+
+def test_restore_copies_recorded_hash():
+    """restore 直接取回记录中的哈希，与从头计算的结果一致。"""
+    rules = HanafudaRules()
+    rules.reset(np_random=np.random.default_rng(3))
+    rng = np.random.default_rng(3)
+    snapshots = []
+    while not rules.game_over:
+        snapshots.append(rules.snapshot())
+        player = rules.current_player
+        rules.perform_action(rng.choice(np.flatnonzero(rules.get_legal_actions_mask(player))), player)
+    for snapshot in snapshots:
+        rules.restore(snapshot)
+        assert rules.zobrist_hash == snapshot.zobrist_hash == rules.compute_hash()
+
+
+def test_card_catalogue_is_shared_and_immutable():
+    """所有牌组与规则引擎共享同一份牌目录；牌对象不可修改，复制与反序列化后仍是目录中的同一对象。"""
+    rules = HanafudaRules()
+    rules.reset(np_random=np.random.default_rng(0))
+    assert Deck().cards is CARDS
+    assert all(card is CARDS[card.card_id] for hand in rules.player_hands for card in hand)
+    assert [card.month for card in CARDS] == list(CARD_MONTHS) == [card_id // 4 + 1 for card_id in range(48)]
+
+    card = CARDS[0]
+    assert not hasattr(card, "__dict__")
+    with pytest.raises(AttributeError):
+        card.month = 2
+    assert copy.deepcopy(card) is card and pickle.loads(pickle.dumps(card)) is card
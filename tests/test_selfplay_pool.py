@@ -0,0 +1,105 @@
+"""
+常驻自我对弈 worker 的对手热更新测试：新的对手参数通过 env_method 广播或推理服务推送，
+worker 不重建、不读取模型文件，更新后的对手与 PPOAgent 的动作一致。
+"""
+
+import numpy as np
+import pytest
+
+from hanafuda_rl.envs.hanafuda_env import HanafudaEnv
+from hanafuda_rl.agents.random_agent import RandomAgent
+from hanafuda_rl.agents.sb3_agent import PPOAgent, PolicyAgent, policy_parameters
+from hanafuda_rl.train import train_sb3
+
+
+@pytest.fixture(scope="module")
+def trained_model(tmp_path_factory):
+    from sb3_contrib import MaskablePPO
+    from hanafuda_rl.envs.vec_env import HanafudaVecEnv
+
+    model = MaskablePPO("MultiInputPolicy", HanafudaVecEnv(16, opponent=RandomAgent(seed=0), seed=0), n_steps=16,
+                        batch_size=64, n_epochs=1, seed=0)
+    model.learn(total_timesteps=256)
+    path = str(tmp_path_factory.mktemp("models") / "opponent.zip")
+    model.save(path)
+    return model, path
+
+
+def test_policy_agent_matches_ppo_agent(trained_model):
+    """按参数建立的 PolicyAgent 与从文件加载的 PPOAgent 动作一致。"""
+    model, path = trained_model
+    env = HanafudaEnv()
+    agent = PolicyAgent(type(model.policy), env.observation_space, env.action_space, model.policy_kwargs)
+    agent.load_parameters(policy_parameters(model.policy))
+    reference = PPOAgent(path)
+    obs, info = env.reset(seed=0)
+    for _ in range(60):
+        action = agent.select_action(obs, info["action_mask"])
+        assert action == reference.select_action(obs, info["action_mask"])
+        obs, _, terminated, _, info = env.step(action)
+        if terminated:
+            obs, info = env.reset()
+
+
+@pytest.mark.parametrize("mode", ["broadcast", "server", "league", "league_server"])
+def test_push_opponent_to_live_workers(trained_model, monkeypatch, mode):
+    """push_opponent 把新对手送进已启动的 worker，worker 随后照常推进对局。"""
+    from stable_baselines3.common.vec_env import SubprocVecEnv
+
+    model, path = trained_model
+    monkeypatch.setattr(train_sb3, "N_ENVS", 2)
+    monkeypatch.setattr(train_sb3, "USE_INFERENCE_SERVER", mode in ("server", "league_server"))
+    monkeypatch.setattr(train_sb3, "USE_LEAGUE", mode in ("league", "league_server"))
+    monkeypatch.setattr(train_sb3, "USE_BATCHED_VEC_ENV", False)
+
+    venv = SubprocVecEnv([train_sb3.make_env_func(rank, 0) for rank in range(2)])
+    server = None
+    try:
+        obs = venv.reset()
+        server = train_sb3.push_opponent(venv, model, path)
+        opponents = venv.get_attr("opponent_agent")
+        if mode == "league":
+            assert server is None
+            for league in venv.get_attr("league"):
+                assert league.weights[path] == train_sb3.LEAGUE_CHECKPOINT_WEIGHT
+                assert league.registry.disk_loads == 0
+        elif mode == "league_server":
+            # 最新检查点由推理服务计算；再次推送后上一个检查点转为 worker 内的普通检查点
+            assert server is not None
+            assert [league.registry.get(train_sb3.LEAGUE_LATEST).client_id for league in venv.get_attr("league")] == [0, 1]
+            assert train_sb3.push_opponent(venv, model, path, server, previous_path=path) is server
+            for league in venv.get_attr("league"):
+                assert league.weights[path] == league.weights[train_sb3.LEAGUE_LATEST] == train_sb3.LEAGUE_CHECKPOINT_WEIGHT
+        elif mode == "server":
+            assert server is not None and [opponent.client_id for opponent in opponents] == [0, 1]
+            assert train_sb3.push_opponent(venv, model, path, server) is server  # 之后只推送参数
+        else:
+            assert server is None
+            for opponent in opponents:
+                for name, value in policy_parameters(model.policy).items():
+                    np.testing.assert_array_equal(policy_parameters(opponent.policy)[name], value)
+
+        agent = RandomAgent(seed=0)
+        for _ in range(20):
+            masks = np.stack(venv.env_method("action_masks"))
+            obs, _, _, _ = venv.step(agent.select_actions(obs, masks))
+    finally:
+        venv.close()
+        if server is not None:
+            server.close()
+
+
+def test_push_opponent_to_batched_env(trained_model, monkeypatch):
+    """批量环境同样通过 set_opponent_parameters 原地更换对手。"""
+    from stable_baselines3.common.vec_env import VecMonitor
+    from hanafuda_rl.envs.vec_env import HanafudaVecEnv
+
+    model, path = trained_model
+    monkeypatch.setattr(train_sb3, "USE_BATCHED_VEC_ENV", True)
+    venv = VecMonitor(HanafudaVecEnv(8, opponent=RandomAgent(seed=0), seed=0))
+    obs = venv.reset()
+    assert train_sb3.push_opponent(venv, model, path) is None
+    assert isinstance(venv.venv.opponent, PolicyAgent)
+    agent = RandomAgent(seed=0)
+    for _ in range(10):
+        obs, _, _, _ = venv.step(agent.select_actions(obs, venv.env_method("action_masks")))
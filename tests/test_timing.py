@@ -0,0 +1,103 @@
+"""
+分阶段计时的测试：关闭时不记录，打开后环境与自我对弈 worker 的计时点都被累计，
+TimingCallback 把耗时分解写入 SB3 的日志。
+"""
+
+import csv
+
+from stable_baselines3.common.logger import configure
+from stable_baselines3.common.vec_env import DummyVecEnv
+
+from hanafuda_rl.envs.hanafuda_env import HanafudaEnv
+from hanafuda_rl.envs.timing import TIMER, PhaseTimer, merge_timings
+from hanafuda_rl.train.timing_callback import TimedVecEnv, TimingCallback
+from hanafuda_rl.train.train_sb3 import make_env_func
+
+
+def play(env, steps):
+    _, info = env.reset(seed=0)
+    for _ in range(steps):
+        action = env.np_random.choice(info["action_mask"].nonzero()[0])
+        _, _, terminated, _, info = env.step(action)
+        if terminated:
+            _, info = env.reset()
+
+
+def test_env_timing_is_switchable():
+    """关闭时不记录任何计时；打开后 step、观测与掩码的调用次数都被记录。"""
+    env = HanafudaEnv()
+    TIMER.pop()
+    play(env, 50)
+    assert TIMER.pop() == {}
+
+    TIMER.enable()
+    try:
+        play(env, 50)
+    finally:
+        TIMER.enable(False)
+    timings = TIMER.pop()
+    assert timings["env/step"][1] == 50
+    assert timings["env/get_obs"][1] >= 50 and timings["env/action_mask"][1] >= 50
+    assert timings["env/step"][0] > 0
+
+
+def test_merge_timings_adds_seconds_and_calls():
+    first, second = PhaseTimer(), PhaseTimer()
+    first.add("a", 1.0)
+    second.add("a", 0.5)
+    second.add("b", 2.0)
+    assert merge_timings(first.pop(), second.pop()) == {"a": (1.5, 2), "b": (2.0, 1)}
+    assert first.pop() == {}
+
+
+def test_timing_callback_logs_breakdown(tmp_path):
+    """TimingCallback 每轮采样后记录 worker、对手、向量环境与学习器的耗时以及 steps/sec。"""
+    from sb3_contrib import MaskablePPO
+
+    vec_env = TimedVecEnv(DummyVecEnv([make_env_func(rank, seed=0, profile=True) for rank in range(2)]))
+    model = MaskablePPO("MultiInputPolicy", vec_env, n_steps=32, batch_size=32, n_epochs=1, seed=0)
+    model.set_logger(configure(str(tmp_path), ["csv"]))
+    model.learn(total_timesteps=192, callback=TimingCallback())
+    assert not TIMER.enabled
+
+    with open(tmp_path / "progress.csv") as f:
+        rows = list(csv.DictReader(f))
+    for key in ("timing/worker/step_seconds", "timing/opponent/turns_seconds", "timing/opponent/inference_us_per_call",
+                "timing/env/step_seconds", "timing/vec_env/step_seconds", "timing/vec_env/env_method_seconds",
+                "timing/ipc_estimate_seconds", "timing/rollout_steps_per_sec"):
+        assert all(float(row[key]) > 0 for row in rows)
+    assert float(rows[-1]["timing/learner/update_seconds"]) > 0 and float(rows[-1]["timing/steps_per_sec"]) > 0
+
+
+def test_subproc_workers_record_timings():
+    """make_env_func(profile=True) 在 SubprocVecEnv 的 worker 进程中打开计时。"""
+    import numpy as np
+    from stable_baselines3.common.vec_env import SubprocVecEnv
+    from hanafuda_rl.agents.random_agent import RandomAgent
+
+    vec_env = SubprocVecEnv([make_env_func(rank, seed=0, profile=True) for rank in range(2)])
+    try:
+        obs = vec_env.reset()
+        agent = RandomAgent(seed=0)
+        for _ in range(10):
+            obs, _, _, _ = vec_env.step(agent.select_actions(obs, np.stack(vec_env.env_method("action_masks"))))
+        for timings in vec_env.env_method("pop_timings"):
+            assert timings["worker/step"][1] == 10
+    finally:
+        vec_env.close()
+
+
+def test_collecting_worker_timings_is_not_timed(tmp_path):
+    """TimingCallback 收集 worker 计时的 env_method 调用不计入主进程的 vec_env/env_method。"""
+    from sb3_contrib import MaskablePPO
+
+    vec_env = TimedVecEnv(DummyVecEnv([make_env_func(rank, seed=0, profile=True) for rank in range(2)]))
+    callback = TimingCallback()
+    callback.init_callback(MaskablePPO("MultiInputPolicy", vec_env, n_steps=32, seed=0))
+    TIMER.enable()
+    TIMER.pop()
+    try:
+        assert len(callback._pop_worker_timings()) == 2
+    finally:
+        TIMER.enable(False)
+    assert "vec_env/env_method" not in TIMER.pop()
@@ -0,0 +1,48 @@
+"""
+置换表 (TranspositionTable) 的测试：键比较、两级替换策略与容量上限。
+"""
+
+from hanafuda_rl.agents.transposition import TranspositionTable, EXACT, LOWER_BOUND
+
+
+def test_probe_and_store():
+    table = TranspositionTable(max_entries=16)
+    assert table.probe(12345) is None
+    table.store(12345, depth=3, value=1.5, bound=LOWER_BOUND, best_action=7)
+    entry = table.probe(12345)
+    assert (entry.depth, entry.value, entry.bound, entry.best_action) == (3, 1.5, LOWER_BOUND, 7)
+    # 桶下标相同但键不同的局面不会命中
+    assert table.probe(12345 + table.capacity * 8) is None
+    assert (table.hits, table.misses) == (1, 2)
+
+
+def test_depth_preferred_replacement():
+    table = TranspositionTable(max_entries=16)
+    buckets = table.capacity // 2
+    deep, shallow, newer = 5, 5 + buckets, 5 + 2 * buckets  # 落在同一个桶
+    table.store(deep, depth=10, value=1.0)
+    table.store(shallow, depth=2, value=2.0)
+    assert table.probe(deep).value == 1.0 and table.probe(shallow).value == 2.0
+
+    # 浅条目只替换总是替换槽，深条目保留
+    table.store(newer, depth=1, value=3.0)
+    assert table.probe(deep).value == 1.0 and table.probe(shallow) is None and table.probe(newer).value == 3.0
+    assert table.replacements == 1
+
+    # 更深的条目占据深度优先槽，原条目降级
+    table.store(shallow, depth=20, value=4.0, bound=EXACT)
+    assert table.probe(shallow).value == 4.0 and table.probe(deep).value == 1.0 and table.probe(newer) is None
+
+    # 同一局面重新保存时只保留一个条目
+    table.store(deep, depth=30, value=5.0)
+    assert table.probe(deep).value == 5.0 and table.probe(shallow).value == 4.0
+    assert len(table) == 2
+
+
+def test_table_size_is_bounded():
+    table = TranspositionTable(max_entries=64)
+    for key in range(10000):
+        table.store(key * 2654435761 % 2**64, depth=key % 7, value=float(key))
+    assert len(table) <= table.capacity <= 64
+    table.clear()
+    assert len(table) == 0 and table.stores == 0
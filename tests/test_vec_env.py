@@ -0,0 +1,132 @@
+"""
+批量环境 (HanafudaVecEnv) 的测试。
+
+1.  批量推进的对局逻辑与 HanafudaRules 逐步一致（掩码、役分、阶段、结果）。
+2.  作为 VecEnv 能直接用于 MaskablePPO 的训练。
+"""
+
+import numpy as np
+
+from hanafuda_rl.envs.rules import HanafudaRules, score_yaku
+from hanafuda_rl.envs.vec_env import YAKU_GROUPS, HanafudaVecEnv, yaku_points_from_counts
+from hanafuda_rl.agents.random_agent import RandomAgent
+from hanafuda_rl.agents.rule_agent import RuleAgent
+
+
+def rules_from_vec_env(venv, row):
+    """按批量环境中第 row 局的状态构造一个等价的 HanafudaRules。"""
+    rules = HanafudaRules()
+    cards = rules.deck.cards
+    rules.player_hands = [[cards[i] for i in np.flatnonzero(venv._hands[row, p])] for p in range(2)]
+    rules.table_cards = [cards[i] for i in np.flatnonzero(venv._table[row])]
+    rules.set_collected_cards({p: [cards[i] for i in np.flatnonzero(venv._collected[row, p])] for p in range(2)})
+    rules.draw_pile = [cards[i] for i in venv._pile[row, :venv._pile_left[row]]]
+    rules.drawn_card = cards[venv._drawn[row]] if venv._drawn[row] < 48 else None
+    rules.yaku_points = {p: float(venv._scores[row, p]) for p in range(2)}
+    rules.koikoi_flags = {p: int(venv._koikoi[row, p]) for p in range(2)}
+    rules.current_player = int(venv._player[row])
+    rules.turn_phase = int(venv._phase[row])
+    return rules
+
+
+def test_batched_yaku_points_match_score_yaku():
+    """批量计分与 score_yaku 逐行计分相同。"""
+    rng = np.random.default_rng(0)
+    counts = rng.integers(0, YAKU_GROUPS.sum(axis=0) + 1, size=(5000, 11)).astype(np.int16)
+    expected = [score_yaku(row.tolist())[0] for row in counts]
+    np.testing.assert_array_equal(yaku_points_from_counts(counts), expected)
+
+
+def test_vec_env_matches_rules():
+    """批量对局逻辑与 HanafudaRules 逐步一致。"""
+    num_envs = 64
+    venv = HanafudaVecEnv(num_envs, opponent=RandomAgent(seed=0), seed=0)
+    venv.reset()
+    games = [rules_from_vec_env(venv, row) for row in range(num_envs)]
+    action_rng = np.random.default_rng(1)
+
+    running = np.array([not venv._over[row] for row in range(num_envs)])
+    while running.any():
+        rows = np.flatnonzero(running)
+        masks = venv._compute_masks(rows, venv._player[rows])
+        actions = np.array([action_rng.choice(np.flatnonzero(mask)) for mask in masks])
+        for row, mask, action in zip(rows, masks, actions):
+            rules = games[row]
+            np.testing.assert_array_equal(mask, rules.get_legal_actions_mask(rules.current_player))
+            rules.perform_action(action, rules.current_player)
+
+        venv._step_rows(rows, actions)
+        for row in rows:
+            rules = games[row]
+            for p in range(2):
+                assert [c.card_id for c in rules.player_hands[p]] == list(np.flatnonzero(venv._hands[row, p]))
+                assert rules.yaku_points[p] == venv._scores[row, p]
+                np.testing.assert_allclose(rules.yaku_progress[p], venv._progress[row, p])
+            assert [c.card_id for c in rules.table_cards] == list(np.flatnonzero(venv._table[row]))
+            assert rules.current_player == venv._player[row]
+            assert rules.turn_phase == venv._phase[row]
+            assert rules.game_over == venv._over[row]
+            if rules.game_over:
+                assert rules.game_result == venv._result[row]
+        running[rows] = ~venv._over[rows]
+
+
+def test_vec_env_opening_turn_ends_game():
+    """对手先手并在首回合凑役结束对局时，不再推进该局，RL 智能体的下一步直接报告终局。"""
+    venv = HanafudaVecEnv(1, opponent=RuleAgent(), seed=0)
+    venv.reset()
+    row = np.array([0])
+    other_cards = [c for c in range(48) if c not in (0, 1, 2, 5, 6, 7, 8, 9, 12, 16, 20, 24, 28, 32, 34, 40, 44)]
+
+    # 对手手牌含樱上幕(8)，场上有樱上赤短(9)与菊上杯(32)，牌堆顶为菊(34)：首回合凑成花见酒后停牌
+    venv._hands[0] = False
+    venv._hands[0, 0, [0, 1, 2, 5, 6, 7, 40, 44]] = True
+    venv._hands[0, 1, [8, 12, 16, 20, 24, 28, 36, 45]] = True
+    venv._table[0] = False
+    venv._table[0, [9, 32]] = True
+    venv._collected[0] = False
+    venv._pile[0] = other_cards[:23] + [34]
+    venv._pile_left[0] = 24
+    venv._drawn[0], venv._phase[0], venv._player[0] = 48, 0, 1
+    venv._scores[0], venv._koikoi[0], venv._progress[0] = 0., 0, 0.
+    venv._over[0], venv._result[0] = False, -2
+
+    venv._play_opening(row)
+    assert venv._over[0] and venv._result[0] == 1 and venv._finished[0]
+    hand_after_opening = venv._hands[0].copy()
+
+    masks = venv._rl_masks()
+    assert list(np.flatnonzero(masks[0])) == [36]
+    venv._masks = masks
+    _, rewards, dones, infos = venv.step(np.array([36]))
+    assert dones[0] and rewards[0] == -5.0
+    np.testing.assert_array_equal(infos[0]["terminal_observation"]["hand"], hand_after_opening[1].astype(np.int8))
+
+
+def test_vec_env_step_api():
+    """step 返回批量观测、奖励与自动重置后的掩码。"""
+    num_envs = 32
+    venv = HanafudaVecEnv(num_envs, opponent=RuleAgent(), seed=3)
+    obs = venv.reset()
+    assert obs["hand"].shape == (num_envs, 48)
+    agent = RandomAgent(seed=3)
+    finished = 0
+    for _ in range(200):
+        masks = venv.action_masks()
+        assert masks.any(axis=1).all(), "RL 智能体的每局都必须至少有一个合法动作"
+        obs, rewards, dones, infos = venv.step(agent.select_actions(obs, masks))
+        assert rewards.shape == (num_envs,)
+        for row in np.flatnonzero(dones):
+            assert "terminal_observation" in infos[row]
+            finished += 1
+    assert finished > 0
+
+
+def test_vec_env_trains_with_maskable_ppo():
+    """HanafudaVecEnv 可直接交给 MaskablePPO 训练。"""
+    from sb3_contrib import MaskablePPO
+    from stable_baselines3.common.vec_env import VecMonitor
+
+    venv = VecMonitor(HanafudaVecEnv(64, opponent=RandomAgent(seed=0), seed=0))
+    model = MaskablePPO("MultiInputPolicy", venv, n_steps=16, batch_size=256, n_epochs=1, seed=0)
+    model.learn(total_timesteps=2048)
@@ -0,0 +1,327 @@
+"""
+环境与规则引擎的步进吞吐量基准测试。
+
+用法：
+    python -m hanafuda_rl.train.benchmark --output results/benchmark.json
+    python -m hanafuda_rl.train.benchmark --compare results/benchmark.json  # 与保存的基线比较，退化时返回码为 1
+    python -m hanafuda_rl.train.benchmark --only rules env components
+
+所有对局都使用固定种子，同一台机器上的多次运行结果可以直接比较。
+吞吐量类指标 (steps_per_sec / games_per_sec) 越大越好，单次调用耗时 (us_per_call) 越小越好。
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from hanafuda_rl.envs.hanafuda_env import HanafudaEnv
+from hanafuda_rl.envs.rules import HanafudaRules
+from hanafuda_rl.envs.bitboard import BitboardRules
+from hanafuda_rl.envs.vec_env import HanafudaVecEnv
+from hanafuda_rl.agents.random_agent import RandomAgent
+from hanafuda_rl.agents.rule_agent import RuleAgent
+
+SEED = 0
+NUM_GAMES = 500 # 单进程基准的对局数
+NUM_STATES = 2000 # 组件计时所用的局面数
+VEC_NUM_ENVS = 1024 # 批量环境的并行局数
+VEC_STEPS = 50 # 批量环境的步数
+SUBPROC_NUM_ENVS = 4 # SubprocVecEnv 的 worker 数
+SUBPROC_STEPS = 500 # SubprocVecEnv 的向量步数
+REPEATS = 3 # 每项基准重复的次数，取最好的一次以降低噪声
+TOLERANCE = 0.15 # 比较模式下允许的相对退化幅度（单机重复运行的噪声约在 10% 以内）
+
+BENCHMARKS = ["rules", "env", "selfplay", "vec_env", "subproc", "components"]
+
+
+def _rates(steps, games, seconds):
+    return {"steps": steps, "games": games, "seconds": seconds,
+            "steps_per_sec": steps / seconds, "games_per_sec": games / seconds}
+
+
+def _best_of(repeats, bench, *args):
+    """
+    重复运行 repeats 次，取吞吐量最高（或单次耗时最低）的一次结果。
+    """
+    runs = [bench(*args) for _ in range(repeats)]
+    if "steps_per_sec" in runs[0]:
+        return max(runs, key=lambda run: run["steps_per_sec"])
+    return {name: min((run[name] for run in runs), key=lambda timing: timing["us_per_call"]) for name in runs[0]}
+
+
+def bench_rules(rules, num_games, seed):
+    """
+    只推进规则引擎：双方均匀随机地选择合法动作，直到打完 num_games 局。
+    """
+    rng = np.random.default_rng(seed)
+    steps = 0
+    start = time.perf_counter()
+    for game in range(num_games):
+        rules.reset(np_random=np.random.default_rng(seed + game))
+        while not rules.game_over:
+            player = rules.current_player
+            legal = np.flatnonzero(rules.get_legal_actions_mask(player))
+            rules.perform_action(int(legal[int(rng.random() * len(legal))]), player)
+            steps += 1
+    return _rates(steps, num_games, time.perf_counter() - start)
+
+
+def bench_env(env, num_games, seed):
+    """
+    推进 Gymnasium 环境（包括观测、掩码与奖励的计算）。
+    """
+    rng = np.random.default_rng(seed)
+    steps = 0
+    start = time.perf_counter()
+    for game in range(num_games):
+        _, info = env.reset(seed=seed + game)
+        terminated = False
+        while not terminated:
+            legal = np.flatnonzero(info["action_mask"])
+            _, _, terminated, _, info = env.step(int(legal[int(rng.random() * len(legal))]))
+            steps += 1
+    return _rates(steps, num_games, time.perf_counter() - start)
+
+
+def bench_selfplay(opponent, num_games, seed):
+    """
+    推进训练时使用的 SelfPlayEnvWrapper：RL 一方随机行动，对手由 opponent 决定。
+    """
+    from hanafuda_rl.train.train_sb3 import SelfPlayEnvWrapper
+
+    env = SelfPlayEnvWrapper(HanafudaEnv(), opponent_agent=opponent)
+    rng = np.random.default_rng(seed)
+    steps = 0
+    start = time.perf_counter()
+    for game in range(num_games):
+        env.reset(seed=seed + game)
+        terminated = truncated = False
+        while not (terminated or truncated):
+            legal = np.flatnonzero(env.get_action_mask())
+            _, _, terminated, truncated, _ = env.step(int(legal[int(rng.random() * len(legal))]))
+            steps += 1
+    return _rates(steps, num_games, time.perf_counter() - start)
+
+
+def bench_vec_env(num_envs, num_steps, seed):
+    """
+    推进批量 NumPy 环境 HanafudaVecEnv（对手为随机智能体）。steps 为所有局的 RL 步数之和。
+    """
+    venv = HanafudaVecEnv(num_envs, opponent=RandomAgent(seed=seed), seed=seed)
+    agent = RandomAgent(seed=seed)
+    obs = venv.reset()
+    games = 0
+    start = time.perf_counter()
+    for _ in range(num_steps):
+        obs, _, dones, _ = venv.step(agent.select_actions(obs, venv.action_masks()))
+        games += int(dones.sum())
+    seconds = time.perf_counter() - start
+    venv.close()
+    return _rates(num_envs * num_steps, games, seconds)
+
+
+def bench_subproc(num_envs, num_steps, seed):
+    """
+    推进 train_sb3.py 中的 SubprocVecEnv 配置（随机对手，不使用对手联盟），不计进程启动时间。
+    """
+    from stable_baselines3.common.vec_env import SubprocVecEnv
+    from hanafuda_rl.train.train_sb3 import make_env_func
+
+    venv = SubprocVecEnv([make_env_func(rank, seed, use_league=False) for rank in range(num_envs)])
+    agent = RandomAgent(seed=seed)
+    try:
+        obs = venv.reset()
+        games = 0
+        start = time.perf_counter()
+        for _ in range(num_steps):
+            masks = np.stack(venv.env_method("action_masks"))
+            obs, _, dones, _ = venv.step(agent.select_actions(obs, masks))
+            games += int(dones.sum())
+        seconds = time.perf_counter() - start
+    finally:
+        venv.close()
+    return _rates(num_envs * num_steps, games, seconds)
+
+
+def _collect_states(num_states, seed):
+    """
+    随机对局中收集 num_states 个未结束的局面（HanafudaRules.snapshot 记录）。
+    """
+    rules = HanafudaRules()
+    rng = np.random.default_rng(seed)
+    states = []
+    game = 0
+    while len(states) < num_states:
+        rules.reset(np_random=np.random.default_rng(seed + game))
+        game += 1
+        while not rules.game_over and len(states) < num_states:
+            states.append(rules.snapshot())
+            player = rules.current_player
+            legal = np.flatnonzero(rules.get_legal_actions_mask(player))
+            rules.perform_action(int(legal[int(rng.random() * len(legal))]), player)
+    return states
+
+
+def bench_components(num_states, seed):
+    """
+    在同一组局面上分别计时 _get_obs、get_legal_actions_mask（不命中缓存）与 _evaluate_yaku。
+    """
+    states = _collect_states(num_states, seed)
+    env = HanafudaEnv()
+    rules = env.rules
+    timings = {"get_obs": 0.0, "get_legal_actions_mask": 0.0, "evaluate_yaku": 0.0}
+
+    for state in states:
+        rules.restore(state)
+        player = rules.current_player
+
+        start = time.perf_counter()
+        env._get_obs(player)
+        timings["get_obs"] += time.perf_counter() - start
+
+        rules.invalidate_mask_cache()
+        start = time.perf_counter()
+        rules.get_legal_actions_mask(player)
+        timings["get_legal_actions_mask"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        rules._evaluate_yaku(player)  # 会改写役分与阶段，下一个局面 restore 时恢复
+        timings["evaluate_yaku"] += time.perf_counter() - start
+
+    return {name: {"calls": len(states), "us_per_call": seconds / len(states) * 1e6} for name, seconds in timings.items()}
+
+
+def _untrained_model_path(directory):
+    """
+    未提供模型时，保存一个未训练的 MaskablePPO 作为 PPO 对手（只用于测量前向计算开销）。
+    """
+    from sb3_contrib import MaskablePPO
+
+    path = os.path.join(directory, "untrained_ppo.zip")
+    MaskablePPO("MultiInputPolicy", HanafudaVecEnv(4, opponent=RandomAgent(seed=SEED), seed=SEED), seed=SEED).save(path)
+    return path
+
+
+def run_benchmarks(only=None, num_games=NUM_GAMES, num_states=NUM_STATES, vec_num_envs=VEC_NUM_ENVS, vec_steps=VEC_STEPS,
+                   subproc_num_envs=SUBPROC_NUM_ENVS, subproc_steps=SUBPROC_STEPS, model_path=None, seed=SEED,
+                   repeats=REPEATS):
+    """
+    运行选中的基准组（默认全部），返回 {基准名: {指标: 数值}}。
+    """
+    only = set(only or BENCHMARKS)
+    results = {}
+
+    if "rules" in only:
+        results["rules/HanafudaRules"] = _best_of(repeats, bench_rules, HanafudaRules(), num_games, seed)
+        results["rules/BitboardRules"] = _best_of(repeats, bench_rules, BitboardRules(), num_games, seed)
+
+    if "env" in only:
+        results["env/HanafudaEnv"] = _best_of(repeats, bench_env, HanafudaEnv(), num_games, seed)
+        results["env/HanafudaEnv-bitboard"] = _best_of(repeats, bench_env, HanafudaEnv(use_bitboard=True), num_games, seed)
+        results["env/HanafudaEnv-flat"] = _best_of(repeats, bench_env, HanafudaEnv(flat=True), num_games, seed)
+
+    if "selfplay" in only:
+        from hanafuda_rl.agents.sb3_agent import PPOAgent
+
+        results["selfplay/random"] = _best_of(repeats, bench_selfplay, RandomAgent(seed=seed), num_games, seed)
+        results["selfplay/rule"] = _best_of(repeats, bench_selfplay, RuleAgent(), num_games, seed)
+        with tempfile.TemporaryDirectory() as directory:
+            opponent = PPOAgent(model_path or _untrained_model_path(directory))
+            results["selfplay/ppo"] = bench_selfplay(opponent, max(1, num_games // 10), seed)
+
+    if "vec_env" in only:
+        results["vec_env/HanafudaVecEnv"] = bench_vec_env(vec_num_envs, vec_steps, seed)
+
+    if "subproc" in only:
+        results["subproc/SubprocVecEnv"] = bench_subproc(subproc_num_envs, subproc_steps, seed)
+
+    if "components" in only:
+        for name, timing in _best_of(repeats, bench_components, num_states, seed).items():
+            results[f"components/{name}"] = timing
+
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """
+    与基线比较同名指标，返回 [(基准名, 指标, 基线值, 当前值, 相对变化, 是否退化)]。
+    相对变化为正表示变好（吞吐量升高或耗时降低）。
+    """
+    rows = []
+    for name, metrics in results.items():
+        for metric in ("steps_per_sec", "games_per_sec", "us_per_call"):
+            if metric not in metrics or metric not in baseline.get(name, {}):
+                continue
+            old, new = baseline[name][metric], metrics[metric]
+            change = (new - old) / old if metric != "us_per_call" else (old - new) / old
+            rows.append((name, metric, old, new, change, change < -tolerance))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="花札环境与规则引擎的吞吐量基准测试")
+    parser.add_argument("--output", help="把结果写入该 JSON 文件")
+    parser.add_argument("--compare", help="与该 JSON 基线比较，存在退化时返回码为 1")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="允许的相对退化幅度")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, help="只运行这些基准组")
+    parser.add_argument("--games", type=int, default=NUM_GAMES)
+    parser.add_argument("--states", type=int, default=NUM_STATES)
+    parser.add_argument("--vec-envs", type=int, default=VEC_NUM_ENVS)
+    parser.add_argument("--vec-steps", type=int, default=VEC_STEPS)
+    parser.add_argument("--subproc-envs", type=int, default=SUBPROC_NUM_ENVS)
+    parser.add_argument("--subproc-steps", type=int, default=SUBPROC_STEPS)
+    parser.add_argument("--model", help="PPO 对手模型路径（默认使用未训练的模型）")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(
+        only=args.only, num_games=args.games, num_states=args.states, vec_num_envs=args.vec_envs,
+        vec_steps=args.vec_steps, subproc_num_envs=args.subproc_envs, subproc_steps=args.subproc_steps,
+        model_path=args.model, seed=args.seed, repeats=args.repeats,
+    )
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "seed": args.seed,
+            "repeats": args.repeats,
+        },
+        "results": results,
+    }
+
+    for name, metrics in results.items():
+        if "us_per_call" in metrics:
+            print(f"{name:32s} {metrics['us_per_call']:10.2f} us/call")
+        else:
+            print(f"{name:32s} {metrics['steps_per_sec']:12.0f} steps/s {metrics['games_per_sec']:10.1f} games/s")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        rows = compare(results, baseline, args.tolerance)
+        print("-" * 80)
+        for name, metric, old, new, change, regressed in rows:
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{name:32s} {metric:14s} {old:12.2f} -> {new:12.2f} ({change:+.1%}){flag}")
+        if any(row[-1] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
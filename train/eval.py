@@ -1,9 +1,19 @@
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from statistics import NormalDist
+import math
+import multiprocessing as mp
+
+import numpy as np
 from tqdm import tqdm
 
 from hanafuda_rl.envs.hanafuda_env import HanafudaEnv
+from hanafuda_rl.envs.deal_bank import DealBank
+from hanafuda_rl.envs.deals import Deal, mirror_deal, shuffle_deals
+from hanafuda_rl.envs.records import GameRecordBuffer, GameRecordWriter
 from hanafuda_rl.agents.random_agent import RandomAgent
 from hanafuda_rl.agents.rule_agent import RuleAgent
-from hanafuda_rl.agents.sb3_agent import PPOAgent 
+from hanafuda_rl.agents.numpy_agent import NumpyPolicyAgent
 
 # 玩家0 (主要评估对象)
 AGENT_0_TYPE = 'ppo'
@@ -15,23 +25,33 @@ AGENT_1_PATH = "results/models/hanafuda_ppo_selfplay_5M.zip"
 
 NUM_GAMES = 10000
 SEED = 99
+NUM_WORKERS = 8 # 并行评估的进程数
+LOCKSTEP_GAMES = 64 # 每个进程中同时推进的对局数（同一智能体的动作按批计算）
+RECORD_PATH = None # 对局记录文件（如 "results/records/eval.rec"），None 表示不记录
+DEAL_BANK_PATH = None # 发牌库文件（见 train/make_deal_bank.py），给出时第 i 局使用库中第 i 局发牌
+DUPLICATE = False # 复式评估：每个发牌下双方交换座位各打一局，净得分显著时提前结束（最多 NUM_GAMES // 2 个发牌）
+DUPLICATE_BATCH_DEALS = 500 # 复式评估每批的发牌数（每批结束后做一次序贯检验）
+CONFIDENCE = 0.95 # 复式评估置信区间的置信水平
 
-def evaluate_duel(agent0, agent1, num_games=1000, seed=None):
+def evaluate_duel(agent0, agent1, num_games=1000, seed=None, record_path=None, deal_bank_path=None):
     """
     公平地评估两个智能体。
     1. 环境内部 (`reset`) 会随机决定哪个玩家ID (0或1) 先手。
     2. 此函数通过明确的 `player_mapping` 确保 agent0 和 agent1
        在整个评估中被分配为玩家0和玩家1的次数相等。
+    给出 record_path 时把每局的对局记录追加到该文件（见 envs/records.py）。
+    给出 deal_bank_path 时第 i 局使用发牌库中的第 i 局发牌（见 envs/deal_bank.py），不同次评估的发牌序列完全相同。
     """
 
-    env = HanafudaEnv()
+    deal_bank = DealBank(deal_bank_path) if deal_bank_path else None
+    env = HanafudaEnv(recorder=GameRecordWriter(record_path) if record_path else None, deal_bank=deal_bank)
     
     stats = {"wins_agent0": 0, "wins_agent1": 0, "draws": 0, "total_score_agent0": 0}
 
     for i in tqdm(range(num_games), desc="Evaluating Games"):
         player_mapping = {0: agent0, 1: agent1} # agent0 是 P0, agent1 是 P1
 
-        obs, _ = env.reset(seed=seed + i if seed is not None else None)
+        obs, _ = env.reset(seed=seed + i if seed is not None else None, options={"deal_index": i} if deal_bank is not None else None)
         terminated, truncated = False, False
         
         while not (terminated or truncated):
@@ -60,6 +80,209 @@ def evaluate_duel(agent0, agent1, num_games=1000, seed=None):
     env.close()
     return stats
 
+_WORKER_AGENTS = {} # 进程池 worker 中由 _init_worker 创建的智能体：(智能体规格, 种子) → [智能体0, 智能体1]
+
+def _agents_key(agent_specs, seed):
+    return tuple(tuple(spec) for spec in agent_specs), seed
+
+def _init_worker(agent_specs, seed):
+    """
+    进程池 worker 的初始化函数：每个 worker 只创建（加载模型）一次智能体，供其评估的所有分片共用。
+    """
+    agents = [create_agent(agent_type, model_path, seed) for agent_type, model_path in agent_specs]
+    _WORKER_AGENTS[_agents_key(agent_specs, seed)] = agents
+
+def _game_agent(agent_type, shared_agent, seed, game_index, player_id):
+    """
+    返回某一局中某个座位使用的智能体。
+    随机智能体按 (种子, 对局编号, 座位) 单独播种，使结果与对局被分到哪个进程无关；
+    其它智能体是确定性的，整个进程共享一个实例。
+    """
+    if agent_type == "random":
+        return RandomAgent(seed=[seed, game_index, player_id])
+    return shared_agent
+
+def _select_batched(agent, observations, masks):
+    """
+    对一组对局批量选择动作；智能体没有批量接口时逐局调用。
+    """
+    if hasattr(agent, "select_actions") and len(observations) > 1:
+        batch = {key: np.stack([obs[key] for obs in observations]) for key in observations[0]}
+        return [int(action) for action in agent.select_actions(batch, np.stack(masks))]
+    return [int(agent.select_action(obs, mask)) for obs, mask in zip(observations, masks)]
+
+def duplicate_deal(game_index, seed, deal_bank=None):
+    """
+    复式评估中第 game_index 局的发牌：第 2k 与 2k+1 局使用第 k 个发牌，奇数局为其镜像（交换双方手牌与先手）。
+    第 k 个发牌取自发牌库，没有发牌库时由种子 seed + k 生成。
+    """
+    deal_index = game_index // 2
+    if deal_bank is not None:
+        deal = deal_bank.deal(deal_index % len(deal_bank))
+    else:
+        order, first_player = shuffle_deals(np.random.default_rng(seed + deal_index), 1)
+        deal = Deal(order[0].tolist(), int(first_player[0]), True)
+    return mirror_deal(deal) if game_index % 2 else deal
+
+def evaluate_shard(agent_specs, game_indices, seed, lockstep_games=LOCKSTEP_GAMES, record=False, deal_bank_path=None,
+                   duplicate=False, agents=None):
+    """
+    在当前进程中评估一组对局（第 i 局使用种子 seed + i；给出 deal_bank_path 时使用发牌库中的第 i 局发牌；
+    duplicate=True 时按 duplicate_deal 发牌）。
+    最多 lockstep_games 局同时推进，每一轮中同一个智能体需要行动的对局合并为一次批量调用。
+    agents 为按 agent_specs 创建好的两个智能体；未给出时使用 worker 初始化时创建的智能体，都没有时按规格创建。
+    返回 [(对局编号, 胜者ID, 玩家0役分, 玩家1役分)]；record=True 时另外返回与之一一对应的对局记录数组。
+    """
+    recorder = GameRecordBuffer() if record else None
+    deal_bank = DealBank(deal_bank_path) if deal_bank_path else None
+    shared_agents = agents or _WORKER_AGENTS.get(_agents_key(agent_specs, seed))
+    if shared_agents is None:
+        shared_agents = [create_agent(agent_type, model_path, seed) for agent_type, model_path in agent_specs]
+    pending = list(game_indices)[::-1]
+    slots = [] # 进行中的对局：[对局编号, 环境, 观测, 掩码, 两个座位的智能体]
+    results = []
+
+    while pending or slots:
+        # 补足同时推进的对局
+        while pending and len(slots) < lockstep_games:
+            game_index = pending.pop()
+            env = HanafudaEnv(recorder=recorder, deal_bank=deal_bank)
+            if duplicate:
+                options = {"deal": duplicate_deal(game_index, seed, deal_bank)}
+            else:
+                options = {"deal_index": game_index} if deal_bank is not None else None
+            obs, info = env.reset(seed=seed + game_index, options=options)
+            seat_agents = [_game_agent(agent_specs[p][0], shared_agents[p], seed, game_index, p) for p in range(2)]
+            slots.append([game_index, env, obs, info["action_mask"], seat_agents])
+
+        # 按“当前行动的智能体实例”分组，批量选择动作
+        groups = {}
+        for slot in slots:
+            agent = slot[4][slot[1].unwrapped.current_player]
+            groups.setdefault(id(agent), (agent, []))[1].append(slot)
+        for agent, group in groups.values():
+            actions = _select_batched(agent, [slot[2] for slot in group], [slot[3] for slot in group])
+            for slot, action in zip(group, actions):
+                obs, _, terminated, truncated, info = slot[1].step(action)
+                slot[2], slot[3] = obs, info["action_mask"]
+                if terminated or truncated:
+                    rules = slot[1].unwrapped.rules
+                    results.append((slot[0], rules.game_result, rules.yaku_points[0], rules.yaku_points[1]))
+
+        slots = [slot for slot in slots if not slot[1].unwrapped.rules.game_over]
+
+    if record:
+        # 记录在对局结束的 step 中写入，顺序与 results 相同
+        return results, recorder.records()
+    return results
+
+def merge_results(results):
+    """
+    按对局编号排序后汇总胜负与得分，与进程数和完成顺序无关。
+    """
+    stats = {"wins_agent0": 0, "wins_agent1": 0, "draws": 0, "total_score_agent0": 0}
+    for _, winner_id, points0, points1 in sorted(results):
+        if winner_id is not None and winner_id != -1:
+            if winner_id == 0:
+                stats["wins_agent0"] += 1
+                stats["total_score_agent0"] += points0
+            else:
+                stats["wins_agent1"] += 1
+                stats["total_score_agent0"] -= points1
+        else:
+            stats["draws"] += 1
+    return stats
+
+def _shard_executor(num_workers, agent_specs, seed):
+    """
+    num_workers > 1 时返回进程池（每个 worker 启动时创建一次智能体），否则返回 None（在当前进程中评估）。
+    """
+    if num_workers <= 1:
+        return None
+    context = mp.get_context("forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn")
+    return ProcessPoolExecutor(max_workers=num_workers, mp_context=context, initializer=_init_worker,
+                               initargs=(agent_specs, seed))
+
+def _run_shards(executor, agent_specs, game_indices, seed, num_workers, lockstep_games, record=False, deal_bank_path=None,
+                duplicate=False):
+    """
+    把对局编号分片后交给进程池（executor 为 None 时在当前进程中依次评估，各分片共用一份智能体），
+    按分片顺序返回 evaluate_shard 的输出。
+    """
+    shards = [shard for shard in np.array_split(np.asarray(game_indices), num_workers * 4) if len(shard)]
+    args = (seed, lockstep_games, record, deal_bank_path, duplicate)
+    if executor is None:
+        agents = [create_agent(agent_type, model_path, seed) for agent_type, model_path in agent_specs]
+        return [evaluate_shard(agent_specs, shard.tolist(), *args, agents=agents) for shard in shards]
+    futures = [executor.submit(evaluate_shard, agent_specs, shard.tolist(), *args) for shard in shards]
+    return [future.result() for future in tqdm(futures, desc="Evaluating Shards")]
+
+def evaluate_duel_parallel(agent_specs, num_games=1000, seed=SEED, num_workers=NUM_WORKERS, lockstep_games=LOCKSTEP_GAMES,
+                           record_path=None, deal_bank_path=None):
+    """
+    多进程分片评估：把对局编号分成若干片交给进程池，各进程内多局同步推进、批量决策。
+    agent_specs 为 [(agent_type, model_path), (agent_type, model_path)]，智能体在各进程内创建。
+    相同的 seed 与 num_games 下，结果与 num_workers 无关。
+    给出 record_path 时把全部对局记录按对局编号顺序追加到该文件。
+    给出 deal_bank_path 时各进程以内存映射方式共享同一发牌库，第 i 局使用库中第 i 局发牌。
+    """
+    record = record_path is not None
+    with _shard_executor(num_workers, agent_specs, seed) or nullcontext() as executor:
+        outputs = _run_shards(executor, agent_specs, np.arange(num_games), seed, num_workers, lockstep_games, record,
+                              deal_bank_path)
+
+    if not record:
+        return merge_results([item for output in outputs for item in output])
+    results = [item for output, _ in outputs for item in output]
+    records = np.concatenate([shard_records for _, shard_records in outputs])
+    with GameRecordWriter(record_path) as writer:
+        writer.add_records(records[np.argsort([item[0] for item in results], kind="stable")])
+    return merge_results(results)
+
+def paired_statistics(results, confidence=CONFIDENCE):
+    """
+    复式评估的配对统计：第 2k 与 2k+1 局是同一发牌交换座位的两局，两局的平均值构成一个样本，发牌本身的好坏在样本内抵消。
+    返回发牌数，以及 agent0 每局净得分 (net_score) 与胜率 (win_rate，平局记 0.5) 的均值和正态近似置信区间。
+    """
+    outcomes = sorted(results)
+    net = np.array([points0 if winner == 0 else -points1 if winner == 1 else 0. for _, winner, points0, points1 in outcomes])
+    wins = np.array([1. if winner == 0 else 0. if winner == 1 else 0.5 for _, winner, _, _ in outcomes])
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    stats = {"deals": len(outcomes) // 2}
+    for name, values in (("net_score", net), ("win_rate", wins)):
+        samples = values.reshape(-1, 2).mean(axis=1)
+        mean = float(samples.mean())
+        half_width = z * float(samples.std(ddof=1)) / math.sqrt(len(samples)) if len(samples) > 1 else math.inf
+        stats[name] = mean
+        stats[f"{name}_ci"] = (mean - half_width, mean + half_width)
+    return stats
+
+def evaluate_duplicate(agent_specs, max_deals=5000, seed=SEED, num_workers=NUM_WORKERS, lockstep_games=LOCKSTEP_GAMES,
+                       deal_bank_path=None, batch_deals=DUPLICATE_BATCH_DEALS, confidence=CONFIDENCE):
+    """
+    复式评估：每个发牌打两局，第二局交换双方手牌与先手（两个智能体交换座位），以配对差值估计 agent0 的净得分与胜率。
+    按 batch_deals 个发牌一批进行序贯检验：每批结束后计算置信区间，净得分的区间不含 0 时提前结束，最多 max_deals 个发牌。
+    多次检验的总体错误率按最多检验次数做 Bonferroni 修正，返回的置信区间也是修正后的水平。
+    返回 merge_results 的统计，另加 paired_statistics 的各项与 stopped_early。
+    """
+    looks = math.ceil(max_deals / batch_deals)
+    look_confidence = 1 - (1 - confidence) / looks
+    results = []
+    with _shard_executor(num_workers, agent_specs, seed) or nullcontext() as executor:
+        for start in range(0, max_deals, batch_deals):
+            stop = min(start + batch_deals, max_deals)
+            outputs = _run_shards(executor, agent_specs, np.arange(2 * start, 2 * stop), seed, num_workers, lockstep_games,
+                                  deal_bank_path=deal_bank_path, duplicate=True)
+            results += [item for output in outputs for item in output]
+            paired = paired_statistics(results, look_confidence)
+            low, high = paired["net_score_ci"]
+            if low > 0 or high < 0:
+                break
+
+    stats = merge_results(results)
+    stats.update(paired, stopped_early=paired["deals"] < max_deals)
+    return stats
+
 # 辅助函数，用于创建智能体
 def create_agent(agent_type, model_path, seed):
     """根据类型和路径创建智能体实例。"""
@@ -68,7 +291,12 @@ def create_agent(agent_type, model_path, seed):
     elif agent_type == "ppo":
         if not model_path:
             raise ValueError("Must provide a model path for PPO agent.")
+        from hanafuda_rl.agents.sb3_agent import PPOAgent  # 延迟导入：只用 NumPy 智能体时不需要 torch
         return PPOAgent(model_path=model_path)
+    elif agent_type == "numpy":
+        if not model_path:
+            raise ValueError("Must provide an exported .npz path for NumPy agent.")
+        return NumpyPolicyAgent(model_path)
     elif agent_type == "rule":
         return RuleAgent()
     else:
@@ -77,11 +305,14 @@ def create_agent(agent_type, model_path, seed):
 def main():
     """主执行函数"""
     print("Setting up agents for evaluation...")
-    agent0 = create_agent(AGENT_0_TYPE, AGENT_0_PATH, SEED)
-    agent1 = create_agent(AGENT_1_TYPE, AGENT_1_PATH, SEED)
+    agent_specs = [(AGENT_0_TYPE, AGENT_0_PATH), (AGENT_1_TYPE, AGENT_1_PATH)]
+
+    if DUPLICATE:
+        results = evaluate_duplicate(agent_specs, max_deals=NUM_GAMES // 2, seed=SEED, deal_bank_path=DEAL_BANK_PATH)
+    else:
+        results = evaluate_duel_parallel(agent_specs, num_games=NUM_GAMES, seed=SEED, record_path=RECORD_PATH,
+                                         deal_bank_path=DEAL_BANK_PATH)
 
-    results = evaluate_duel(agent0, agent1, num_games=NUM_GAMES)
-    
     total_games = results['wins_agent0'] + results['wins_agent1'] + results['draws']
     win_rate_agent0 = (results["wins_agent0"] / total_games) * 100 if total_games > 0 else 0
     win_rate_agent1 = (results["wins_agent1"] / total_games) * 100 if total_games > 0 else 0
@@ -91,10 +322,10 @@ def main():
     print("\n" + "="*40)
     print("       >>> Final Fair Evaluation Results <<<")
     print("="*40)
-    print(f"Agent 0: {agent0.__class__.__name__} ({AGENT_0_TYPE.upper()})")
-    if AGENT_0_TYPE == 'ppo': print(f"  - Model: {AGENT_0_PATH}")
-    print(f"Agent 1: {agent1.__class__.__name__} ({AGENT_1_TYPE.upper()})")
-    if AGENT_1_TYPE == 'ppo': print(f"  - Model: {AGENT_1_PATH}")
+    print(f"Agent 0: {AGENT_0_TYPE.upper()}")
+    if AGENT_0_TYPE in ('ppo', 'numpy'): print(f"  - Model: {AGENT_0_PATH}")
+    print(f"Agent 1: {AGENT_1_TYPE.upper()}")
+    if AGENT_1_TYPE in ('ppo', 'numpy'): print(f"  - Model: {AGENT_1_PATH}")
     print(f"Total Games Played: {total_games}")
     print("-" * 40)
     print(f"Agent 0 Wins / Agent 1 Wins / Draws: {results['wins_agent0']} / {results['wins_agent1']} / {results['draws']}")
@@ -102,6 +333,11 @@ def main():
     print(f"Agent 1 Win Rate: {win_rate_agent1:.2f}%")
     print(f"Draw Rate: {draw_rate:.2f}%")
     print(f"Agent 0 Average Net Score: {avg_net_score:.2f}")
+    if DUPLICATE:
+        print(f"Duplicate Deals: {results['deals']} ({'stopped early' if results['stopped_early'] else 'not significant'})")
+        print(f"Paired Net Score: {results['net_score']:.3f}  CI [{results['net_score_ci'][0]:.3f}, {results['net_score_ci'][1]:.3f}]")
+        print(f"Paired Win Rate: {results['win_rate'] * 100:.2f}%  "
+              f"CI [{results['win_rate_ci'][0] * 100:.2f}%, {results['win_rate_ci'][1] * 100:.2f}%]")
     print("="*40)
 
 if __name__ == '__main__':
@@ -0,0 +1,84 @@
+"""
+用精确残局求解器为训练数据打标签。
+
+用法：
+    python -m hanafuda_rl.train.label_endgames --games 1000 --max-pile 16 --output results/endgame_labels.npz
+
+由行为智能体（默认随机智能体）进行对局，对牌山剩余不超过 max_pile 张的每个决策局面，
+用 EndgameSolver 在真实的完整状态上求解各合法动作的精确价值（行动方视角，非法动作为 NaN）。
+标签是完全信息下的价值，可作为价值/策略网络在残局上的监督目标。
+"""
+
+import argparse
+import os
+
+import numpy as np
+
+from hanafuda_rl.envs.hanafuda_env import HanafudaEnv
+from hanafuda_rl.agents.random_agent import RandomAgent
+from hanafuda_rl.agents.endgame_solver import EndgameSolver
+
+SEED = 0
+NUM_GAMES = 1000
+MAX_PILE = 16 # 牌山剩余不超过该张数的局面才打标签（双方手牌各不超过4张）
+MAX_NODES = 200_000 # 单个局面的求解节点数上限，超出的局面被跳过
+
+
+def label_endgames(num_games=NUM_GAMES, max_pile=MAX_PILE, seed=SEED, agent=None, flat=False, solver=None):
+    """
+    对局并为残局局面打标签。返回 (观测, 动作掩码, 动作价值)：
+    观测为按局面堆叠的数组（Dict 观测时为字段 → 数组的字典），动作价值形状为 (N, 38)。
+    """
+    env = HanafudaEnv(flat=flat)
+    agent = agent if agent is not None else RandomAgent(seed=seed)
+    solver = solver if solver is not None else EndgameSolver(max_nodes=MAX_NODES)
+    observations, masks, values = [], [], []
+
+    for game in range(num_games):
+        obs, info = env.reset(seed=seed + game)
+        terminated = False
+        while not terminated:
+            mask = info["action_mask"]
+            if len(env.rules.draw_pile) <= max_pile:
+                action_values = solver.solve(env.rules)
+                if action_values is not None:
+                    row = np.full(38, np.nan, dtype=np.float32)
+                    for action, value in action_values.items():
+                        row[action] = value
+                    observations.append(obs.copy() if flat else {key: np.copy(value) for key, value in obs.items()})
+                    masks.append(np.array(mask))
+                    values.append(row)
+            obs, _, terminated, _, info = env.step(agent.select_action(obs, mask))
+
+    if flat:
+        stacked = np.stack(observations) if observations else np.zeros((0, *env.observation_space.shape), dtype=np.float32)
+    else:
+        stacked = {
+            key: np.stack([obs[key] for obs in observations]) if observations
+            else np.zeros((0, *space.shape), dtype=space.dtype)
+            for key, space in env.observation_space.spaces.items()
+        }
+    return stacked, np.array(masks, dtype=bool).reshape(-1, 38), np.array(values, dtype=np.float32).reshape(-1, 38)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="用精确残局求解器为训练数据打标签")
+    parser.add_argument("--output", required=True, help="输出 .npz 文件")
+    parser.add_argument("--games", type=int, default=NUM_GAMES)
+    parser.add_argument("--max-pile", type=int, default=MAX_PILE)
+    parser.add_argument("--max-nodes", type=int, default=MAX_NODES)
+    parser.add_argument("--flat", action="store_true", help="保存扁平观测")
+    parser.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args(argv)
+
+    observations, masks, values = label_endgames(
+        args.games, args.max_pile, args.seed, flat=args.flat, solver=EndgameSolver(max_nodes=args.max_nodes),
+    )
+    arrays = {"observations": observations} if args.flat else {f"obs_{key}": value for key, value in observations.items()}
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    np.savez_compressed(args.output, action_masks=masks, action_values=values, **arrays)
+    print(f"Labeled {len(masks)} positions from {args.games} games -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+生成评估用的发牌库。
+
+用法：
+    python -m hanafuda_rl.train.make_deal_bank --output results/deals/eval.deals --deals 1000000 --seed 0
+
+发牌库是定长记录的二进制文件（见 envs/deal_bank.py），包含每局的发牌顺序、先手玩家与开局特征
+（手四/食付、各区光牌张数、成对月份数）。评估时用 eval.DEAL_BANK_PATH 指定，
+各进程以内存映射方式共享，第 i 局总是使用库中的第 i 局发牌，不同检查点的评估因此在完全相同的发牌上比较。
+"""
+
+import argparse
+
+import numpy as np
+
+from hanafuda_rl.envs.deal_bank import DealBank, generate_deal_bank
+
+SEED = 0
+NUM_DEALS = 1_000_000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成评估用的发牌库")
+    parser.add_argument("--output", required=True, help="输出的发牌库文件")
+    parser.add_argument("--deals", type=int, default=NUM_DEALS)
+    parser.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args(argv)
+
+    bank = DealBank(generate_deal_bank(args.output, args.deals, args.seed))
+    print(f"Wrote {len(bank)} deals -> {args.output}")
+    print(f"  instant wins: {int(bank.deals['instant_win'].sum())}")
+    print(f"  mean lights (hand0 / hand1 / table): {np.round(bank.deals['lights'].mean(axis=0), 3).tolist()}")
+    print(f"  mean pairs  (hand0 / hand1 / table): {np.round(bank.deals['pairs'].mean(axis=0), 3).tolist()}")
+
+
+if __name__ == "__main__":
+    main()
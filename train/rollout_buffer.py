@@ -0,0 +1,99 @@
+import numpy as np
+from gymnasium import spaces
+from sb3_contrib.common.maskable.buffers import MaskableDictRolloutBuffer, MaskableDictRolloutBufferSamples
+from stable_baselines3.common.buffers import BaseBuffer
+
+from hanafuda_rl.envs.rules import YAKU_GROUP_SIZES
+
+# 取值为“整数 / 固定分母”的 Box 字段：存为 uint8 分子，解压时按相同的除法还原出完全相同的 float32
+QUANTIZED_FIELDS = {
+    "deck_remaining": (24,),
+    "my_yaku_progress": YAKU_GROUP_SIZES,
+    "opp_yaku_progress": YAKU_GROUP_SIZES,
+    "unseen_month_counts": (4,) * 12,  # HanafudaEnv(belief_obs=True)
+}
+
+
+class PackedMaskableDictRolloutBuffer(MaskableDictRolloutBuffer):
+    """
+    以位压缩形式保存观测与动作掩码的 MaskablePPO 回合缓冲区（Dict 观测）。
+
+    MultiBinary 字段（四个牌区、叫牌标记）与动作掩码按 np.packbits 压缩为字节（48 位牌区只占 6 字节），
+    取值不超过 256 的 Discrete 字段（抽中的牌、阶段）存为 uint8，
+    QUANTIZED_FIELDS 中的字段（山牌剩余数、役进度、各月未见张数）存为 uint8 分子，其余字段保持原样。
+    只有在组成 minibatch 时才解压，训练结果与 MaskableDictRolloutBuffer 相同。
+
+    用法：MaskablePPO(..., rollout_buffer_class=PackedMaskableDictRolloutBuffer)
+    """
+
+    def reset(self):
+        # 不调用父类的 reset，避免先分配一份未压缩的缓冲区
+        self.mask_dims = int(self.action_space.n)
+        self.action_masks = np.zeros((self.buffer_size, self.n_envs, (self.mask_dims + 7) // 8), dtype=np.uint8)
+
+        self.observations = {}
+        for key, space in self.observation_space.spaces.items():
+            if isinstance(space, spaces.MultiBinary):
+                shape, dtype = ((int(np.prod(space.shape)) + 7) // 8,), np.uint8
+            elif isinstance(space, spaces.Discrete) and space.start + space.n <= 256:
+                shape, dtype = self.obs_shape[key], np.uint8
+            elif key in QUANTIZED_FIELDS:
+                shape, dtype = self.obs_shape[key], np.uint8
+            else:
+                shape, dtype = self.obs_shape[key], space.dtype
+            self.observations[key] = np.zeros((self.buffer_size, self.n_envs, *shape), dtype=dtype)
+
+        self.actions = np.zeros((self.buffer_size, self.n_envs, self.action_dim), dtype=self.action_space.dtype)
+        self.rewards = np.zeros((self.buffer_size, self.n_envs), dtype=np.float32)
+        self.returns = np.zeros((self.buffer_size, self.n_envs), dtype=np.float32)
+        self.episode_starts = np.zeros((self.buffer_size, self.n_envs), dtype=np.float32)
+        self.values = np.zeros((self.buffer_size, self.n_envs), dtype=np.float32)
+        self.log_probs = np.zeros((self.buffer_size, self.n_envs), dtype=np.float32)
+        self.advantages = np.zeros((self.buffer_size, self.n_envs), dtype=np.float32)
+        self.generator_ready = False
+        BaseBuffer.reset(self)
+
+    def add(self, obs, *args, action_masks=None, **kwargs):
+        packed = {}
+        for key, space in self.observation_space.spaces.items():
+            if isinstance(space, spaces.MultiBinary):
+                bits = np.asarray(obs[key], dtype=bool).reshape(self.n_envs, -1)
+                packed[key] = np.packbits(bits, axis=-1)
+            elif key in QUANTIZED_FIELDS:
+                packed[key] = np.rint(np.asarray(obs[key], dtype=np.float64) * np.array(QUANTIZED_FIELDS[key]))
+            else:
+                packed[key] = obs[key]
+        if action_masks is not None:
+            masks = np.asarray(action_masks, dtype=bool).reshape(self.n_envs, self.mask_dims)
+            self.action_masks[self.pos] = np.packbits(masks, axis=-1)
+        super().add(packed, *args, action_masks=None, **kwargs)
+
+    def _get_samples(self, batch_inds, env=None):
+        observations = {}
+        for key, obs in self.observations.items():
+            space = self.observation_space.spaces[key]
+            if isinstance(space, spaces.MultiBinary):
+                bits = np.unpackbits(obs[batch_inds], axis=-1, count=int(np.prod(space.shape)))
+                observations[key] = self.to_torch(bits.reshape(-1, *space.shape).astype(space.dtype))
+            elif key in QUANTIZED_FIELDS:
+                values = obs[batch_inds] / np.array(QUANTIZED_FIELDS[key], dtype=np.float64)
+                observations[key] = self.to_torch(values.astype(space.dtype))
+            else:
+                observations[key] = self.to_torch(obs[batch_inds])
+        masks = np.unpackbits(self.action_masks[batch_inds], axis=-1, count=self.mask_dims).astype(np.float32)
+
+        return MaskableDictRolloutBufferSamples(
+            observations=observations,
+            actions=self.to_torch(self.actions[batch_inds]),
+            old_values=self.to_torch(self.values[batch_inds].flatten()),
+            old_log_prob=self.to_torch(self.log_probs[batch_inds].flatten()),
+            advantages=self.to_torch(self.advantages[batch_inds].flatten()),
+            returns=self.to_torch(self.returns[batch_inds].flatten()),
+            action_masks=self.to_torch(masks.reshape(-1, self.mask_dims)),
+        )
+
+    def nbytes(self):
+        """
+        观测与动作掩码占用的字节数。
+        """
+        return sum(obs.nbytes for obs in self.observations.values()) + self.action_masks.nbytes
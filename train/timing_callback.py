@@ -0,0 +1,127 @@
+"""
+训练过程的分阶段计时：把耗时分解与 steps/sec 写入 TensorBoard（timing/ 前缀）。
+
+用法（train_sb3.PROFILE_TIMINGS = True 时自动启用）：
+    vec_env = TimedVecEnv(SubprocVecEnv([make_env_func(rank, profile=True) for rank in range(n)]))
+    model.learn(..., callback=TimingCallback())
+
+记录的计时（秒数为本轮采样期间的累计值，各 worker 的计时相加；us_per_call 为每次调用的平均微秒数）：
+    vec_env/step          主进程中一次向量步进（发送动作到收齐各 worker 结果）的耗时
+    vec_env/env_method    主进程中 env_method 的耗时（MaskablePPO 每步经此取动作掩码）
+    worker/step           worker 中 SelfPlayEnvWrapper.step（RL 动作 + 对手回合）的耗时
+    opponent/turns        对手回合（_opponent_play_until_our_turn）的耗时，包含其中的 opponent/inference
+    opponent/inference    对手策略选择动作的耗时
+    env/step, env/get_obs, env/action_mask   HanafudaEnv 内部的耗时（env/step 包含其中的观测与掩码）
+    learner/update        两轮采样之间（梯度更新与日志）的耗时
+另外记录 ipc_estimate_seconds（主进程等待 worker 的时间减去 worker 平均计算时间，近似进程间通信与排队开销）、
+rollout_seconds、rollout_steps_per_sec 与包含更新时间的 steps_per_sec。
+"""
+
+from time import perf_counter
+
+from stable_baselines3.common.callbacks import BaseCallback
+from stable_baselines3.common.vec_env import VecEnvWrapper
+
+from hanafuda_rl.envs.timing import TIMER, merge_timings
+
+
+class TimedVecEnv(VecEnvWrapper):
+    """
+    在主进程中计时向量步进与 env_method 的向量环境包装器。
+    """
+
+    def __init__(self, venv):
+        super().__init__(venv)
+        self._step_start = None
+
+    def reset(self):
+        return self.venv.reset()
+
+    def step_async(self, actions):
+        self._step_start = perf_counter()
+        self.venv.step_async(actions)
+
+    def step_wait(self):
+        result = self.venv.step_wait()
+        TIMER.time("vec_env/step", self._step_start)
+        return result
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        start = perf_counter()
+        result = self.venv.env_method(method_name, *method_args, indices=indices, **method_kwargs)
+        TIMER.time("vec_env/env_method", start)
+        return result
+
+
+class TimingCallback(BaseCallback):
+    """
+    每轮采样结束时汇总主进程与各 worker 的分阶段计时，写入 logger（随 SB3 的日志一起输出到 TensorBoard）。
+
+    worker_timings=True 时通过 env_method("pop_timings") 从各 worker 收集计时（SubprocVecEnv + SelfPlayEnvWrapper），
+    单进程的批量环境只有主进程的计时，应设为 False。
+    """
+
+    def __init__(self, worker_timings=True, verbose=0):
+        super().__init__(verbose)
+        self.worker_timings = worker_timings
+        self._rollout_start = None
+        self._rollout_end = None
+        self._rollout_start_steps = 0
+        self._update_seconds = None
+
+    def _on_training_start(self):
+        # 丢弃开始训练之前累计的计时（包括 worker 在两次 learn 之间的计时）
+        TIMER.enable()
+        TIMER.pop()
+        if self.worker_timings:
+            self._pop_worker_timings()
+        self._rollout_end = None
+
+    def _on_rollout_start(self):
+        now = perf_counter()
+        if self._rollout_end is not None:
+            self._update_seconds = now - self._rollout_end
+            TIMER.add("learner/update", self._update_seconds)
+        self._rollout_start = now
+        self._rollout_start_steps = self.num_timesteps
+
+    def _on_step(self):
+        return True
+
+    def _on_rollout_end(self):
+        rollout_seconds = perf_counter() - self._rollout_start
+        steps = self.num_timesteps - self._rollout_start_steps
+        num_workers = 1
+        timings = TIMER.pop()
+        if self.worker_timings:
+            worker_timings = self._pop_worker_timings()
+            num_workers = len(worker_timings)
+            timings = merge_timings(timings, *worker_timings)
+
+        for name, (seconds, calls) in sorted(timings.items()):
+            self.logger.record(f"timing/{name}_seconds", seconds)
+            self.logger.record(f"timing/{name}_us_per_call", seconds / calls * 1e6)
+        if "vec_env/step" in timings and "worker/step" in timings:
+            ipc = timings["vec_env/step"][0] - timings["worker/step"][0] / num_workers
+            self.logger.record("timing/ipc_estimate_seconds", ipc)
+
+        self.logger.record("timing/rollout_seconds", rollout_seconds)
+        self.logger.record("timing/rollout_steps_per_sec", steps / rollout_seconds)
+        if self._update_seconds is not None:
+            self.logger.record("timing/steps_per_sec", steps / (rollout_seconds + self._update_seconds))
+        self._rollout_end = perf_counter()
+
+    def _pop_worker_timings(self):
+        """
+        从各 worker 取出计时。绕过 TimedVecEnv 调用 env_method，收集计时本身的进程间通信不计入下一轮的 vec_env/env_method。
+        """
+        env = self.training_env
+        if isinstance(env, TimedVecEnv):
+            env = env.venv
+        return env.env_method("pop_timings")
+
+    def _on_training_end(self):
+        # 两次 learn 之间（保存模型、推送对手）不计入 learner/update
+        self._rollout_end = None
+        self._update_seconds = None
+        TIMER.enable(False)
@@ -1,17 +1,27 @@
 import os
 from datetime import datetime
+from time import perf_counter
 import gymnasium as gym
+import numpy as np
 
 from sb3_contrib import MaskablePPO
-from sb3_contrib.common.maskable.policies import MaskableMultiInputActorCriticPolicy
+from sb3_contrib.common.maskable.policies import MaskableActorCriticPolicy, MaskableMultiInputActorCriticPolicy
 from sb3_contrib.common.wrappers import ActionMasker
-from stable_baselines3.common.vec_env import SubprocVecEnv
+from stable_baselines3.common.vec_env import SubprocVecEnv, VecMonitor
 from stable_baselines3.common.monitor import Monitor
 
 # 导入花札环境和随机智能体
 from hanafuda_rl.envs.hanafuda_env import HanafudaEnv
+from hanafuda_rl.envs.vec_env import HanafudaVecEnv
+from hanafuda_rl.envs.records import GameRecordWriter
+from hanafuda_rl.envs.timing import TIMER
 from hanafuda_rl.agents.random_agent import RandomAgent
-from hanafuda_rl.agents.sb3_agent import PPOAgent
+from hanafuda_rl.agents.rule_agent import RuleAgent
+from hanafuda_rl.agents.league import PolicyRegistry, OpponentLeague
+from hanafuda_rl.agents.sb3_agent import PPOAgent, PolicyAgent, export_actor_npz, policy_parameters
+from hanafuda_rl.agents.inference_server import OpponentInferenceServer
+from hanafuda_rl.train.rollout_buffer import PackedMaskableDictRolloutBuffer
+from hanafuda_rl.train.timing_callback import TimedVecEnv, TimingCallback
 
 # --- 1. 定义一个包装器，用于处理“RL vs 对手”的逻辑 ---
 class SelfPlayEnvWrapper(gym.Wrapper):
@@ -19,9 +29,10 @@ class SelfPlayEnvWrapper(gym.Wrapper):
     一个包装器，让一个RL智能体可以和另一个固定策略的智能体对战。
     这个包装器将二人游戏转换为对于RL智能体来说的单人游戏。
     """
-    def __init__(self, env, opponent_agent):
+    def __init__(self, env, opponent_agent, league=None):
         super().__init__(env)
         self.opponent_agent = opponent_agent
+        self.league = league  # 给出对手联盟时，每局开始前从联盟中抽取对手
         self.rl_player_id = 0  # 假定RL智能体总是玩家0
 
     def get_action_mask(self):
@@ -31,10 +42,44 @@ class SelfPlayEnvWrapper(gym.Wrapper):
         """
         return self.env.unwrapped.get_action_mask()
 
+    def set_opponent(self, opponent_agent):
+        """
+        更换对手智能体（可通过 VecEnv.env_method 在常驻的 worker 中调用）。
+        """
+        self.opponent_agent = opponent_agent
+
+    def set_opponent_parameters(self, policy_class, policy_kwargs, parameters):
+        """
+        用策略网络参数更新对手：首次调用时在 worker 内建立对手策略网络，之后只原地替换参数，不读取磁盘。
+        """
+        if not isinstance(self.opponent_agent, PolicyAgent):
+            self.opponent_agent = PolicyAgent(policy_class, self.observation_space, self.action_space, policy_kwargs)
+        self.opponent_agent.load_parameters(parameters)
+
+    def add_league_opponent(self, name, weight, policy_class, policy_kwargs, parameters, path=None):
+        """
+        向对手联盟登记一个新的检查点（参数直接载入内存），之后的对局按权重抽中它。
+        """
+        self.league.add(name, weight, path=path, policy_class=policy_class, policy_kwargs=policy_kwargs, parameters=parameters)
+
+    def add_league_agent(self, name, weight, agent):
+        """
+        向对手联盟登记一个常驻的对手（如推理服务的客户端），之后的对局按权重抽中它。
+        """
+        self.league.add_agent(name, weight, agent)
+
+    def pop_timings(self):
+        """
+        取出并清零本进程的分阶段计时（可通过 VecEnv.env_method 从各 worker 收集，见 TimingCallback）。
+        """
+        return TIMER.pop()
+
     def reset(self, **kwargs):
         """
         重置环境，并确保如果对手先手，则让其完成回合。
         """
+        if self.league is not None:
+            self.opponent_agent = self.league.sample()
         obs, info = self.env.reset(**kwargs)
         # 如果开局是对手先手
         if self.env.unwrapped.current_player != self.rl_player_id:
@@ -45,9 +90,34 @@ class SelfPlayEnvWrapper(gym.Wrapper):
     def step(self, action):
         """
         RL智能体执行一步，然后让对手一直玩，直到再次轮到RL智能体。
+        底层环境开启 auto_advance 时，再次轮到RL智能体后若其合法动作唯一，也直接执行并累计奖励。
+        """
+        timed = TIMER.enabled
+        if timed:
+            start = perf_counter()
+        obs, reward, terminated, truncated, info, skipped = self._step_once(action)
+
+        if self.env.unwrapped.auto_advance:
+            while not (terminated or truncated):
+                legal = np.flatnonzero(self.get_action_mask())
+                if len(legal) != 1:
+                    break
+                obs, forced_reward, terminated, truncated, info, forced_skipped = self._step_once(int(legal[0]))
+                reward += forced_reward
+                skipped += 1 + forced_skipped
+            info["skipped_steps"] = skipped
+        if timed:
+            TIMER.time("worker/step", start)
+
+        return obs, reward, terminated, truncated, info
+
+    def _step_once(self, action):
+        """
+        执行RL智能体的一个动作及随后对手的回合，额外返回底层环境为RL智能体自动执行的动作数。
         """
         # RL智能体执行动作
         obs, reward, terminated, truncated, info = self.env.step(action)
+        skipped = info.get("skipped_steps", 0)
         
         # 如果游戏没有因RL智能体的动作而结束，并且轮到对手了
         opp_reward = 0.
@@ -57,13 +127,16 @@ class SelfPlayEnvWrapper(gym.Wrapper):
         if terminated or truncated:
             reward = reward - opp_reward # 用对手的得分修正RL智能体的得分
         
-        return obs, reward, terminated, truncated, info
+        return obs, reward, terminated, truncated, info, skipped
 
     def _opponent_play_until_our_turn(self, obs, info):
         """
         让对手一直行动，直到再次轮到RL智能体或者游戏结束。
         这个辅助函数返回完整的5元组，供 step 和 reset 方法内部使用。
         """
+        timed = TIMER.enabled
+        if timed:
+            start = perf_counter()
         last_reward = 0.
         terminated, truncated = False, False
 
@@ -73,7 +146,12 @@ class SelfPlayEnvWrapper(gym.Wrapper):
             action_mask = self.env.unwrapped.get_action_mask()
             
             # 使用对手的策略选择动作
-            opponent_action = self.opponent_agent.select_action(obs, action_mask)
+            if timed:
+                inference_start = perf_counter()
+                opponent_action = self.opponent_agent.select_action(obs, action_mask)
+                TIMER.time("opponent/inference", inference_start)
+            else:
+                opponent_action = self.opponent_agent.select_action(obs, action_mask)
             
             # 在环境中执行对手的动作
             obs, reward, terminated, truncated, info = self.env.step(opponent_action)
@@ -86,33 +164,72 @@ class SelfPlayEnvWrapper(gym.Wrapper):
         # 在这种情况下，我们需要从环境中获取一次当前的观测状态
         if obs is None:
             obs = self.env.unwrapped._get_obs(self.rl_player_id)
+        if timed:
+            TIMER.time("opponent/turns", start)
         
         return obs, last_reward, terminated, truncated, info
 
 # 定义常量
 LOG_DIR = "Hanafuda-Project/hanafuda_rl/results/logs"
 MODEL_DIR = "Hanafuda-Project/hanafuda_rl/results/models"
+RECORD_DIR = "Hanafuda-Project/hanafuda_rl/results/records"
 TIMESTAMP = datetime.now().strftime("%Y%m%d_%H%M%S")
 TOTAL_TIMESTEPS = 5_000_000
 N_STEPS = 2048
 N_ENVS = 10 # 多线程并行
 SEED = 99
+FLAT_OBS = False # 使用扁平的 Box 观测向量（配合 MaskableActorCriticPolicy，省去 Dict 观测的拼接）
+AUTO_ADVANCE = True # 合法动作唯一的决策由环境直接执行，不占用采样步数
+BELIEF_OBS = False # 在观测中加入未见牌集合与各月未见张数（不适用于批量 NumPy 环境）
+RECORD_SELFPLAY = False # 把每个 worker 的自我对弈对局记录到 RECORD_DIR/selfplay_<rank>.rec
+PACKED_ROLLOUT_BUFFER = True # 回合缓冲区以位压缩形式保存 Dict 观测与动作掩码（仅用于 Dict 观测）
+PROFILE_TIMINGS = False # 在环境、对手回合与各 worker 中计时，每轮采样后把耗时分解与 steps/sec 写入 TensorBoard (timing/*)
+
+# 批量 NumPy 环境：在单个进程内同时推进大量对局（替代 SubprocVecEnv）
+USE_BATCHED_VEC_ENV = False
+N_BATCHED_ENVS = 4096
+N_STEPS_BATCHED = 16 # 批量环境下每个环境的采样步数（总采样步数为 N_STEPS_BATCHED * N_BATCHED_ENVS）
+
+# 对手推理服务：所有 worker 共享一份对手模型，对手的动作按批计算
+USE_INFERENCE_SERVER = True
+
+# 对手联盟：每局从历史检查点与基线对手中按权重抽取对手。
+# 同时启用对手推理服务时，最新的检查点由推理服务批量计算，更早的检查点在各 worker 内计算
+USE_LEAGUE = False
+LEAGUE_LATEST = "latest" # 联盟中由推理服务计算的最新检查点的名字
+LEAGUE_BASELINE_WEIGHTS = {"random": 1.0, "rule": 1.0} # 基线对手的抽样权重
+LEAGUE_CHECKPOINT_WEIGHT = 2.0 # 每个历史检查点的抽样权重
+LEAGUE_CACHE_BYTES = 256 * 2**20 # 每个 worker 中已建立的检查点策略所占内存的上限
 
 # 为自我对弈设置参数
 SELF_PLAY_ITERATIONS = 5 # 自我对弈的总迭代轮数
 STEPS_PER_ITERATION = TOTAL_TIMESTEPS // SELF_PLAY_ITERATIONS # 每轮迭代训练的步数
 
 # 一个辅助函数，用于创建和包装单个环境实例
-def make_env_func(rank, seed=99, opponent_model_path=None):
+def make_env_func(rank, seed=99, opponent_model_path=None, opponent_client=None, profile=False, use_league=None):
     """
     一个辅助函数，返回一个创建环境的函数。
     这是 SubprocVecEnv 所需的格式。
+    若提供了 opponent_client（推理服务的客户端），则用它代替在 worker 内加载的 PPO 模型。
+    profile=True 时在 worker 进程中打开分阶段计时。
+    use_league 为 None 时按 USE_LEAGUE 决定是否建立对手联盟。
     """
+    if use_league is None:
+        use_league = USE_LEAGUE
+
     def _init():
+        # _init 由 cloudpickle 按值序列化，直接引用的模块全局对象会被复制一份；
+        # 在 worker 中导入 TIMER，打开的才是本进程各计时点使用的计时器
+        from hanafuda_rl.envs.timing import TIMER as worker_timer
+
         env_seed = seed + rank
+        worker_timer.enable(profile)
 
         # 动态决定对手
-        if opponent_model_path is None:
+        if opponent_client is not None:
+            # 对手的动作由推理服务批量计算
+            opponent = opponent_client
+        elif opponent_model_path is None:
             # 如果没有提供模型路径，则使用随机智能体（用于第一轮训练）
             opponent_seed = seed + rank
             opponent = RandomAgent(seed=opponent_seed)
@@ -121,78 +238,150 @@ def make_env_func(rank, seed=99, opponent_model_path=None):
             opponent = PPOAgent(model_path=opponent_model_path)
 
         # 创建环境
-        env = HanafudaEnv()
+        recorder = GameRecordWriter(os.path.join(RECORD_DIR, f"selfplay_{rank}.rec")) if RECORD_SELFPLAY else None
+        env = HanafudaEnv(flat=FLAT_OBS, auto_advance=AUTO_ADVANCE, belief_obs=BELIEF_OBS, recorder=recorder)
         env.reset(seed=env_seed)
+
+        league = None
+        if use_league:
+            registry = PolicyRegistry(env.observation_space, env.action_space, max_bytes=LEAGUE_CACHE_BYTES)
+            registry.register_agent("random", RandomAgent(seed=seed + rank))
+            registry.register_agent("rule", RuleAgent())
+            league = OpponentLeague(registry, LEAGUE_BASELINE_WEIGHTS, seed=env_seed)
         
         # 按顺序包装
-        env = SelfPlayEnvWrapper(env, opponent_agent=opponent)
+        env = SelfPlayEnvWrapper(env, opponent_agent=opponent, league=league)
         env = ActionMasker(env, action_mask_fn=lambda env: env.get_action_mask())
         env = Monitor(env)
         return env
     return _init
 
+def make_vec_env(opponent_model_path=None, inference_server=None):
+    """
+    根据配置创建并行环境：批量 NumPy 环境或多进程 SubprocVecEnv。
+    """
+    if USE_BATCHED_VEC_ENV:
+        if opponent_model_path is None:
+            opponent = RandomAgent(seed=SEED)
+        else:
+            opponent = PPOAgent(model_path=opponent_model_path)
+        vec_env = VecMonitor(HanafudaVecEnv(N_BATCHED_ENVS, opponent=opponent, seed=SEED))
+    else:
+        vec_env = SubprocVecEnv([
+            make_env_func(
+                rank, SEED, opponent_model_path=opponent_model_path,
+                opponent_client=inference_server.client(rank) if inference_server is not None else None,
+                profile=PROFILE_TIMINGS,
+            )
+            for rank in range(N_ENVS)
+        ])
+    return TimedVecEnv(vec_env) if PROFILE_TIMINGS else vec_env
+
+def push_opponent(vec_env, model, model_path, inference_server=None, previous_path=None):
+    """
+    把当前模型作为新的对手推送给常驻的环境：
+    - 使用推理服务时更新服务进程中的参数（首次调用时启动服务并把客户端分发给各 worker）。
+      同时启用对手联盟时，客户端作为 LEAGUE_LATEST 登记到各 worker 的联盟中，
+      上一次推送的检查点（previous_path）转为联盟中的普通检查点，在 worker 内按需从磁盘加载；
+    - 只启用对手联盟时，把它作为新的检查点登记到各 worker 的联盟中（参数直接载入内存）；
+    - 否则把策略参数广播给各 worker（或批量环境）原地载入。
+    返回（可能新建的）推理服务。
+    """
+    parameters = policy_parameters(model.policy)
+    if USE_INFERENCE_SERVER and not USE_BATCHED_VEC_ENV:
+        if inference_server is None:
+            observation_space = HanafudaEnv(flat=FLAT_OBS, belief_obs=BELIEF_OBS).observation_space
+            inference_server = OpponentInferenceServer(model_path, observation_space, num_clients=N_ENVS).start()
+            for rank in range(N_ENVS):
+                client = inference_server.client(rank)
+                if USE_LEAGUE:
+                    vec_env.env_method("add_league_agent", LEAGUE_LATEST, LEAGUE_CHECKPOINT_WEIGHT, client, indices=[rank])
+                else:
+                    vec_env.env_method("set_opponent", client, indices=[rank])
+        else:
+            if USE_LEAGUE:
+                vec_env.env_method(
+                    "add_league_opponent", previous_path, LEAGUE_CHECKPOINT_WEIGHT, None, None, None, path=previous_path,
+                )
+            inference_server.load_parameters(parameters)
+    elif USE_LEAGUE and not USE_BATCHED_VEC_ENV:
+        vec_env.env_method(
+            "add_league_opponent", model_path, LEAGUE_CHECKPOINT_WEIGHT, type(model.policy), model.policy_kwargs,
+            parameters, path=model_path,
+        )
+    else:
+        vec_env.env_method("set_opponent_parameters", type(model.policy), model.policy_kwargs, parameters)
+    return inference_server
+
 def train_agent():
     """主训练函数"""
     
-    # 初始化模型和对手路径
-    model = None
+    # 并行环境只创建一次（第一轮的对手为随机智能体），之后每轮只把新的对手参数推送给常驻的 worker
+    vec_env = make_vec_env()
+    inference_server = None
     opponent_path = None # 第一轮没有对手模型
 
+    rollout_buffer_class = None
+    if PACKED_ROLLOUT_BUFFER and isinstance(vec_env.observation_space, gym.spaces.Dict):
+        rollout_buffer_class = PackedMaskableDictRolloutBuffer
+
+    print("Creating a new MaskablePPO model...")
+    model = MaskablePPO(
+        MaskableActorCriticPolicy if FLAT_OBS and not USE_BATCHED_VEC_ENV else MaskableMultiInputActorCriticPolicy,
+        vec_env,
+        verbose=1,
+        tensorboard_log=LOG_DIR,
+        learning_rate=3e-4,
+        n_steps=N_STEPS_BATCHED if USE_BATCHED_VEC_ENV else N_STEPS,
+        batch_size=128,
+        n_epochs=10,
+        gamma=0.99,
+        clip_range=0.2,
+        rollout_buffer_class=rollout_buffer_class,
+    )
+
     for i in range(SELF_PLAY_ITERATIONS):
         print("="*50)
         print(f"Starting Self-Play Iteration {i+1}/{SELF_PLAY_ITERATIONS}")
-        print(f"Opponent: {'RandomAgent' if opponent_path is None else opponent_path}")
-        print("="*50)
-
-        # 1. 根据当前对手创建并行环境
-        vec_env = SubprocVecEnv([make_env_func(rank, SEED, opponent_model_path=opponent_path) for rank in range(N_ENVS)])
-
-        # 2. 创建或更新模型
-        if model is None:
-            # 如果是第一次迭代，创建一个新模型
-            print("Creating a new MaskablePPO model...")
-            model = MaskablePPO(
-                MaskableMultiInputActorCriticPolicy,
-                vec_env,
-                verbose=1,
-                tensorboard_log=LOG_DIR,
-                learning_rate=3e-4,
-                n_steps=N_STEPS,
-                batch_size=128,
-                n_epochs=10,
-                gamma=0.99,
-                clip_range=0.2,
-            )
+        if USE_LEAGUE and not USE_BATCHED_VEC_ENV:
+            print(f"Opponent: league of {', '.join(LEAGUE_BASELINE_WEIGHTS)} and {i} checkpoint(s)")
         else:
-            # 如果不是第一次迭代，更新模型以使用新的环境（新的对手）
-            print("Updating model with new environment (new opponent)...")
-            model.set_env(vec_env)
+            print(f"Opponent: {'RandomAgent' if opponent_path is None else opponent_path}")
+        print("="*50)
 
-        # 3. 训练模型
+        # 1. 训练模型
         # reset_num_timesteps=False 确保日志和总步数在迭代之间是连续的
         model.learn(
             total_timesteps=STEPS_PER_ITERATION,
             tb_log_name=f"MaskablePPO_SelfPlay_{TIMESTAMP}",
             progress_bar=True,
-            reset_num_timesteps=False 
+            reset_num_timesteps=False,
+            callback=TimingCallback(worker_timings=not USE_BATCHED_VEC_ENV) if PROFILE_TIMINGS else None,
         )
 
-        # 4. 保存当前模型，它将成为下一轮的对手
+        # 2. 保存当前模型，它将成为下一轮的对手
         current_model_path = os.path.join(MODEL_DIR, f"selfplay_models/hanafuda_ppo_iter_{i+1}.zip")
         model.save(current_model_path)
         print(f"Iteration {i+1} model saved to: {current_model_path}")
 
-        # 5. 更新对手路径以备下一轮使用
-        opponent_path = current_model_path
+        # 3. 把新对手推送给常驻的环境
+        previous_path, opponent_path = opponent_path, current_model_path
+        if i + 1 < SELF_PLAY_ITERATIONS:
+            inference_server = push_opponent(vec_env, model, current_model_path, inference_server, previous_path)
 
-        # 6. 关闭当前的环境，释放资源
-        vec_env.close()
+    # 4. 关闭环境，释放资源
+    vec_env.close()
+    if inference_server is not None:
+        inference_server.close()
 
     print("="*50)
     print("Self-Play training completed!")
     final_model_path = os.path.join(MODEL_DIR, f"hanafuda_ppo_selfplay_{TOTAL_TIMESTEPS}.zip")
     model.save(final_model_path)
     print(f"Final model saved to: {final_model_path}")
+    # 同时导出动作网络权重，供只依赖 NumPy 的 NumpyPolicyAgent 使用
+    actor_path = export_actor_npz(model, final_model_path.replace(".zip", "_actor.npz"))
+    print(f"Actor weights exported to: {actor_path}")
     print("="*50)
 
 if __name__ == '__main__':